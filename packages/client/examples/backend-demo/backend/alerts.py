@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+增量告警规则引擎
+挂在后台采样循环上，每次采样对所有规则求值一次：
+
+- 规则引用快照中的任意标量（点分路径，与 /ws/monitor v2 增量帧相同，如 cpu.percent、
+  memory.swap_percent、network.interfaces.eth0.bytes_recv_per_sec）
+- 同一 (指标, 时长) 的滑动窗口被所有规则共享；窗口用运行和维护 avg 与线性回归斜率，
+  用单调队列维护 min/max，每个采样点的更新均摊 O(1)
+- 每条规则的求值只读取窗口统计量，也是 O(1)，规则增加到数百条时单次求值耗时线性且很小
+
+规则示例：
+    {"name": "cpu-high", "metric": "cpu.percent", "op": ">", "value": 90, "for": "60s"}
+    {"name": "swap-rising", "metric": "memory.swap_percent", "type": "rising", "for": "5m"}
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import operator
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from metric_history import parse_duration
+
+
+RULE_TYPES = ("threshold", "rising", "falling")
+AGGREGATES = ("all", "avg", "min", "max", "last")
+OPERATORS: Dict[str, Callable[[float, float], bool]] = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+# 最近的状态变化保留条数
+RECENT_EVENTS = 100
+
+
+class Window:
+    """时间滑动窗口：保留 [t - duration, t] 内的采样点
+
+    运行和 (n, Σx, Σt, Σt², Σtx) 用于均值与最小二乘斜率；时间以 base 为原点，
+    原点定期前移并重新精确求和，避免长时间运行后的浮点抵消与累积误差。
+    """
+
+    def __init__(self, duration: float):
+        self.duration = duration
+        self.samples: Deque[Tuple[float, float]] = deque()
+        self._mins: Deque[Tuple[float, float]] = deque()
+        self._maxs: Deque[Tuple[float, float]] = deque()
+        self.base = 0.0
+        self.sx = self.st = self.stt = self.stx = 0.0
+
+    def _rebase(self, base: float) -> None:
+        self.base = base
+        self.sx = self.st = self.stt = self.stx = 0.0
+        for t, x in self.samples:
+            t -= base
+            self.sx += x
+            self.st += t
+            self.stt += t * t
+            self.stx += t * x
+
+    def expire(self, now: float) -> None:
+        samples = self.samples
+        cutoff = now - self.duration
+        while samples and samples[0][0] < cutoff:
+            t, x = samples.popleft()
+            t -= self.base
+            self.sx -= x
+            self.st -= t
+            self.stt -= t * t
+            self.stx -= t * x
+        while self._mins and self._mins[0][0] < cutoff:
+            self._mins.popleft()
+        while self._maxs and self._maxs[0][0] < cutoff:
+            self._maxs.popleft()
+
+    def push(self, t: float, x: float) -> None:
+        self.expire(t)
+        if not self.samples or t - self.base > 4 * self.duration + 60:
+            self.samples.append((t, x))
+            self._rebase(self.samples[0][0])
+        else:
+            self.samples.append((t, x))
+            rt = t - self.base
+            self.sx += x
+            self.st += rt
+            self.stt += rt * rt
+            self.stx += rt * x
+        while self._mins and self._mins[-1][1] >= x:
+            self._mins.pop()
+        self._mins.append((t, x))
+        while self._maxs and self._maxs[-1][1] <= x:
+            self._maxs.pop()
+        self._maxs.append((t, x))
+
+    @property
+    def count(self) -> int:
+        return len(self.samples)
+
+    def span(self) -> float:
+        return self.samples[-1][0] - self.samples[0][0] if self.samples else 0.0
+
+    def last(self) -> float:
+        return self.samples[-1][1]
+
+    def avg(self) -> float:
+        return self.sx / len(self.samples)
+
+    def min(self) -> float:
+        return self._mins[0][1]
+
+    def max(self) -> float:
+        return self._maxs[0][1]
+
+    def slope(self) -> Optional[float]:
+        """最小二乘斜率（每秒变化量），少于 2 个点时返回 None"""
+        n = len(self.samples)
+        denominator = n * self.stt - self.st * self.st
+        if n < 2 or denominator <= 0:
+            return None
+        return (n * self.stx - self.st * self.sx) / denominator
+
+
+class Rule:
+    """一条告警规则及其当前状态"""
+
+    def __init__(self, spec: Dict[str, Any]):
+        if not isinstance(spec, dict):
+            raise ValueError("规则必须是 JSON 对象")
+        self.spec = dict(spec)
+        self.name = spec.get("name")
+        self.metric = spec.get("metric")
+        if not isinstance(self.name, str) or not self.name:
+            raise ValueError("规则缺少 name")
+        if not isinstance(self.metric, str) or not self.metric:
+            raise ValueError(f"规则 {self.name} 缺少 metric")
+        self.type = spec.get("type", "threshold")
+        if self.type not in RULE_TYPES:
+            raise ValueError(f"规则 {self.name} 的 type 无效，可选: {', '.join(RULE_TYPES)}")
+        window = spec.get("for", 0)
+        self.duration = 0.0 if window in (0, "0", None) else parse_duration(str(window))
+        self.severity = spec.get("severity", "warning")
+        self.description = spec.get("description", "")
+
+        if self.type == "threshold":
+            self.op = spec.get("op", ">")
+            if self.op not in OPERATORS:
+                raise ValueError(f"规则 {self.name} 的 op 无效，可选: {', '.join(OPERATORS)}")
+            self.compare = OPERATORS[self.op]
+            self.aggregate = spec.get("aggregate", "all")
+            if self.aggregate not in AGGREGATES:
+                raise ValueError(f"规则 {self.name} 的 aggregate 无效，可选: {', '.join(AGGREGATES)}")
+            if self.aggregate == "all":
+                # 窗口内所有采样都满足条件 <=> 最不利的极值满足条件
+                self.aggregate = "min" if self.op in (">", ">=") else "max"
+            self.threshold = self._number(spec.get("value"), "value")
+        else:
+            # 斜率阈值（每秒变化量），rising 要求斜率 > rate，falling 要求斜率 < -rate
+            self.threshold = self._number(spec.get("rate", 0), "rate")
+            if self.duration <= 0:
+                raise ValueError(f"规则 {self.name} 的 {self.type} 需要指定 for 时长")
+
+        self.window: Optional[Window] = None
+        self.state = "nodata"
+        self.value: Optional[float] = None
+        self.since = time.time()
+
+    def _number(self, value: Any, field: str) -> float:
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise ValueError(f"规则 {self.name} 的 {field} 必须是数字")
+        return float(value)
+
+    def evaluate(self, tolerance: float) -> Tuple[str, Optional[float]]:
+        """根据共享窗口的统计量返回 (状态, 观测值)"""
+        window = self.window
+        if window is None or not window.count:
+            return "nodata", None
+        if self.type == "threshold":
+            value = getattr(window, self.aggregate)()
+            full = window.span() >= self.duration - tolerance
+            return ("firing" if full and self.compare(value, self.threshold) else "ok"), value
+        slope = window.slope()
+        if slope is None:
+            return "ok", None
+        full = window.span() >= self.duration - tolerance
+        rising = slope > self.threshold if self.type == "rising" else slope < -self.threshold
+        return ("firing" if full and rising else "ok"), slope
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            **self.spec,
+            "state": self.state,
+            "value": round(self.value, 4) if self.value is not None else None,
+            "since": self.since,
+        }
+
+
+class AlertEngine:
+    """管理规则与共享窗口，每次采样调用 evaluate，并把状态变化推送给 /ws/alerts 订阅者"""
+
+    def __init__(self, resolution: float = 1.0):
+        self.resolution = resolution
+        self.rules: Dict[str, Rule] = {}
+        self.windows: Dict[Tuple[str, float], Window] = {}
+        self.clients: List[Any] = []  # MonitorClient，状态变化作为控制消息发送
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=RECENT_EVENTS)
+        self.seq = 0
+        self.last_evaluation = 0.0  # 最近一次求值耗时（秒）
+
+    @classmethod
+    def from_file(cls, path: str, resolution: float = 1.0) -> "AlertEngine":
+        """从 JSON 文件加载规则列表"""
+        with open(path, encoding="utf-8") as f:
+            specs = json.load(f)
+        if not isinstance(specs, list):
+            raise ValueError("告警规则文件必须是 JSON 数组")
+        engine = cls(resolution)
+        for spec in specs:
+            engine.add_rule(spec)
+        return engine
+
+    def add_rule(self, spec: Dict[str, Any]) -> Rule:
+        """添加规则，同名规则被替换"""
+        rule = Rule(spec)
+        if rule.name in self.rules:
+            self.remove_rule(rule.name)
+        key = (rule.metric, rule.duration)
+        window = self.windows.get(key)
+        if window is None:
+            window = self.windows[key] = Window(rule.duration)
+        rule.window = window
+        self.rules[rule.name] = rule
+        return rule
+
+    def remove_rule(self, name: str) -> bool:
+        rule = self.rules.pop(name, None)
+        if rule is None:
+            return False
+        key = (rule.metric, rule.duration)
+        if not any((r.metric, r.duration) == key for r in self.rules.values()):
+            self.windows.pop(key, None)
+        return True
+
+    def evaluate(self, timestamp: float, flat: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """推入一次采样并对所有规则求值，返回状态变化事件"""
+        start = time.perf_counter()
+        for (metric, _), window in self.windows.items():
+            value = flat.get(metric)
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and value == value:
+                window.push(timestamp, float(value))
+            else:
+                window.expire(timestamp)
+
+        events = []
+        tolerance = self.resolution
+        for rule in self.rules.values():
+            state, value = rule.evaluate(tolerance)
+            rule.value = value
+            if state == rule.state:
+                continue
+            if "firing" not in (state, rule.state):
+                # ok <-> nodata 只更新状态，不产生事件
+                rule.state = state
+                rule.since = timestamp
+                continue
+            self.seq += 1
+            event = {
+                "type": "alert",
+                "seq": self.seq,
+                "rule": rule.name,
+                "severity": rule.severity,
+                "from": rule.state,
+                "state": state,
+                "value": round(value, 4) if value is not None else None,
+                "timestamp": timestamp,
+            }
+            rule.state = state
+            rule.since = timestamp
+            events.append(event)
+            self.recent.append(event)
+        self.last_evaluation = time.perf_counter() - start
+
+        for event in events:
+            for client in list(self.clients):
+                client.send_control(event)
+        return events
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "rules": [rule.describe() for rule in self.rules.values()],
+            "firing": [name for name, rule in self.rules.items() if rule.state == "firing"],
+            "windows": len(self.windows),
+            "seq": self.seq,
+            "evaluation_seconds": self.last_evaluation,
+            "recent": list(self.recent),
+        }
+
+    def add_client(self, client: Any) -> None:
+        self.clients.append(client)
+
+    def remove_client(self, client: Any) -> None:
+        if client in self.clients:
+            self.clients.remove(client)
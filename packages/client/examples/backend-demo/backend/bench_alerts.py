@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+告警规则引擎的基准
+对不同规则数量（默认 10 / 100 / 1000 条，60 秒到 5 分钟的窗口，阈值与趋势规则混合）
+推入 N 个合成采样点，输出每次 evaluate 的平均耗时与每条规则的摊销耗时
+
+用法: python3 bench_alerts.py [--samples 3600] [--rules 10,100,1000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import time
+from typing import Any, Dict, List
+
+from alerts import AlertEngine
+
+METRICS = [f"cpu.percent_per_core.{i}" for i in range(64)] + ["cpu.percent", "memory.percent", "memory.swap_percent"]
+WINDOWS = ("60s", "2m", "5m")
+
+
+def build_rules(count: int) -> List[Dict[str, Any]]:
+    rules = []
+    for i in range(count):
+        metric = METRICS[i % len(METRICS)]
+        window = WINDOWS[i % len(WINDOWS)]
+        if i % 4 == 3:
+            rules.append({"name": f"rule{i}", "metric": metric, "type": "rising", "for": window})
+        else:
+            rules.append({"name": f"rule{i}", "metric": metric, "op": ">", "value": 50 + i % 50, "for": window})
+    return rules
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="告警规则引擎基准")
+    parser.add_argument("--samples", type=int, default=3600)
+    parser.add_argument("--rules", default="10,100,1000")
+    args = parser.parse_args()
+
+    print(f"{'规则数':>8}{'窗口数':>8}{'每次求值':>12}{'每条规则':>12}")
+    for count in (int(n) for n in args.rules.split(",")):
+        engine = AlertEngine()
+        for spec in build_rules(count):
+            engine.add_rule(spec)
+        start_ts = time.time()
+        flats = [
+            {metric: 50 + 50 * math.sin((i + j) / 97) for j, metric in enumerate(METRICS)}
+            for i in range(args.samples)
+        ]
+        began = time.perf_counter()
+        for i, flat in enumerate(flats):
+            engine.evaluate(start_ts + i, flat)
+        per_eval = (time.perf_counter() - began) / args.samples
+        print(f"{count:>8}{len(engine.windows):>8}{per_eval * 1e6:>10.1f}µs{per_eval / count * 1e9:>10.0f}ns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+后端负载与延迟基准
+在本机启动 http_server.py，按配置的请求组合并发请求 /api/* 路由，同时保持 N 个 /ws/monitor 订阅者，
+结束后输出：
+- 每个路由及总体的 p50/p99/平均延迟、吞吐与错误数
+- WebSocket 每个订阅者每秒收到的帧数
+- 事件循环延迟（由 /metrics 的直方图在压测前后的差值计算）
+- 服务端进程的 CPU 与 RSS
+
+结果写为 JSON；指定 --baseline 时与基线比较，任一指标劣化超过 --tolerance 即以退出码 1 结束。
+
+用法:
+    python3 bench_load.py --duration 10 --concurrency 8 --ws 20 --output results.json
+    python3 bench_load.py --baseline results.json
+    python3 bench_load.py --mix "/api/cpu=5,/api/snapshot=1"
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import psutil
+except ImportError:
+    print("错误: psutil 库未安装，请运行: pip install psutil", file=sys.stderr)
+    sys.exit(1)
+
+try:
+    import httpx
+except ImportError:
+    print("错误: httpx 库未安装，请运行: pip install httpx", file=sys.stderr)
+    sys.exit(1)
+
+try:
+    import websockets
+except ImportError:
+    print("错误: websockets 库未安装，请运行: pip install websockets", file=sys.stderr)
+    sys.exit(1)
+
+
+# 默认请求组合：路由 -> 权重
+DEFAULT_MIX = {
+    "/api/system": 1,
+    "/api/cpu": 4,
+    "/api/memory": 4,
+    "/api/disk": 1,
+    "/api/network": 2,
+    "/api/disk/io": 2,
+    "/api/processes?limit=20": 2,
+    "/api/snapshot?fields=system,cpu,memory,disk,processes.top10": 4,
+    "/api/history?metric=cpu.percent&range=5m": 2,
+    "/api/monitor/clients": 1,
+    "/api/alerts": 1,
+    "/metrics": 1,
+}
+
+# 默认传给服务端的环境变量：指标历史默认关闭（/api/history 返回 404），开启后默认组合中的该路由才有意义
+DEFAULT_ENV = {"MONITOR_HISTORY_RETENTION": "10m"}
+
+# 与基线比较的指标：(路径, 越大越好)
+COMPARED_METRICS: List[Tuple[str, bool]] = [
+    ("http.total.p50_ms", False),
+    ("http.total.p99_ms", False),
+    ("http.total.requests_per_sec", True),
+    ("websocket.frames_per_sec_per_client", True),
+    ("loop_lag.mean_ms", False),
+    ("loop_lag.p99_ms", False),
+    ("server.cpu_percent_avg", False),
+    ("server.rss_mb_max", False),
+]
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix: Dict[str, float] = {}
+    for item in text.split(","):
+        path, _, weight = item.strip().partition("=")
+        if not path:
+            continue
+        mix[path if path.startswith("/") else f"/{path}"] = float(weight or 1)
+    if not mix:
+        raise ValueError("请求组合为空")
+    return mix
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(latencies: List[float], errors: int, duration: float) -> Dict[str, Any]:
+    ms = [value * 1000 for value in latencies]
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_sec": round(len(latencies) / duration, 1),
+        "p50_ms": round(percentile(ms, 50) or 0.0, 3),
+        "p99_ms": round(percentile(ms, 99) or 0.0, 3),
+        "mean_ms": round(sum(ms) / len(ms), 3) if ms else 0.0,
+        "max_ms": round(max(ms), 3) if ms else 0.0,
+    }
+
+
+def parse_loop_lag(text: str) -> Tuple[List[Tuple[float, int]], int, float]:
+    """从 /metrics 文本中取出事件循环延迟直方图：([(le, 累积计数)], 总数, 总和)"""
+    buckets: List[Tuple[float, int]] = []
+    count, total = 0, 0.0
+    prefix = "booltox_monitor_event_loop_lag_seconds"
+    for line in text.splitlines():
+        if not line.startswith(prefix):
+            continue
+        name, _, value = line.rpartition(" ")
+        if name.startswith(f"{prefix}_bucket"):
+            le = name.split('le="', 1)[1].split('"', 1)[0]
+            buckets.append((float("inf") if le == "+Inf" else float(le), int(float(value))))
+        elif name == f"{prefix}_count":
+            count = int(float(value))
+        elif name == f"{prefix}_sum":
+            total = float(value)
+    return buckets, count, total
+
+
+def loop_lag_delta(before: str, after: str) -> Dict[str, Any]:
+    """两次抓取之间的事件循环延迟：均值与 p99（取直方图桶上界）"""
+    b_buckets, b_count, b_sum = parse_loop_lag(before)
+    a_buckets, a_count, a_sum = parse_loop_lag(after)
+    count = a_count - b_count
+    if count <= 0:
+        return {"samples": 0, "mean_ms": 0.0, "p99_ms": 0.0}
+    previous = dict(b_buckets)
+    p99 = None
+    for le, cumulative in a_buckets:
+        if cumulative - previous.get(le, 0) >= 0.99 * count:
+            p99 = le
+            break
+    return {
+        "samples": count,
+        "mean_ms": round((a_sum - b_sum) / count * 1000, 3),
+        "p99_ms": None if p99 is None or p99 == float("inf") else round(p99 * 1000, 3),
+    }
+
+
+class ServerProcess:
+    """启动被测服务，并在后台采样其 CPU 与 RSS"""
+
+    def __init__(self, port: int, env: Dict[str, str]):
+        self.port = port
+        script = Path(__file__).with_name("http_server.py")
+        self.process = subprocess.Popen(
+            [sys.executable, str(script)],
+            cwd=script.parent,
+            env={**os.environ, "MONITOR_PORT": str(port), **env},
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        self.handle = psutil.Process(self.process.pid)
+        self.cpu: List[float] = []
+        self.rss: List[int] = []
+
+    async def wait_ready(self, client: httpx.AsyncClient, timeout: float = 15.0) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"服务进程已退出，退出码 {self.process.returncode}")
+            try:
+                response = await client.get("/api/cpu")
+                if response.status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+        raise RuntimeError("等待服务启动超时")
+
+    async def sample(self, stop: asyncio.Event, interval: float = 0.5) -> None:
+        self.handle.cpu_percent()
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self.cpu.append(self.handle.cpu_percent())
+            self.rss.append(self.handle.memory_info().rss)
+
+    def stop(self) -> None:
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "cpu_percent_avg": round(sum(self.cpu) / len(self.cpu), 1) if self.cpu else 0.0,
+            "cpu_percent_max": round(max(self.cpu), 1) if self.cpu else 0.0,
+            "rss_mb_max": round(max(self.rss) / 2 ** 20, 1) if self.rss else 0.0,
+        }
+
+
+async def http_worker(
+    client: httpx.AsyncClient,
+    routes: List[str],
+    weights: List[float],
+    rng: random.Random,
+    deadline: float,
+    results: Dict[str, Dict[str, Any]],
+) -> None:
+    while time.monotonic() < deadline:
+        route = rng.choices(routes, weights)[0]
+        stats = results[route]
+        started = time.perf_counter()
+        try:
+            response = await client.get(route)
+            if response.status_code >= 400:
+                stats["errors"] += 1
+            else:
+                stats["latencies"].append(time.perf_counter() - started)
+        except httpx.HTTPError:
+            stats["errors"] += 1
+
+
+async def ws_subscriber(url: str, deadline: float, counts: List[int], index: int, ready: asyncio.Event) -> None:
+    try:
+        async with websockets.connect(url, max_size=2 ** 24) as connection:
+            ready.set()
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    await asyncio.wait_for(connection.recv(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    return
+                counts[index] += 1
+    except (OSError, websockets.exceptions.WebSocketException):
+        counts[index] = -1
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    mix = parse_mix(args.mix) if args.mix else DEFAULT_MIX
+    routes, weights = list(mix), list(mix.values())
+    env = {**DEFAULT_ENV, **dict(item.split("=", 1) for item in args.env)}
+    server = ServerProcess(args.port, env)
+    base_url = f"http://127.0.0.1:{args.port}"
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+            await server.wait_ready(client)
+            # 预热：让采样器、缓存与 JIT 式的首调用开销在计时前完成
+            warmup_end = time.monotonic() + args.warmup
+            warmup_results = {route: {"latencies": [], "errors": 0} for route in routes}
+            await asyncio.gather(*(
+                http_worker(client, routes, weights, random.Random(i), warmup_end, warmup_results)
+                for i in range(args.concurrency)
+            ))
+
+            stop = asyncio.Event()
+            sampler = asyncio.create_task(server.sample(stop))
+            ws_url = f"ws://127.0.0.1:{args.port}/ws/monitor"
+            if args.ws_version == 2:
+                ws_url += "?version=2&encoding=msgpack"
+            ws_counts = [0] * args.ws
+            ws_ready = [asyncio.Event() for _ in range(args.ws)]
+            deadline = time.monotonic() + args.duration + 1.0
+            ws_tasks = [
+                asyncio.create_task(ws_subscriber(ws_url, deadline, ws_counts, i, ws_ready[i]))
+                for i in range(args.ws)
+            ]
+            await asyncio.wait([asyncio.create_task(e.wait()) for e in ws_ready] or [asyncio.sleep(0)], timeout=5)
+
+            metrics_before = (await client.get("/metrics")).text
+            results = {route: {"latencies": [], "errors": 0} for route in routes}
+            started = time.monotonic()
+            deadline = started + args.duration
+            await asyncio.gather(*(
+                http_worker(client, routes, weights, random.Random(args.seed + i), deadline, results)
+                for i in range(args.concurrency)
+            ))
+            elapsed = time.monotonic() - started
+            await asyncio.gather(*ws_tasks)
+            metrics_after = (await client.get("/metrics")).text
+            stop.set()
+            await sampler
+    finally:
+        server.stop()
+
+    all_latencies = [value for stats in results.values() for value in stats["latencies"]]
+    connected = [count for count in ws_counts if count >= 0]
+    ws_window = args.duration + 1.0
+    return {
+        "timestamp": time.time(),
+        "host": {"platform": platform.platform(), "python": platform.python_version(), "cpus": psutil.cpu_count()},
+        "config": {
+            "duration": args.duration,
+            "concurrency": args.concurrency,
+            "ws_clients": args.ws,
+            "ws_version": args.ws_version,
+            "seed": args.seed,
+            "mix": mix,
+            "env": env,
+        },
+        "http": {
+            "total": summarize(all_latencies, sum(s["errors"] for s in results.values()), elapsed),
+            "routes": {route: summarize(s["latencies"], s["errors"], elapsed) for route, s in results.items()},
+        },
+        "websocket": {
+            "clients": args.ws,
+            "failed": args.ws - len(connected),
+            "frames": sum(connected),
+            "frames_per_sec_per_client": round(sum(connected) / len(connected) / ws_window, 3) if connected else 0.0,
+        },
+        "loop_lag": loop_lag_delta(metrics_before, metrics_after),
+        "server": server.summary(),
+    }
+
+
+def lookup(data: Dict[str, Any], path: str) -> Optional[float]:
+    for key in path.split("."):
+        if not isinstance(data, dict) or key not in data:
+            return None
+        data = data[key]
+    return data if isinstance(data, (int, float)) else None
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """返回劣化超过容差的指标说明；分母过小（如接近 0 的延迟）时按绝对值 0.5 放宽"""
+    regressions = []
+    print(f"\n{'指标':<40}{'基线':>12}{'本次':>12}{'变化':>10}")
+    for path, higher_is_better in COMPARED_METRICS:
+        old, new = lookup(baseline, path), lookup(result, path)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old if old else 0.0
+        worse = (old - new if higher_is_better else new - old) > max(abs(old) * tolerance, 0.5)
+        flag = "  ✗" if worse else ""
+        print(f"{path:<40}{old:>12.3f}{new:>12.3f}{change:>+9.1%}{flag}")
+        if worse:
+            regressions.append(f"{path}: {old} -> {new}")
+    return regressions
+
+
+def report(result: Dict[str, Any]) -> None:
+    print(f"{'路由':<60}{'请求数':>8}{'错误':>6}{'p50 ms':>10}{'p99 ms':>10}")
+    for route, stats in result["http"]["routes"].items():
+        print(f"{route:<60}{stats['requests']:>8}{stats['errors']:>6}{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+    total = result["http"]["total"]
+    print(f"{'总计':<60}{total['requests']:>8}{total['errors']:>6}{total['p50_ms']:>10.2f}{total['p99_ms']:>10.2f}")
+    print(f"吞吐: {total['requests_per_sec']} 请求/秒")
+    ws = result["websocket"]
+    print(f"WebSocket: {ws['clients']} 个订阅者（失败 {ws['failed']}），每个 {ws['frames_per_sec_per_client']} 帧/秒")
+    lag = result["loop_lag"]
+    print(f"事件循环延迟: 平均 {lag['mean_ms']} ms，p99 ≤ {lag['p99_ms']} ms（{lag['samples']} 个样本）")
+    server = result["server"]
+    print(f"服务端: CPU 平均 {server['cpu_percent_avg']}%，峰值 {server['cpu_percent_max']}%，RSS 峰值 {server['rss_mb_max']} MB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="监控后端负载与延迟基准")
+    parser.add_argument("--port", type=int, default=8131, help="被测服务端口")
+    parser.add_argument("--duration", type=float, default=10.0, help="压测时长（秒）")
+    parser.add_argument("--warmup", type=float, default=2.0, help="预热时长（秒）")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发 HTTP 连接数")
+    parser.add_argument("--ws", type=int, default=10, help="/ws/monitor 订阅者数量")
+    parser.add_argument("--ws-version", type=int, choices=(1, 2), default=1, help="订阅者使用的推送协议版本")
+    parser.add_argument("--mix", default="", help='请求组合，如 "/api/cpu=4,/api/snapshot=1"')
+    parser.add_argument("--seed", type=int, default=1, help="请求组合的随机种子")
+    parser.add_argument("--env", action="append", default=[], help="传给服务端的环境变量，如 MONITOR_HISTORY_RETENTION=24h（默认 10m）")
+    parser.add_argument("--output", help="结果 JSON 的写入路径")
+    parser.add_argument("--baseline", help="用于比较的基线结果 JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的劣化比例（默认 0.2 即 20%%）")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    report(result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入 {args.output}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} 项指标劣化超过 {args.tolerance:.0%}:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            sys.exit(1)
+        print("\n与基线相比无明显劣化")
+
+
+if __name__ == "__main__":
+    main()
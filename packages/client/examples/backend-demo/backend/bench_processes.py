@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+进程树刷新与构建的基准
+- 真实进程表：启动 N 个 sleep 子进程（默认 5000，仅 POSIX），对每个采集后端测量首次刷新 + 构建、
+  之后每次刷新 + 构建（/api/processes/tree 的实际开销），以及只构建树的耗时
+- 合成表：构造 N 个进程（随机父子关系、最大深度约 20）的进程表，测量深层树的构建
+- 本机：展开若干节点的详情
+
+用法: python3 bench_processes.py [--processes 5000] [--rounds 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import time
+
+from collectors import COLLECTORS, create_collector
+from http_server import ProcessTable, _ProcessEntry
+
+
+def synthetic_table(count: int, seed: int = 1) -> ProcessTable:
+    rng = random.Random(seed)
+    table = ProcessTable(min_refresh_interval=float("inf"))
+    depth = {1: 0}
+    pids = [1]
+    for pid in range(2, count + 1):
+        # 偏向挂在较早的进程下，形成少数大分支与若干深链
+        parent = pids[int(len(pids) * rng.random() ** 2)]
+        if depth[parent] >= 20:
+            parent = 1
+        depth[pid] = depth[parent] + 1
+        pids.append(pid)
+        entry = _ProcessEntry(pid, 1.7e9 + pid, f"proc-{pid}")
+        entry.ppid = parent
+        entry.cpu_percent = rng.random() * 10
+        entry.memory_percent = rng.random()
+        table._entries[pid] = entry
+    table._entries[1] = _ProcessEntry(1, 1.7e9, "init")
+    return table
+
+
+def measure(call, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        began = time.perf_counter()
+        call()
+        best = min(best, time.perf_counter() - began)
+    return best
+
+
+def spawn(count: int) -> list:
+    return [
+        subprocess.Popen(["sleep", "3600"], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+        for _ in range(count)
+    ]
+
+
+def bench_real(rounds: int) -> None:
+    for kind in COLLECTORS[1:]:
+        try:
+            collector = create_collector(kind)
+        except (OSError, ValueError):
+            continue
+        table = ProcessTable(min_refresh_interval=0, collector=collector)
+        began = time.perf_counter()
+        table.tree()
+        first = time.perf_counter() - began
+        refresh = measure(table.tree, rounds)
+        table.min_refresh_interval = float("inf")
+        build = measure(table.tree, rounds)
+        print(
+            f"{kind:>7}: {len(table._entries)} 个进程，首次 {first * 1000:.1f} ms，"
+            f"刷新 + 构建 {refresh * 1000:.1f} ms，只构建 {build * 1000:.1f} ms"
+        )
+        collector.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="进程树刷新与构建基准")
+    parser.add_argument("--processes", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    if os.name == "posix" and args.processes > 0:
+        children = spawn(args.processes)
+        try:
+            print(f"真实进程表（另启动 {args.processes} 个 sleep 子进程）:")
+            bench_real(args.rounds)
+        finally:
+            for child in children:
+                child.kill()
+            for child in children:
+                child.wait()
+    print("本机进程表:")
+    bench_real(args.rounds)
+
+    table = synthetic_table(max(args.processes, 2))
+    build = measure(table.tree, args.rounds)
+    encoded = len(json.dumps(table.tree()))
+    print(f"合成 {len(table._entries)} 个进程（深度约 20）: 完整树构建 {build * 1000:.1f} ms，JSON {encoded / 1e3:.0f} KB")
+    top = measure(lambda: table.tree(depth=1), args.rounds)
+    print(f"合成 {len(table._entries)} 个进程: 只展开一层 {top * 1000:.1f} ms")
+
+    table = ProcessTable(min_refresh_interval=0, collector=create_collector())
+    table.tree()
+    expand = (os.getpid(), os.getppid())
+    detail = measure(lambda: table.tree(expand=expand), args.rounds)
+    print(f"本机展开 {len(expand)} 个节点的详情: {detail * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+快照构建与编码的微基准
+使用合成的 psutil 计数器（默认 128 核、8 块网卡、16 块磁盘），对比每个采样周期：
+- before：嵌套 dict 快照 + 递归 flatten + 标准库 json 编码
+- after ：__slots__/array 记录 + 缓存路径的展开 + fast_json 编码（一次编码供所有订阅者复用）
+输出每周期耗时，以及 tracemalloc 统计的每周期临时分配峰值（周期内内存峰值减去周期开始时的占用）
+
+用法: python3 bench_snapshot.py [--ticks 200] [--cores 128] [--nics 8] [--disks 16] [--clients 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+import tracemalloc
+from collections import namedtuple
+from typing import Any, Callable, Dict, List
+
+from fast_json import BACKEND
+from monitor_protocol import MONITOR_GROUPS, encode, flatten
+from snapshot_model import CpuSample, MemorySample, MonitorSnapshot, NetworkSample
+from http_server import CounterRates
+
+Freq = namedtuple("Freq", "current min max")
+Mem = namedtuple("Mem", "total available used percent")
+Swap = namedtuple("Swap", "total used percent")
+Nic = namedtuple("Nic", "bytes_sent bytes_recv packets_sent packets_recv")
+Disk = namedtuple("Disk", "read_bytes write_bytes read_count write_count")
+
+NETWORK_FIELDS = {
+    "bytes_sent": "bytes_sent_per_sec",
+    "bytes_recv": "bytes_recv_per_sec",
+    "packets_sent": "packets_sent_per_sec",
+    "packets_recv": "packets_recv_per_sec",
+}
+DISK_IO_FIELDS = {
+    "read_bytes": "read_bytes_per_sec",
+    "write_bytes": "write_bytes_per_sec",
+    "read_count": "read_iops",
+    "write_count": "write_iops",
+}
+
+
+class Inputs:
+    """每个周期生成一份递增的合成计数器"""
+
+    def __init__(self, cores: int, nics: int, disks: int):
+        self.cores = cores
+        self.nic_names = [f"eth{i}" for i in range(nics)]
+        self.disk_names = [f"nvme{i}n1" for i in range(disks)]
+        self.tick = 0
+
+    def next(self) -> Dict[str, Any]:
+        self.tick += 1
+        t = self.tick
+        return {
+            "percent": 12.5 + t % 7,
+            "per_core": [float((t + i) % 100) for i in range(self.cores)],
+            "freq": Freq(2400.0 + t % 3, 800.0, 4800.0),
+            "mem": Mem(64 << 30, (32 << 30) - t * 4096, (32 << 30) + t * 4096, 50.0),
+            "swap": Swap(8 << 30, 1 << 20, 0.01),
+            "nics": {n: Nic(t * 1500 + i, t * 3000 + i, t + i, t * 2 + i) for i, n in enumerate(self.nic_names)},
+            "disks": {d: Disk(t * 4096, t * 8192, t, t * 2) for d in self.disk_names},
+        }
+
+
+class LegacyRates:
+    """重构前的速率计算：每个设备一个 {速率字段: 值} dict"""
+
+    def __init__(self, fields: Dict[str, str]):
+        self.fields = fields
+        self._prev: Dict[str, Any] = {}
+
+    def update(self, counters: Dict[str, Any], now: float) -> Dict[str, Dict[str, float]]:
+        rates = {}
+        current = {}
+        for name, counter in counters.items():
+            values = tuple(getattr(counter, field) for field in self.fields)
+            prev = self._prev.get(name)
+            if prev is None:
+                rates[name] = {rate: 0.0 for rate in self.fields.values()}
+            else:
+                elapsed = now - prev[0] or 1.0
+                rates[name] = {
+                    rate: round((c - p) / elapsed, 1) for rate, p, c in zip(self.fields.values(), prev[1], values)
+                }
+            current[name] = (now, values)
+        self._prev = current
+        return rates
+
+
+def legacy_tick(inputs: Dict[str, Any], state: Dict[str, LegacyRates], clients: int) -> int:
+    now = time.monotonic()
+    freq = inputs["freq"]
+    cpu = {
+        "percent": inputs["percent"],
+        "percent_per_core": inputs["per_core"],
+        "frequency": {"current": freq.current, "min": freq.min, "max": freq.max},
+    }
+    mem, swap = inputs["mem"], inputs["swap"]
+    memory = {
+        "total": mem.total, "available": mem.available, "used": mem.used, "percent": mem.percent,
+        "swap_total": swap.total, "swap_used": swap.used, "swap_percent": swap.percent,
+    }
+
+    rates = state["network"].update(inputs["nics"], now)
+    interfaces = {}
+    totals: Dict[str, Any] = dict.fromkeys(list(NETWORK_FIELDS) + list(NETWORK_FIELDS.values()), 0)
+    for nic, c in inputs["nics"].items():
+        info = {f: getattr(c, f) for f in NETWORK_FIELDS}
+        info.update(rates.get(nic, {}))
+        interfaces[nic] = info
+        for key in totals:
+            totals[key] += info.get(key, 0)
+    network = {**totals, "interfaces": interfaces}
+
+    disk_rates = state["disk_io"].update(inputs["disks"], now)
+    disk_io = {
+        d: {**{f: getattr(c, f) for f in DISK_IO_FIELDS}, **disk_rates.get(d, {})}
+        for d, c in inputs["disks"].items()
+    }
+    snapshot = {"cpu": cpu, "memory": memory, "network": network, "disk_io": disk_io, "timestamp": time.time()}
+
+    flat = flatten({group: snapshot.get(group) for group in MONITOR_GROUPS})
+    size = len(flat)
+    frame = json.dumps({"type": "monitor_data", "data": snapshot}, ensure_ascii=False, separators=(",", ":"))
+    for _ in range(clients):
+        size += len(frame)
+    return size
+
+
+def model_tick(inputs: Dict[str, Any], state: Dict[str, CounterRates], clients: int) -> int:
+    snapshot = MonitorSnapshot(
+        time.time(),
+        cpu=CpuSample(inputs["percent"], inputs["per_core"], inputs["freq"]),
+        memory=MemorySample(inputs["mem"], inputs["swap"]),
+        network=state["network"].update(inputs["nics"], NetworkSample),
+        disk_io=state["disk_io"].update(inputs["disks"]),
+    )
+    size = len(snapshot.flat())
+    frame, _ = encode({"type": "monitor_data", "data": snapshot.to_dict()}, "json")
+    for _ in range(clients):
+        size += len(frame)
+    return size
+
+
+def measure(name: str, tick: Callable[..., int], state: Dict[str, Any], args: argparse.Namespace) -> Dict[str, Any]:
+    inputs = Inputs(args.cores, args.nics, args.disks)
+    for _ in range(10):  # 预热：填满路径缓存与速率状态
+        tick(inputs.next(), state, args.clients)
+
+    batches = [inputs.next() for _ in range(args.ticks)]
+    start = time.perf_counter()
+    for data in batches:
+        tick(data, state, args.clients)
+    elapsed = time.perf_counter() - start
+
+    # 每个周期相对周期开始时的内存峰值，即该周期临时分配的最大字节数
+    peaks: List[int] = []
+    tracemalloc.start()
+    for data in batches:
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        tick(data, state, args.clients)
+        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    tracemalloc.stop()
+    return {
+        "name": name,
+        "us_per_tick": elapsed / args.ticks * 1e6,
+        "avg_peak_bytes": sum(peaks) / len(peaks),
+        "max_peak_bytes": max(peaks),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="快照构建与编码微基准")
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--cores", type=int, default=128)
+    parser.add_argument("--nics", type=int, default=8)
+    parser.add_argument("--disks", type=int, default=16)
+    parser.add_argument("--clients", type=int, default=10, help="每个周期的 v1 订阅者数量")
+    args = parser.parse_args()
+
+    results: List[Dict[str, Any]] = [
+        measure("before", legacy_tick, {"network": LegacyRates(NETWORK_FIELDS), "disk_io": LegacyRates(DISK_IO_FIELDS)}, args),
+        measure("after", model_tick, {"network": CounterRates(NETWORK_FIELDS, 0), "disk_io": CounterRates(DISK_IO_FIELDS, 0)}, args),
+    ]
+
+    print(f"{args.cores} 核 / {args.nics} 网卡 / {args.disks} 磁盘 / {args.clients} 订阅者，JSON 编码器: {BACKEND}")
+    print(f"{'':8}{'耗时/周期':>12}{'平均分配峰值':>14}{'最大分配峰值':>14}")
+    for r in results:
+        print(
+            f"{r['name']:8}{r['us_per_tick']:>10.1f}µs"
+            f"{r['avg_peak_bytes'] / 1024:>14.1f}KB{r['max_peak_bytes'] / 1024:>14.1f}KB"
+        )
+
+
+if __name__ == "__main__":
+    main()
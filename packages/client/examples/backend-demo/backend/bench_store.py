@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+持久化指标存储的基准
+在临时目录中写入 N 天的 1 秒数据（默认 7 天、12 个指标），输出：
+- 每次写入的耗时
+- 一周范围查询（约 300 个点）的耗时
+- 压缩为 1 分钟汇总前后的磁盘占用
+- 流式导出 1 小时 NDJSON 的耗时
+
+用法: python3 bench_store.py [--days 7] [--metrics 12]
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import shutil
+import tempfile
+import time
+
+from metric_store import MetricStore
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="持久化指标存储基准")
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--metrics", type=int, default=12)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="booltox-store-")
+    try:
+        metrics = [f"metric{i}" for i in range(args.metrics)]
+        store = MetricStore(directory, metrics)
+        samples = args.days * 86400
+        now = time.time()
+        start = now - samples
+        values = {name: 0.0 for name in metrics}
+
+        began = time.perf_counter()
+        for i in range(samples):
+            values["metric0"] = 50 + 50 * math.sin(i / 600)
+            store.record(start + i, values)
+        write = time.perf_counter() - began
+        print(f"写入 {samples} 个采样点: {write / samples * 1e6:.2f} µs/次，磁盘占用 {store.disk_usage() / 1e6:.1f} MB")
+
+        began = time.perf_counter()
+        result = store.query("metric0", start, now, samples / 300)
+        print(f"查询 {args.days} 天: {(time.perf_counter() - began) * 1000:.1f} ms，{len(result['avg'])} 个点")
+
+        began = time.perf_counter()
+        rows = sum(chunk.count(b"\n") for chunk in store.export(now - 3600, now, metrics, "ndjson"))
+        print(f"导出 1 小时 NDJSON: {(time.perf_counter() - began) * 1000:.1f} ms，{rows} 行")
+
+        store.raw_retention = 86400
+        began = time.perf_counter()
+        store.maintain(now)
+        print(f"压缩超过 1 天的原始数据: {time.perf_counter() - began:.2f} s，磁盘占用 {store.disk_usage() / 1e6:.1f} MB")
+
+        began = time.perf_counter()
+        result = store.query("metric0", start, now, samples / 300)
+        print(f"压缩后查询 {args.days} 天: {(time.perf_counter() - began) * 1000:.1f} ms，{len(result['avg'])} 个点")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+传输方式基准：Unix 域套接字 vs TCP 回环
+分别以 MONITOR_UDS 与 MONITOR_PORT=0 启动 http_server.py（从标准输出的 BOOLTOX_ENDPOINT 行读取端点），
+用原始套接字测量：
+- 长连接上连续请求的延迟（/healthz 只经过 bootstrap，/api/memory 经过完整应用）
+- 每次请求新建连接的耗时（connect + 请求 + 关闭）
+
+用法: python3 bench_transport.py [--requests 2000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from bootstrap import ENDPOINT_PREFIX
+
+CONTENT_LENGTH = re.compile(rb"content-length:\s*(\d+)", re.IGNORECASE)
+
+
+def start_server(env: Dict[str, str]) -> Tuple[subprocess.Popen, Dict[str, Any]]:
+    script = Path(__file__).with_name("http_server.py")
+    process = subprocess.Popen(
+        [sys.executable, str(script)],
+        cwd=script.parent,
+        env={**os.environ, "MONITOR_HISTORY_RETENTION": "0", **env},
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    line = process.stdout.readline().decode("utf-8")
+    if not line.startswith(ENDPOINT_PREFIX):
+        process.kill()
+        raise RuntimeError(f"未读取到端点行: {line!r}")
+    # 访问日志也写到标准输出，持续读走以免管道写满后服务端阻塞
+    threading.Thread(target=process.stdout.read, daemon=True).start()
+    return process, json.loads(line[len(ENDPOINT_PREFIX):])
+
+
+def connect(endpoint: Dict[str, Any]) -> socket.socket:
+    if endpoint["transport"] == "unix":
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(endpoint["path"])
+    else:
+        sock = socket.create_connection((endpoint["host"], endpoint["port"]))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+
+def request(sock: socket.socket, path: str) -> int:
+    """发送一个 HTTP/1.1 GET 并读完响应，返回状态码"""
+    sock.sendall(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    data = b""
+    while b"\r\n\r\n" not in data:
+        chunk = sock.recv(65536)
+        if not chunk:
+            raise ConnectionError("连接被关闭")
+        data += chunk
+    head, _, body = data.partition(b"\r\n\r\n")
+    match = CONTENT_LENGTH.search(head)
+    length = int(match.group(1)) if match else 0
+    while len(body) < length:
+        body += sock.recv(65536)
+    return int(head[9:12])
+
+
+def wait_ready(endpoint: Dict[str, Any], timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        sock = connect(endpoint)
+        try:
+            if request(sock, "/healthz") == 200:
+                return
+        finally:
+            sock.close()
+        time.sleep(0.05)
+    raise RuntimeError("等待服务就绪超时")
+
+
+def timings(call: Callable[[], Any], count: int) -> List[float]:
+    for _ in range(min(100, count)):
+        call()
+    samples = []
+    for _ in range(count):
+        began = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - began)
+    return samples
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "p50_us": ordered[len(ordered) // 2] * 1e6,
+        "p99_us": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1e6,
+        "per_sec": len(samples) / sum(samples),
+    }
+
+
+def bench(endpoint: Dict[str, Any], count: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    sock = connect(endpoint)
+    try:
+        for path in ("/healthz", "/api/memory"):
+            results[f"长连接 {path}"] = summarize(timings(lambda: request(sock, path), count))
+    finally:
+        sock.close()
+
+    def fresh() -> None:
+        conn = connect(endpoint)
+        try:
+            request(conn, "/healthz")
+        finally:
+            conn.close()
+
+    def connect_only() -> None:
+        connect(endpoint).close()
+
+    results["新建连接 + /healthz"] = summarize(timings(fresh, count))
+    results["仅 connect"] = summarize(timings(connect_only, count))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Unix 域套接字与 TCP 传输基准")
+    parser.add_argument("--requests", type=int, default=2000, help="每个场景的请求数")
+    args = parser.parse_args()
+    if not hasattr(socket, "AF_UNIX"):
+        sys.exit("错误: 当前平台不支持 Unix 域套接字")
+
+    directory = tempfile.mkdtemp(prefix="booltox-uds-")
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for label, env in (
+        ("tcp", {"MONITOR_PORT": "0"}),
+        ("unix", {"MONITOR_UDS": os.path.join(directory, "monitor.sock")}),
+    ):
+        process, endpoint = start_server(env)
+        try:
+            wait_ready(endpoint)
+            results[label] = bench(endpoint, args.requests)
+        finally:
+            process.terminate()
+            process.wait()
+    os.rmdir(directory)
+
+    print(f"{'场景':<24}{'TCP p50':>10}{'UDS p50':>10}{'TCP p99':>10}{'UDS p99':>10}{'TCP/s':>9}{'UDS/s':>9}")
+    for scenario in results["tcp"]:
+        tcp, uds = results["tcp"][scenario], results["unix"][scenario]
+        print(
+            f"{scenario:<24}{tcp['p50_us']:>8.0f}µs{uds['p50_us']:>8.0f}µs"
+            f"{tcp['p99_us']:>8.0f}µs{uds['p99_us']:>8.0f}µs{tcp['per_sec']:>9.0f}{uds['per_sec']:>9.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
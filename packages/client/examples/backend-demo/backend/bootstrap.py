@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+快速启动引导
+http_server.py 作为入口运行时由本模块接管启动流程，缩短 BoolTox 等待端口与首个响应的时间：
+
+1. 只导入 uvicorn 与 http_cache 即开始监听端口（约为完整导入的五分之一）
+2. 完整应用（FastAPI、NumPy、psutil 及所有路由）在后台线程中导入，完成后运行其 lifespan 并接管所有请求
+3. 应用就绪前：
+   - GET /healthz 返回 503 {"status": "starting"}，就绪后返回 200；导入失败返回 503 {"status": "error"}
+   - 前端页面（/ 与 /assets/*）直接由静态文件返回，浏览器可以先加载页面
+   - 其余 HTTP 与 WebSocket 请求等待应用就绪后再处理，不会失败
+4. 启动完成后在标准错误输出打印首个 2xx 响应与应用就绪距进程启动的耗时，/healthz 中也包含这两项
+
+监听端点：默认 TCP 127.0.0.1:8001；MONITOR_PORT=0 由系统分配空闲端口，MONITOR_UDS=/path/to.sock
+改为监听 Unix 域套接字。开始监听后标准输出打印一行端点描述，例如：
+    BOOLTOX_ENDPOINT {"transport":"tcp","host":"127.0.0.1","port":43817,"url":"http://127.0.0.1:43817/"}
+    BOOLTOX_ENDPOINT {"transport":"unix","path":"/run/user/1000/booltox-monitor.sock","url":"http://localhost/"}
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import os
+import socket
+import stat
+import sys
+import time
+from contextlib import AsyncExitStack
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import uvicorn
+except ImportError:
+    print("错误: fastapi 和 uvicorn 未安装，请运行: pip install fastapi uvicorn", file=sys.stderr)
+    sys.exit(1)
+
+from starlette.exceptions import HTTPException
+
+from fast_json import dumps
+from http_cache import LazyStaticFiles
+
+
+# 监听地址与端口；端口设为 0 时由系统分配空闲端口，同一台机器上可同时运行多个实例
+HOST = os.environ.get("MONITOR_HOST", "127.0.0.1")
+PORT = int(os.environ.get("MONITOR_PORT", "8001"))
+
+# Unix 域套接字路径，设置后改为监听该套接字（不再监听 TCP 端口）
+UDS_PATH = os.environ.get("MONITOR_UDS", "")
+
+# 开始监听后在标准输出打印一行 "BOOLTOX_ENDPOINT {json}"，供启动器获取实际端点
+ENDPOINT_PREFIX = "BOOLTOX_ENDPOINT "
+
+DIST_PATH = Path(__file__).parent.parent / "dist"
+
+_IMPORTED_AT = time.perf_counter()
+
+
+def _startup_offset() -> float:
+    """本模块导入时距进程创建的秒数（解释器启动耗时），精度为一个时钟节拍；非 Linux 上为 0"""
+    try:
+        with open("/proc/uptime", "rb") as f:
+            uptime = float(f.read().split()[0])
+        with open("/proc/self/stat", "rb") as f:
+            # 进程名可能含空格，从最后一个 ")" 之后计数；starttime 是第 22 个字段
+            started = int(f.read().rsplit(b")", 1)[1].split()[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return 0.0
+    return max(0.0, uptime - started - (time.perf_counter() - _IMPORTED_AT))
+
+
+class BootstrapApp:
+    """在完整应用导入期间应答就绪探针与静态页面，导入完成后把请求转发给完整应用"""
+
+    def __init__(self, module_name: str, unix_path: Optional[str] = None):
+        self.module_name = module_name
+        self.unix_path = unix_path  # 退出时删除的套接字文件
+        self.app: Any = None
+        self.error: Optional[str] = None
+        self.exit_code = 0
+        self.server: Optional[uvicorn.Server] = None
+        self.first_response: Optional[float] = None  # 首个 2xx 响应距进程启动的秒数
+        self.ready_at: Optional[float] = None  # 应用就绪距进程启动的秒数
+        self.static = LazyStaticFiles(DIST_PATH) if (DIST_PATH / "index.html").exists() else None
+        self._ready = asyncio.Event()
+        self._stack = AsyncExitStack()
+        self._offset: Optional[float] = None
+
+    def _elapsed(self) -> float:
+        """距进程启动的秒数；解释器启动耗时在首次用到时读取"""
+        if self._offset is None:
+            self._offset = _startup_offset()
+        return self._offset + time.perf_counter() - _IMPORTED_AT
+
+    def _import(self) -> Any:
+        return importlib.import_module(self.module_name).app
+
+    async def _load(self) -> None:
+        # 等端口开始监听后再导入，避免导入线程与监听前的初始化争抢 GIL
+        while self.server is not None and not self.server.started and not self.server.should_exit:
+            await asyncio.sleep(0.002)
+        try:
+            app = await asyncio.to_thread(self._import)
+            await self._stack.enter_async_context(app.router.lifespan_context(app))
+            self.app = app
+            self.ready_at = self._elapsed()
+            print(f"应用就绪: {self.ready_at * 1000:.0f} ms（自进程启动）", file=sys.stderr)
+        except SystemExit as e:
+            # 依赖缺失或配置错误时应用模块已打印原因，以相同的退出码结束进程
+            self.error = "应用启动失败"
+            self.exit_code = e.code if isinstance(e.code, int) else 1
+            if self.server is not None:
+                self.server.should_exit = True
+        except Exception as e:
+            self.error = f"应用启动失败: {e}"
+            print(f"错误: {self.error}", file=sys.stderr)
+        finally:
+            self._ready.set()
+
+    async def _lifespan(self, receive: Any, send: Any) -> None:
+        await receive()  # lifespan.startup
+        loading = asyncio.create_task(self._load())
+        await send({"type": "lifespan.startup.complete"})
+        await receive()  # lifespan.shutdown
+        if not loading.done():
+            loading.cancel()
+        try:
+            await loading
+        except asyncio.CancelledError:
+            pass
+        await self._stack.aclose()
+        self.remove_socket_file()
+        await send({"type": "lifespan.shutdown.complete"})
+
+    def remove_socket_file(self) -> None:
+        """删除 Unix 域套接字文件；uvicorn 收到信号退出时会重新发出该信号，不能只依赖 main 中的清理"""
+        if self.unix_path is not None:
+            try:
+                os.unlink(self.unix_path)
+            except OSError:
+                pass
+            self.unix_path = None
+
+    def health(self) -> Dict[str, Any]:
+        status = "error" if self.error else ("ready" if self.app is not None else "starting")
+        return {
+            "status": status,
+            "error": self.error,
+            "uptime": round(self._elapsed(), 3),
+            "first_response_ms": None if self.first_response is None else round(self.first_response * 1000),
+            "ready_ms": None if self.ready_at is None else round(self.ready_at * 1000),
+        }
+
+    async def _send_health(self, send: Any) -> None:
+        health = self.health()
+        body = dumps(health)
+        await send({
+            "type": "http.response.start",
+            "status": 200 if health["status"] == "ready" else 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"cache-control", b"no-store"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    def _track(self, send: Any) -> Any:
+        """包装 send，记录首个 2xx 响应的时间"""
+        async def tracked(message: Dict[str, Any]) -> None:
+            if (
+                self.first_response is None
+                and message["type"] == "http.response.start"
+                and 200 <= message["status"] < 300
+            ):
+                self.first_response = self._elapsed()
+                print(f"首个 200 响应: {self.first_response * 1000:.0f} ms（自进程启动）", file=sys.stderr)
+            await send(message)
+
+        return tracked
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if self.first_response is None and scope["type"] == "http":
+            send = self._track(send)
+        if scope["type"] == "http" and scope["path"] == "/healthz":
+            await self._send_health(send)
+            return
+        if self.app is None and self.static is not None and scope["type"] == "http":
+            path = scope["path"]
+            if scope["method"] in ("GET", "HEAD") and (path == "/" or path.startswith("/assets/")):
+                try:
+                    response = await self.static.get_response("index.html" if path == "/" else path[1:], scope)
+                except HTTPException:
+                    response = None  # 文件不存在等情况交给完整应用处理
+                if response is not None:
+                    await response(scope, receive, send)
+                    return
+        if self.app is None:
+            await self._ready.wait()
+        if self.app is None:
+            if scope["type"] == "http":
+                await self._send_health(send)
+            elif scope["type"] == "websocket":
+                await send({"type": "websocket.close", "code": 1011})
+            return
+        await self.app(scope, receive, send)
+
+
+def _bind_unix(path: str) -> socket.socket:
+    if not hasattr(socket, "AF_UNIX"):
+        raise OSError("当前平台不支持 Unix 域套接字")
+    if os.path.exists(path):
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            raise OSError(f"{path} 已存在且不是套接字")
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except OSError:
+            os.unlink(path)  # 上次运行残留的套接字文件
+        else:
+            raise OSError(f"{path} 上已有实例在监听")
+        finally:
+            probe.close()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.bind(path)
+        os.chmod(path, 0o600)  # 只允许当前用户连接
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def _bind_tcp(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    # 显式指定 IPPROTO_TCP：asyncio 只对 proto 为 TCP 的连接设置 TCP_NODELAY，否则小响应会被 Nagle 算法延迟约 40 ms
+    sock = socket.socket(family, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+    if os.name != "nt":
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    try:
+        sock.bind((host, port))
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def listen() -> Tuple[socket.socket, Dict[str, Any]]:
+    """按 MONITOR_UDS / MONITOR_HOST / MONITOR_PORT 创建监听套接字，返回 (套接字, 端点描述)
+
+    在启动事件循环前即调用 listen()，启动器此后发起的连接会进入积压队列而不是被拒绝。
+    """
+    if UDS_PATH.strip():
+        path = os.path.abspath(os.path.expanduser(UDS_PATH.strip()))
+        sock = _bind_unix(path)
+        endpoint = {"transport": "unix", "path": path, "url": "http://localhost/"}
+    else:
+        sock = _bind_tcp(HOST, PORT)
+        port = sock.getsockname()[1]
+        host = f"[{HOST}]" if ":" in HOST else HOST
+        endpoint = {"transport": "tcp", "host": HOST, "port": port, "url": f"http://{host}:{port}/"}
+    sock.listen(2048)
+    return sock, endpoint
+
+
+def main(module_name: str) -> None:
+    """启动 HTTP 服务器，module_name 为提供 app 的模块"""
+    try:
+        sock, endpoint = listen()
+    except (OSError, ValueError) as e:
+        print(f"错误: 无法监听 {UDS_PATH or f'{HOST}:{PORT}'}: {e}", file=sys.stderr)
+        sys.exit(1)
+    where = endpoint["path"] if endpoint["transport"] == "unix" else endpoint["url"]
+    print(f"启动系统信息监控服务: {where}", file=sys.stderr)
+    print(ENDPOINT_PREFIX + dumps(endpoint).decode("utf-8"), flush=True)
+
+    bootstrap = BootstrapApp(module_name, endpoint["path"] if endpoint["transport"] == "unix" else None)
+    config = uvicorn.Config(bootstrap, log_level="info", lifespan="on")
+    server = bootstrap.server = uvicorn.Server(config)
+    try:
+        server.run(sockets=[sock])
+    finally:
+        sock.close()
+        bootstrap.remove_socket_file()
+    if bootstrap.exit_code:
+        sys.exit(bootstrap.exit_code)
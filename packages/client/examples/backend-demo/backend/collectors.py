@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+系统计数器采集后端
+SystemMonitor 的 CPU、内存、网络与磁盘 I/O 采样通过采集后端读取原始计数器：
+
+- PsutilCollector：直接调用 psutil，适用于所有平台
+- ProcfsCollector：Linux 上直接读取 /proc/stat、/proc/meminfo、/proc/net/dev、/proc/diskstats。
+  每个文件只 open 一次，之后每次采样用 pread(offset=0) 读取整个文件（seq_file 在偏移 0 处重新生成内容，
+  pread 不移动文件位置，可被多个线程并发调用）；解析时对整段内容一次 split 后按步长取字段，
+  或用 find 定位所需的键，不逐行切分。
+  进程表刷新所需的父进程、名称、CPU 时间与 RSS 由 process_stats() 逐个读取 /proc/<pid>/stat 得到。
+
+两个后端返回的字段与计算方式与 psutil 一致（CPU 时间按 CLOCK_TICKS 换算、内存 used/percent
+按 psutil 的口径计算、网络与磁盘计数器做与 psutil nowrap 相同的回绕修正），上层记录的输出完全相同。
+ProcfsCollector 遇到 psutil 需要额外估算的情况（如缺少 MemAvailable）时回退到 psutil。
+
+后端由环境变量 MONITOR_COLLECTOR 选择：auto（默认，Linux 上 /proc 可读时用 procfs）、procfs、psutil。
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+from collections import namedtuple
+from typing import Any, Dict, List, Optional, Tuple
+
+import psutil
+
+
+COLLECTORS = ("auto", "procfs", "psutil")
+
+# 采样只用到的字段；字段名与 psutil 的 namedtuple 相同，上层按属性名读取
+VirtualMemory = namedtuple("VirtualMemory", "total available percent used free")
+SwapMemory = namedtuple("SwapMemory", "total used free percent")
+NetIO = namedtuple("NetIO", "bytes_sent bytes_recv packets_sent packets_recv")
+DiskIO = namedtuple("DiskIO", "read_count write_count read_bytes write_bytes")
+
+# process_stats() 返回的单个进程：(ppid, name, create_time, cpu_time, rss)
+ProcessStat = Tuple[int, str, float, float, int]
+
+CPU_TIME_FIELDS = ("user", "nice", "system", "idle", "iowait", "irq", "softirq", "steal", "guest", "guest_nice")
+SECTOR_SIZE = 512
+
+
+def _percent(used: int, total: int) -> float:
+    """与 psutil.usage_percent(..., round_=1) 相同"""
+    try:
+        return round(float(used) / total * 100, 1)
+    except ZeroDivisionError:
+        return 0.0
+
+
+class PsutilCollector:
+    """通过 psutil 采集，所有平台可用"""
+
+    name = "psutil"
+
+    def cpu_times(self) -> Tuple[Any, List[Any]]:
+        """返回 (总体 cpu_times, 逐核 cpu_times)"""
+        return psutil.cpu_times(), psutil.cpu_times(percpu=True)
+
+    def memory(self) -> Tuple[Any, Any]:
+        """返回 (virtual_memory, swap_memory)"""
+        return psutil.virtual_memory(), psutil.swap_memory()
+
+    def net_io_counters(self) -> Dict[str, Any]:
+        return psutil.net_io_counters(pernic=True)
+
+    def disk_io_counters(self) -> Dict[str, Any]:
+        return psutil.disk_io_counters(perdisk=True) or {}
+
+    def close(self) -> None:
+        pass
+
+
+class ProcFile:
+    """持久打开的 /proc 文件，每次以 pread 从偏移 0 读取完整内容"""
+
+    def __init__(self, path: str, size: int = 16384):
+        self.path = path
+        self.size = size
+        self.fd = os.open(path, os.O_RDONLY | getattr(os, "O_CLOEXEC", 0))
+
+    def read(self) -> bytes:
+        while True:
+            data = os.pread(self.fd, self.size, 0)
+            if len(data) < self.size:
+                return data
+            # 内容可能被截断（如网卡或磁盘很多），扩大缓冲区后重读
+            self.size *= 2
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class _Nowrap:
+    """与 psutil 的 nowrap 相同的计数器回绕修正：计数器变小时把旧值累加到该字段的偏移量上"""
+
+    def __init__(self):
+        self._last: Dict[str, Tuple[int, ...]] = {}
+        self._offsets: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def apply(self, counters: Dict[str, Tuple[int, ...]]) -> Dict[str, Tuple[int, ...]]:
+        with self._lock:
+            last, offsets = self._last, self._offsets
+            for name in [name for name in offsets if name not in counters]:
+                del offsets[name]
+            result = {}
+            for name, values in counters.items():
+                previous = last.get(name)
+                if previous is None:
+                    result[name] = values
+                    continue
+                offset = offsets.get(name)
+                for i, (value, old) in enumerate(zip(values, previous)):
+                    if value < old:
+                        if offset is None:
+                            offset = offsets[name] = [0] * len(values)
+                        offset[i] += old
+                result[name] = values if offset is None else tuple(v + o for v, o in zip(values, offset))
+            self._last = counters
+            return result
+
+
+class ProcfsCollector:
+    """Linux /proc 快速采集；任一文件无法打开时构造失败（由 create_collector 回退到 psutil）"""
+
+    name = "procfs"
+
+    def __init__(self, root: str = "/proc"):
+        self.root = root
+        self.files: List[ProcFile] = []
+        try:
+            self._stat = self._open("stat")
+            self._meminfo = self._open("meminfo")
+            self._net_dev = self._open("net/dev")
+            self._diskstats = self._open("diskstats")
+        except OSError:
+            self.close()
+            raise
+        self.clock_ticks = float(os.sysconf("SC_CLK_TCK"))
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+        self._proc_dir: Optional[int] = None  # 首次调用 process_stats 时打开
+        self._boot_time = 0.0
+
+        # CPU 时间字段随内核版本为 7~10 个，与 psutil 相同地以第一行的字段数为准
+        first = self._stat.read().split(b"\n", 1)[0].split()
+        self.cpu_field_count = min(len(first) - 1, len(CPU_TIME_FIELDS))
+        if self.cpu_field_count < 7:
+            self.close()
+            raise OSError("无法识别 /proc/stat 格式")
+        self.CpuTimes = namedtuple("CpuTimes", CPU_TIME_FIELDS[:self.cpu_field_count])
+
+        self._net_nowrap = _Nowrap()
+        self._disk_nowrap = _Nowrap()
+
+    def _open(self, name: str) -> ProcFile:
+        proc_file = ProcFile(f"{self.root}/{name}")
+        self.files.append(proc_file)
+        return proc_file
+
+    def close(self) -> None:
+        for proc_file in self.files:
+            proc_file.close()
+        self.files = []
+        if self._proc_dir is not None:
+            os.close(self._proc_dir)
+            self._proc_dir = None
+
+    def cpu_times(self) -> Tuple[Any, List[Any]]:
+        """返回 (总体 cpu_times, 逐核 cpu_times)，取自同一次读取"""
+        data = self._stat.read()
+        # cpu 行位于文件开头，之后的 intr 行可能有上千个数字，只切分 cpu 行所在的前缀
+        end = 0
+        while data.startswith(b"cpu", end):
+            end = data.index(b"\n", end) + 1
+        tokens = data[:end].split()
+        stride = len(tokens) // (data.count(b"\n", 0, end) or 1)
+        count, ticks, CpuTimes = self.cpu_field_count, self.clock_ticks, self.CpuTimes
+        rows = [
+            CpuTimes(*[float(value) / ticks for value in tokens[start + 1:start + 1 + count]])
+            for start in range(0, len(tokens), stride)
+        ]
+        return rows[0], rows[1:]
+
+    def memory(self) -> Tuple[Any, Any]:
+        """返回 (virtual_memory, swap_memory)，取自同一次 /proc/meminfo 读取"""
+        data = self._meminfo.read()
+        total = _meminfo_value(data, b"MemTotal:")
+        free = _meminfo_value(data, b"MemFree:")
+        available = _meminfo_value(data, b"MemAvailable:")
+        swap_total = _meminfo_value(data, b"SwapTotal:")
+        swap_free = _meminfo_value(data, b"SwapFree:")
+        if total is None or free is None or not available:
+            # 缺少 MemAvailable 或其为 0 时 psutil 会用 /proc/zoneinfo 估算，直接交给 psutil
+            mem = psutil.virtual_memory()
+        else:
+            if available > total:
+                # 容器中数值失真时 psutil 以 free 代替
+                available = free
+            used = total - available
+            mem = VirtualMemory(total, available, _percent(used, total), used, free)
+        if swap_total is None or swap_free is None:
+            swap = psutil.swap_memory()
+        else:
+            swap_used = swap_total - swap_free
+            swap = SwapMemory(swap_total, swap_used, swap_free, _percent(swap_used, swap_total))
+        return mem, swap
+
+    def net_io_counters(self) -> Dict[str, Any]:
+        """逐网卡计数器，顺序与 /proc/net/dev 相同"""
+        data = self._net_dev.read()
+        # 跳过两行表头；网卡名不能包含冒号，名称与首个数字之间的冒号可能没有空格，替换后每行固定 17 个字段
+        start = data.index(b"\n", data.index(b"\n") + 1) + 1
+        tokens = data[start:].replace(b":", b" ").split()
+        if len(tokens) % 17:
+            raise ValueError("无法解析 /proc/net/dev")
+        raw = {
+            tokens[i].decode(): (int(tokens[i + 9]), int(tokens[i + 1]), int(tokens[i + 10]), int(tokens[i + 2]))
+            for i in range(0, len(tokens), 17)
+        }
+        return {name: NetIO(*values) for name, values in self._net_nowrap.apply(raw).items()}
+
+    def disk_io_counters(self) -> Dict[str, Any]:
+        """逐磁盘（含分区）计数器，字节数按 512 字节扇区换算，与 psutil 的 perdisk 结果一致"""
+        data = self._diskstats.read()
+        tokens = data.split()
+        lines = data.count(b"\n")
+        stride = len(tokens) // lines if lines else 0
+        if stride and stride * lines == len(tokens) and (stride == 14 or stride >= 18):
+            # 常见情况：所有行字段数相同（2.6+ 内核的磁盘行；4.18+ 为 18 个，5.5+ 为 20 个）
+            raw = {
+                tokens[i + 2].decode(): (
+                    int(tokens[i + 3]),
+                    int(tokens[i + 7]),
+                    int(tokens[i + 5]) * SECTOR_SIZE,
+                    int(tokens[i + 9]) * SECTOR_SIZE,
+                )
+                for i in range(0, len(tokens), stride)
+            }
+        else:
+            raw = dict(_parse_diskstats_line(line) for line in data.splitlines() if line.strip())
+        return {name: DiskIO(*values) for name, values in self._disk_nowrap.apply(raw).items()}
+
+    def process_stats(self) -> Dict[int, Optional[ProcessStat]]:
+        """所有进程的 {pid: (父进程, 名称, 启动时刻, CPU 时间, RSS 字节数)}
+
+        每个进程只读取一次 /proc/<pid>/stat，不创建 psutil.Process：几千个进程时比逐个 oneshot() 快数倍。
+        启动时刻与 psutil 的 create_time 口径相同（boot_time + starttime / CLOCK_TICKS），
+        名称是内核截断到 15 字节的 comm。无权读取的进程值为 None，读取期间退出的进程不在结果中。
+        """
+        if self._proc_dir is None:
+            flags = os.O_RDONLY | getattr(os, "O_DIRECTORY", 0) | getattr(os, "O_CLOEXEC", 0)
+            self._proc_dir = os.open(self.root, flags)
+            self._boot_time = psutil.boot_time()
+        proc_dir, ticks, page_size, boot_time = self._proc_dir, self.clock_ticks, self.page_size, self._boot_time
+        stats: Dict[int, Optional[ProcessStat]] = {}
+        for name in os.listdir(self.root):
+            if not name.isdigit():
+                continue
+            try:
+                fd = os.open(name + "/stat", os.O_RDONLY, dir_fd=proc_dir)
+                try:
+                    data = os.read(fd, 1024)
+                finally:
+                    os.close(fd)
+            except PermissionError:
+                stats[int(name)] = None
+                continue
+            except OSError:
+                continue  # ENOENT / ESRCH：进程已退出
+            # 进程名可能包含空格与括号，以最后一个 ")" 为界；其后依次是第 3 个字段 state 起的各字段
+            end = data.rfind(b")")
+            fields = data[end + 2:].split()
+            stats[int(name)] = (
+                int(fields[1]),
+                data[data.find(b"(") + 1:end].decode("utf-8", "replace"),
+                int(fields[19]) / ticks + boot_time,
+                (int(fields[11]) + int(fields[12])) / ticks,
+                int(fields[21]) * page_size,
+            )
+        return stats
+
+
+def _meminfo_value(data: bytes, key: bytes) -> Optional[int]:
+    """在 /proc/meminfo 内容中定位 "Key:   123 kB" 并返回字节数"""
+    if data.startswith(key):
+        start = len(key)
+    else:
+        start = data.find(b"\n" + key)
+        if start < 0:
+            return None
+        start += len(key) + 1
+    end = data.find(b"\n", start)
+    value = data[start:end if end >= 0 else len(data)]
+    return int(value[:-2] if value.endswith(b"kB") else value) * 1024
+
+
+def _parse_diskstats_line(line: bytes) -> Tuple[str, Tuple[int, int, int, int]]:
+    """按 psutil 的规则解析字段数不统一的 /proc/diskstats 行"""
+    fields = line.split()
+    if len(fields) == 15:
+        # Linux 2.4
+        name, reads, rbytes, writes, wbytes = fields[3], fields[2], fields[5], fields[7], fields[9]
+    elif len(fields) == 14 or len(fields) >= 18:
+        name, reads, rbytes, writes, wbytes = fields[2], fields[3], fields[5], fields[7], fields[9]
+    elif len(fields) == 7:
+        # Linux 2.6 的分区行
+        name, reads, rbytes, writes, wbytes = fields[2], fields[3], fields[4], fields[5], fields[6]
+    else:
+        raise ValueError(f"无法解析 /proc/diskstats 行: {line!r}")
+    return name.decode(), (int(reads), int(writes), int(rbytes) * SECTOR_SIZE, int(wbytes) * SECTOR_SIZE)
+
+
+def create_collector(kind: str = "auto") -> Any:
+    """按名称创建采集后端；auto 在非 Linux 或 /proc 不可用时使用 psutil"""
+    if kind not in COLLECTORS:
+        raise ValueError(f"未知的采集后端: {kind}，可选: {', '.join(COLLECTORS)}")
+    if kind == "psutil" or (kind == "auto" and not sys.platform.startswith("linux")):
+        return PsutilCollector()
+    try:
+        return ProcfsCollector()
+    except (OSError, ValueError):
+        if kind == "procfs":
+            raise
+        return PsutilCollector()
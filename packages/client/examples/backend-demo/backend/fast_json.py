@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+JSON 编码的唯一入口
+安装了 orjson 时使用 orjson（直接输出 UTF-8 字节，比标准库快数倍），否则回退到 json，
+两者输出均为紧凑格式、不转义非 ASCII 字符
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # 可选依赖，缺失时使用标准库
+    orjson = None
+
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def dumps(content: Any) -> bytes:
+    """编码为 UTF-8 JSON 字节"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_text(content: Any) -> str:
+    """编码为 JSON 字符串（WebSocket 文本帧使用）"""
+    if orjson is not None:
+        return orjson.dumps(content).decode("utf-8")
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"))
+
+
+class FastJSONResponse(JSONResponse):
+    """使用 dumps 渲染的 JSONResponse，作为应用的默认响应类"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
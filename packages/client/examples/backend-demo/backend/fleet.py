@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+多机汇聚（fleet）模式
+同一个 http_server.py 以汇聚模式启动时，为每个上游 /ws/monitor 维持一条长连接（v2 协议，
+优先 msgpack），在内存中按关键帧 + 增量帧还原每台主机的最新快照，
+再通过 /api/fleet 与 /ws/fleet 对外提供合并视图。
+
+- 每个上游一个协程，所有上游共享一个事件循环，数百个上游只占用数百个空闲连接
+- 断线后按指数退避（带随机抖动）重连，握手并发数有上限，避免同时重连风暴
+- 每台主机带有数据年龄与状态：ok（新鲜）/ stale（超过 stale_after 未更新或已断开）/ down（从未收到数据）
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from fast_json import dumps_text
+from monitor_protocol import MONITOR_GROUPS, apply_delta
+
+try:
+    import msgpack
+except ImportError:  # 可选依赖，缺失时上游改用 JSON 帧
+    msgpack = None
+
+try:
+    import websockets
+except ImportError:  # 仅汇聚模式需要
+    websockets = None
+
+
+# 重连退避：初始 0.5 秒，每次失败翻倍，最长 30 秒
+BACKOFF_INITIAL = 0.5
+BACKOFF_MAX = 30.0
+# 同时进行的握手数量上限
+CONNECT_CONCURRENCY = 32
+
+
+def parse_upstreams(text: str) -> List[Tuple[str, str]]:
+    """解析上游列表，返回 [(主机名, 基础 ws 地址)]
+
+    以逗号或空白分隔，每项可写作 host:port、http(s)://host:port、ws(s)://host:port/ws/monitor，
+    也可用 name=地址 指定显示名称；未指定名称时使用 host:port。
+    """
+    upstreams: List[Tuple[str, str]] = []
+    seen = set()
+    for item in text.replace(",", " ").split():
+        name, sep, address = item.partition("=")
+        if not sep:
+            name, address = "", item
+        if "://" not in address:
+            address = f"ws://{address}"
+        parts = urlsplit(address)
+        if parts.scheme not in ("ws", "wss", "http", "https") or not parts.hostname:
+            raise ValueError(f"无效的上游地址: {item}")
+        scheme = {"http": "ws", "https": "wss"}.get(parts.scheme, parts.scheme)
+        path = parts.path if parts.path not in ("", "/") else "/ws/monitor"
+        url = f"{scheme}://{parts.netloc}{path}"
+        name = name or parts.netloc
+        if name in seen:
+            raise ValueError(f"上游名称重复: {name}")
+        seen.add(name)
+        upstreams.append((name, url))
+    return upstreams
+
+
+def _tidy_floats(value: Any) -> Any:
+    """上游以 float32 打包浮点数，解包后还原为 7 位有效数字，避免 3.9000000953674316 这类尾差"""
+    if isinstance(value, float):
+        return float(f"{value:.7g}")
+    if isinstance(value, dict):
+        return {key: _tidy_floats(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_tidy_floats(item) for item in value]
+    return value
+
+
+class UpstreamHost:
+    """一个上游后端：长连接、还原出的最新快照与连接统计"""
+
+    def __init__(self, name: str, url: str, interval: float, groups: Sequence[str]):
+        self.name = name
+        self.encoding = "msgpack" if msgpack is not None else "json"
+        query = urlencode({"version": 2, "groups": ",".join(groups), "interval": interval, "encoding": self.encoding})
+        self.url = f"{url}?{query}"
+        self.data: Optional[Dict[str, Any]] = None
+        self.timestamp_ms: Optional[int] = None
+        self.received_at: Optional[float] = None  # time.monotonic()
+        self.connected = False
+        self.connects = 0
+        self.failures = 0
+        self.resyncs = 0
+        self.last_error: Optional[str] = None
+        self._seq: Optional[int] = None
+
+    def _decode(self, message: Any) -> Optional[Dict[str, Any]]:
+        try:
+            if isinstance(message, bytes):
+                frame = _tidy_floats(msgpack.unpackb(message, raw=False)) if msgpack is not None else None
+            else:
+                frame = json.loads(message)
+        except Exception:
+            return None
+        return frame if isinstance(frame, dict) else None
+
+    def handle(self, frame: Dict[str, Any]) -> bool:
+        """处理一帧；返回 False 表示增量无法应用，需要请求关键帧"""
+        kind = frame.get("type")
+        if kind == "keyframe":
+            self.data = frame.get("data") or {}
+            self._seq = frame.get("seq")
+        elif kind == "delta":
+            if self.data is None or frame.get("base") != self._seq:
+                self._seq = None
+                return False
+            if not apply_delta(self.data, frame.get("changes") or {}):
+                self._seq = None
+                return False
+            self._seq = frame.get("seq")
+        elif kind == "monitor_data":
+            # 不支持 v2 的旧版后端，每帧都是完整快照
+            data = frame.get("data") or {}
+            self.data = {group: data.get(group) for group in MONITOR_GROUPS if group in data}
+            self.timestamp_ms = int(data.get("timestamp", 0) * 1000) or None
+            self.received_at = time.monotonic()
+            return True
+        else:
+            return True
+        self.timestamp_ms = frame.get("timestamp_ms")
+        self.received_at = time.monotonic()
+        return True
+
+    async def run(self, connect_slots: asyncio.Semaphore) -> None:
+        """连接循环：断开后按指数退避重连，直到任务被取消"""
+        delay = BACKOFF_INITIAL
+        while True:
+            try:
+                async with connect_slots:
+                    connection = await websockets.connect(
+                        self.url, open_timeout=5, ping_interval=20, ping_timeout=20, close_timeout=1, max_size=2 ** 22
+                    )
+                self.connected = True
+                self.connects += 1
+                self._seq = None
+                try:
+                    async for message in connection:
+                        frame = self._decode(message)
+                        if frame is None:
+                            continue
+                        if not self.handle(frame):
+                            self.resyncs += 1
+                            await connection.send(dumps_text({"type": "resync"}))
+                        elif frame.get("type") in ("keyframe", "monitor_data"):
+                            delay = BACKOFF_INITIAL
+                finally:
+                    self.connected = False
+                    await connection.close()
+                self.last_error = "连接已关闭"
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.connected = False
+                self.last_error = f"{type(e).__name__}: {e}"
+            self.failures += 1
+            await asyncio.sleep(random.uniform(delay / 2, delay))
+            delay = min(delay * 2, BACKOFF_MAX)
+
+    def age(self, now: float) -> Optional[float]:
+        return None if self.received_at is None else now - self.received_at
+
+    def status(self, now: float, stale_after: float) -> str:
+        age = self.age(now)
+        if age is None:
+            return "down"
+        return "ok" if self.connected and age <= stale_after else "stale"
+
+    def describe(self, now: float, stale_after: float, groups: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        age = self.age(now)
+        info: Dict[str, Any] = {
+            "status": self.status(now, stale_after),
+            "connected": self.connected,
+            "age": round(age, 3) if age is not None else None,
+            "timestamp_ms": self.timestamp_ms,
+            "connects": self.connects,
+            "failures": self.failures,
+            "resyncs": self.resyncs,
+            "last_error": self.last_error,
+        }
+        if self.data is not None:
+            info["data"] = self.data if groups is None else {g: self.data.get(g) for g in groups if g in self.data}
+        else:
+            info["data"] = None
+        return info
+
+
+class FleetView:
+    """一次广播的汇聚视图；同一分组组合只编码一次，供所有订阅者共享"""
+
+    __slots__ = ("legacy_frame",)
+
+    def __init__(self, payload: Dict[str, Any]):
+        self.legacy_frame = dumps_text(payload)
+
+
+class FleetAggregator:
+    """管理所有上游连接，并定期向 /ws/fleet 订阅者广播合并视图"""
+
+    def __init__(
+        self,
+        upstreams: Sequence[Tuple[str, str]],
+        interval: float = 1.0,
+        stale_after: float = 10.0,
+        groups: Sequence[str] = MONITOR_GROUPS,
+    ):
+        if websockets is None:
+            raise RuntimeError("websockets 库未安装，请运行: pip install websockets")
+        self.interval = interval
+        self.stale_after = stale_after
+        self.hosts: Dict[str, UpstreamHost] = {
+            name: UpstreamHost(name, url, interval, groups) for name, url in upstreams
+        }
+        self.clients: List[Any] = []  # MonitorClient，v1 订阅，groups 决定帧内容
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        """为每个上游启动连接任务，并启动广播任务"""
+        connect_slots = asyncio.Semaphore(CONNECT_CONCURRENCY)
+        self._tasks = [asyncio.create_task(host.run(connect_slots)) for host in self.hosts.values()]
+        self._tasks.append(asyncio.create_task(self.broadcast_loop()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def snapshot(
+        self,
+        groups: Optional[Sequence[str]] = None,
+        names: Optional[Iterable[str]] = None,
+    ) -> Dict[str, Any]:
+        """合并视图：{"timestamp", "summary": {状态: 主机数}, "hosts": {主机名: {...}}}"""
+        now = time.monotonic()
+        selected = self.hosts if names is None else {n: self.hosts[n] for n in names if n in self.hosts}
+        hosts = {name: host.describe(now, self.stale_after, groups) for name, host in selected.items()}
+        summary = {"ok": 0, "stale": 0, "down": 0}
+        for info in hosts.values():
+            summary[info["status"]] += 1
+        return {"timestamp": time.time(), "summary": summary, "hosts": hosts}
+
+    def add_client(self, client: Any) -> None:
+        self.clients.append(client)
+
+    def remove_client(self, client: Any) -> None:
+        if client in self.clients:
+            self.clients.remove(client)
+
+    def broadcast(self) -> None:
+        """每个订阅者收到完整的合并视图，因此被合并（跳过）的帧不会丢失主机数据"""
+        views: Dict[Tuple[str, ...], FleetView] = {}
+        for client in list(self.clients):
+            key = tuple(client.subscription.groups)
+            view = views.get(key)
+            if view is None:
+                view = views[key] = FleetView({"type": "fleet_data", **self.snapshot(key)})
+            client.offer(view)
+
+    async def broadcast_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            if self.clients:
+                self.broadcast()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+HTTP 缓存与压缩
+- CompressionMiddleware：按 Accept-Encoding 协商 br/gzip 压缩 JSON 等文本响应
+- PrecompressedStaticFiles：优先返回构建时生成的 .br/.gz 文件，带哈希的文件名长期缓存
+- LazyStaticFiles：首次请求时才创建 PrecompressedStaticFiles，不占用启动时间
+- json_response_with_etag：带 ETag 的 JSON 响应，支持条件请求（304）
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import os
+import re
+from mimetypes import guess_type
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from fast_json import dumps
+
+try:
+    import brotli
+except ImportError:  # 可选依赖，缺失时只提供 gzip
+    brotli = None
+
+
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+COMPRESSIBLE_TYPES = ("application/json", "application/openmetrics-text", "text/")
+
+# Vite 只把带哈希的产物输出到 assets/ 目录，文件名形如 index-BfD3k2xQ.js（8 位 base64url 哈希），可长期缓存；
+# 其他文件即使名称像哈希（如 index.interface.js、my-component.css）也每次协商缓存。
+# 匹配的是相对 dist 的路径：挂载在 /assets 的实例以 prefix="assets/" 补上挂载路径
+HASHED_ASSET = re.compile(r"^assets/[^/]+-[0-9A-Za-z_-]{8}\.[0-9A-Za-z]+$")
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+
+def accepted_encodings(header: str) -> List[str]:
+    """解析 Accept-Encoding，返回 q > 0 的编码（小写）"""
+    encodings = []
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q > 0:
+            encodings.append(name)
+    return encodings
+
+
+def negotiate_encoding(header: str) -> Optional[str]:
+    """按服务端偏好（br 优先于 gzip）选择压缩编码"""
+    accepted = accepted_encodings(header)
+    for encoding in SUPPORTED_ENCODINGS:
+        if encoding in accepted:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+class CompressionMiddleware:
+    """压缩一次性返回的文本响应（JSON、OpenMetrics 等）
+
+    流式响应、已设置 Content-Encoding 的响应（如预压缩静态文件）与过小的响应原样透传。
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if start is None:
+                await send(message)
+                return
+
+            initial, start = start, None
+            headers = MutableHeaders(raw=initial["headers"])
+            body = message.get("body", b"")
+            content_type = headers.get("content-type", "")
+            if (
+                message.get("more_body")
+                or "content-encoding" in headers
+                or len(body) < self.minimum_size
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            ):
+                await send(initial)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            if "accept-encoding" not in headers.get("vary", "").lower():
+                headers.add_vary_header("Accept-Encoding")
+            # 压缩后的表示与原文不同，强 ETag 需降级为弱 ETag
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+            await send(initial)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """优先返回同名的 .br/.gz 预压缩文件，并按文件名是否带哈希设置缓存头
+
+    prefix 为 directory 相对 dist 的路径（如 "assets/"），与文件的相对路径拼接后匹配 HASHED_ASSET。
+    """
+
+    def __init__(self, *args: Any, prefix: str = "", **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.prefix = prefix
+
+    def file_response(
+        self,
+        full_path: Any,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+        media_type = guess_type(str(full_path))[0] or "text/plain"
+
+        response: Optional[Response] = None
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if encoding not in accepted:
+                continue
+            candidate = f"{full_path}{suffix}"
+            try:
+                candidate_stat = os.stat(candidate)
+            except OSError:
+                continue
+            response = FileResponse(
+                candidate,
+                status_code=status_code,
+                stat_result=candidate_stat,
+                media_type=media_type,
+                headers={"Content-Encoding": encoding},
+            )
+            break
+        if response is None:
+            response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+
+        response.headers["Vary"] = "Accept-Encoding"
+        relative = self.prefix + os.path.relpath(str(full_path), str(self.directory)).replace(os.sep, "/")
+        is_hashed = HASHED_ASSET.match(relative) is not None
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE if is_hashed else REVALIDATE_CACHE
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+class LazyStaticFiles:
+    """延迟创建的 PrecompressedStaticFiles，可直接作为 ASGI 应用挂载"""
+
+    def __init__(self, directory: Any, prefix: str = ""):
+        self.directory = directory
+        self.prefix = prefix
+        self._files: Optional[PrecompressedStaticFiles] = None
+
+    @property
+    def files(self) -> PrecompressedStaticFiles:
+        if self._files is None:
+            self._files = PrecompressedStaticFiles(directory=self.directory, prefix=self.prefix)
+        return self._files
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        return await self.files.get_response(path, scope)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.files(scope, receive, send)
+
+
+def json_etag(content: Any) -> Tuple[bytes, str]:
+    """序列化 JSON 并计算强 ETag"""
+    body = dumps(content)
+    return body, '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+
+def json_response_with_etag(request: Request, body: bytes, etag: str) -> Response:
+    """返回带 ETag 的 JSON；If-None-Match 命中时返回 304"""
+    headers: Dict[str, str] = {"ETag": etag, "Cache-Control": REVALIDATE_CACHE}
+    if_none_match = request.headers.get("if-none-match", "")
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    if etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags] or "*" in tags:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
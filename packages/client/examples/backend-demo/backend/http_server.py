@@ -7,14 +7,32 @@
 
 from __future__ import annotations
 
+import heapq
 import json
+import os
+import re
+import select
 import sys
 import time
 import asyncio
-from typing import Any, Dict, List, Optional
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import asynccontextmanager
+from operator import attrgetter
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
 import platform
+from array import array
 from pathlib import Path
 
+if __name__ == "__main__":
+    # 作为入口运行时先由轻量的 bootstrap 监听端口、应答 /healthz 与前端页面，
+    # 本模块（FastAPI、NumPy 等较重的依赖与所有路由）在后台线程中导入后接管请求
+    import bootstrap
+
+    bootstrap.main("http_server")
+    sys.exit(0)
+
 try:
     import psutil
 except ImportError:
@@ -22,28 +40,865 @@ except ImportError:
     sys.exit(1)
 
 try:
-    from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-    from fastapi.staticfiles import StaticFiles
-    from fastapi.responses import FileResponse
-    import uvicorn
+    from fastapi import FastAPI, HTTPException, Query, Response, WebSocket, WebSocketDisconnect
+    from fastapi import Body, Request
+    from fastapi.responses import StreamingResponse
 except ImportError:
-    print("错误: fastapi 和 uvicorn 未安装，请运行: pip install fastapi uvicorn", file=sys.stderr)
+    # uvicorn 由 bootstrap.py 导入，这里不导入，以免拖慢完整应用的后台导入
+    print("错误: fastapi 未安装，请运行: pip install fastapi uvicorn", file=sys.stderr)
     sys.exit(1)
 
+from http_cache import CompressionMiddleware, LazyStaticFiles, json_etag, json_response_with_etag
+from instrumentation import CONTENT_TYPE as OPENMETRICS_CONTENT_TYPE
+from instrumentation import SamplerStats, render_openmetrics
+from metric_history import MetricHistory, parse_duration
+from metric_store import MetricStore
+from alerts import AlertEngine
+from collectors import PsutilCollector, create_collector
+from fast_json import FastJSONResponse
+from fleet import FleetAggregator, parse_upstreams
+from monitor_protocol import MONITOR_GROUPS, Subscription, encode
+from snapshot_model import CounterSample, CpuSample, ErrorSample, MemorySample, MonitorSnapshot, NetworkSample
+
+
+# 历史数据保留时长（如 "24h"、"30m"、"3600"），默认 0 不记录历史
+# 开启后即使没有 WebSocket 客户端也持续每秒采样，不再在无人连接时暂停
+HISTORY_RETENTION = os.environ.get("MONITOR_HISTORY_RETENTION", "0")
+
+# 持久化指标存储目录，为空时不启用（重启后历史数据会丢失）
+STORE_DIR = os.environ.get("MONITOR_STORE_DIR", "")
+
+# 持久化存储中 1 秒原始数据的保留时长，更早的数据压缩为 1 分钟汇总
+STORE_RAW_RETENTION = os.environ.get("MONITOR_STORE_RAW_RETENTION", "7d")
+
+# 1 分钟汇总数据的保留时长
+STORE_ROLLUP_RETENTION = os.environ.get("MONITOR_STORE_ROLLUP_RETENTION", "365d")
+
+# 持久化存储的刷盘与压缩间隔（秒）
+STORE_MAINTENANCE_INTERVAL = 300.0
+
+# 告警规则文件（JSON 数组），为空时不加载；规则也可通过 /api/alerts/rules 增删
+ALERT_RULES_FILE = os.environ.get("MONITOR_ALERT_RULES", "")
+
+# 单个挂载点容量探测的超时时间（秒），超时的挂载点标记为 unavailable
+DISK_PROBE_TIMEOUT = float(os.environ.get("MONITOR_DISK_PROBE_TIMEOUT", "0.25"))
+
+# WebSocket 客户端最多允许落后的秒数，超过后断开连接
+WS_MAX_LAG = float(os.environ.get("MONITOR_WS_MAX_LAG", "10"))
+
+# 计数器采集后端：auto（Linux 上优先直接读取 /proc）、procfs、psutil
+COLLECTOR = os.environ.get("MONITOR_COLLECTOR", "auto")
+
+# 汇聚模式的上游列表（逗号分隔，如 "web1=10.0.0.1:8001,10.0.0.2:8001"），为空时不启用
+FLEET_UPSTREAMS = os.environ.get("MONITOR_FLEET_UPSTREAMS", "")
+
+# 汇聚模式下超过多少秒未收到上游数据视为过期
+FLEET_STALE_AFTER = float(os.environ.get("MONITOR_FLEET_STALE_AFTER", "10"))
+
+# 磁盘容量、进程数等慢速指标的采集间隔（秒），仅用于 /metrics
+SLOW_COLLECT_INTERVAL = 10.0
+
+# 写入历史的指标：名称 -> (快照分组, 字段)
+HISTORY_METRICS: Dict[str, Tuple[str, str]] = {
+    "cpu.percent": ("cpu", "percent"),
+    "memory.percent": ("memory", "percent"),
+    "memory.used": ("memory", "used"),
+    "memory.available": ("memory", "available"),
+    "memory.swap_percent": ("memory", "swap_percent"),
+    "memory.swap_used": ("memory", "swap_used"),
+    "network.bytes_sent": ("network", "bytes_sent"),
+    "network.bytes_recv": ("network", "bytes_recv"),
+    "network.packets_sent": ("network", "packets_sent"),
+    "network.packets_recv": ("network", "packets_recv"),
+    "network.bytes_sent_per_sec": ("network", "bytes_sent_per_sec"),
+    "network.bytes_recv_per_sec": ("network", "bytes_recv_per_sec"),
+}
+
+
+class CpuSampler:
+    """基于 cpu_times 增量计算 CPU 使用率，不阻塞调用方
+
+    保存上一次的总体与逐核 cpu_times，每次调用用两次采样之差计算使用率，
+    取代 cpu_percent(interval=...) 的阻塞等待。
+    /api/cpu、/api/snapshot 与采样循环共用同一个增量窗口，
+    距上次计算不足 min_interval 时沿用上一次的结果，避免窗口过短导致使用率只剩噪声。
+    """
+
+    def __init__(self, collector: Any, min_interval: float = 0.5):
+        self.collector = collector
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._last_total, self._last_per_core = collector.cpu_times()
+        self._last_at = time.monotonic()
+        self._last_result: Optional[Tuple[float, List[float]]] = None
+
+    @staticmethod
+    def _split(times: Any) -> Tuple[float, float]:
+        """返回 (总时间, 空闲时间)，与 psutil 的计算口径一致"""
+        total = sum(times)
+        # Linux 上 guest 时间已计入 user，需要剔除避免重复计算
+        total -= getattr(times, "guest", 0.0) + getattr(times, "guest_nice", 0.0)
+        idle = times.idle + getattr(times, "iowait", 0.0)
+        return total, idle
+
+    @classmethod
+    def _percent(cls, prev: Any, curr: Any) -> float:
+        prev_total, prev_idle = cls._split(prev)
+        curr_total, curr_idle = cls._split(curr)
+        total_delta = curr_total - prev_total
+        if total_delta <= 0:
+            return 0.0
+        busy_delta = total_delta - (curr_idle - prev_idle)
+        return round(min(max(busy_delta / total_delta * 100, 0.0), 100.0), 1)
+
+    def sample(self) -> Tuple[float, List[float]]:
+        """返回自上次采样以来的 (总体使用率, 逐核使用率)"""
+        with self._lock:
+            now = time.monotonic()
+            if self._last_result is not None and now - self._last_at < self.min_interval:
+                percent, per_core_percent = self._last_result
+                return percent, list(per_core_percent)
+            total, per_core = self.collector.cpu_times()
+            percent = self._percent(self._last_total, total)
+            if len(per_core) == len(self._last_per_core):
+                per_core_percent = [
+                    self._percent(prev, curr)
+                    for prev, curr in zip(self._last_per_core, per_core)
+                ]
+            else:
+                # CPU 热插拔导致核心数变化时，本轮无法计算逐核增量
+                per_core_percent = [0.0] * len(per_core)
+            self._last_total = total
+            self._last_per_core = per_core
+            self._last_at = now
+            self._last_result = (percent, per_core_percent)
+        return percent, list(per_core_percent)
+
+
+class CounterRates:
+    """保存每个设备上一次的累计计数器，计算每秒速率
+
+    新出现的设备首轮速率为 0；消失的设备会被丢弃；
+    计数器回绕按 32 位处理，其余回退视为计数器重置。
+    """
+
+    def __init__(self, fields: Dict[str, str], min_interval: float = 0.5):
+        self.fields = fields  # 计数器字段 -> 速率字段
+        self.counter_fields = tuple(fields)
+        self.rate_fields = tuple(fields.values())
+        self._getter = attrgetter(*self.counter_fields) if len(fields) > 1 else (
+            lambda counter: (getattr(counter, self.counter_fields[0]),)
+        )
+        self._zeros = (0.0,) * len(self.counter_fields)
+        self.min_interval = min_interval
+        self._prev: Dict[str, Tuple[float, Tuple[int, ...]]] = {}
+        self._devices: Tuple[str, ...] = ()
+        self._rates = array("d")
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _delta(prev: int, curr: int) -> int:
+        if curr >= prev:
+            return curr - prev
+        if prev < 2 ** 32:
+            return curr + 2 ** 32 - prev
+        return 0
+
+    def update(self, counters: Dict[str, Any], sample_cls: type = CounterSample) -> CounterSample:
+        """传入 {设备: psutil 计数器}，返回按设备顺序平铺计数器与每秒速率的记录
+
+        两次调用间隔过短时沿用上一次的速率，避免速率抖动。
+        """
+        now = time.monotonic()
+        devices = tuple(counters)
+        rows = [self._getter(counter) for counter in counters.values()]
+        values = array("Q", [value for row in rows for value in row])
+
+        with self._lock:
+            last = max((ts for ts, _ in self._prev.values()), default=0.0)
+            if now - last < self.min_interval and devices == self._devices:
+                return sample_cls(devices, self.counter_fields, self.rate_fields, values, self._rates)
+
+            rates: List[float] = []
+            current: Dict[str, Tuple[float, Tuple[int, ...]]] = {}
+            delta = self._delta
+            for name, row in zip(devices, rows):
+                prev = self._prev.get(name)
+                if prev is None or now <= prev[0]:
+                    rates.extend(self._zeros)
+                else:
+                    elapsed = now - prev[0]
+                    rates.extend([round(delta(p, c) / elapsed, 1) for p, c in zip(prev[1], row)])
+                current[name] = (now, row)
+            self._prev = current
+            self._devices = devices
+            self._rates = array("d", rates)
+            return sample_cls(devices, self.counter_fields, self.rate_fields, values, self._rates)
+
+
+class DiskProbe:
+    """带缓存与超时的磁盘枚举
+
+    分区列表缓存到挂载表变化为止：Linux 上通过 poll /proc/self/mountinfo 感知变化，
+    其他平台按固定间隔刷新。容量探测在线程池中并发执行，
+    卡死的挂载点（如失联的 NFS/FUSE）超时后报告为 unavailable，且不会重复派发探测。
+    """
+
+    MOUNTINFO = "/proc/self/mountinfo"
+
+    def __init__(self, timeout: float = 0.25, refresh_interval: float = 30.0, max_workers: int = 16):
+        self.timeout = timeout
+        self.refresh_interval = refresh_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="disk-probe")
+        self._partitions: Optional[List[Any]] = None
+        self._loaded_at = 0.0
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+        self._mountinfo = None
+        self._poller = None
+        if hasattr(select, "poll") and os.path.exists(self.MOUNTINFO):
+            try:
+                self._mountinfo = open(self.MOUNTINFO, "rb")
+                self._mountinfo.read()
+                self._poller = select.poll()
+                self._poller.register(self._mountinfo, select.POLLPRI | select.POLLERR)
+            except OSError:
+                self._mountinfo = None
+                self._poller = None
+
+    def _mounts_changed(self) -> bool:
+        if self._poller is not None:
+            if not self._poller.poll(0):
+                return False
+            # 重新读取文件以清除变化通知
+            self._mountinfo.seek(0)
+            self._mountinfo.read()
+            return True
+        return time.monotonic() - self._loaded_at >= self.refresh_interval
+
+    def partitions(self) -> List[Any]:
+        """返回缓存的分区列表，挂载表变化时重新枚举"""
+        with self._lock:
+            if self._partitions is None or self._mounts_changed():
+                self._partitions = psutil.disk_partitions()
+                self._loaded_at = time.monotonic()
+                mountpoints = {partition.mountpoint for partition in self._partitions}
+                for mountpoint in [m for m in self._pending if m not in mountpoints]:
+                    del self._pending[mountpoint]
+            return self._partitions
+
+    def _submit(self, mountpoint: str) -> Tuple[Future, bool]:
+        """派发容量探测，返回 (future, 是否新派发)
+
+        上一次探测仍未返回时直接复用它，避免卡死的挂载点占满线程池。
+        """
+        with self._lock:
+            future = self._pending.get(mountpoint)
+            if future is not None and not future.done():
+                return future, False
+            future = self._executor.submit(psutil.disk_usage, mountpoint)
+            self._pending[mountpoint] = future
+            return future, True
+
+    def usage(self) -> List[Dict[str, Any]]:
+        partitions = self.partitions()
+        futures = []
+        fresh = []
+        for partition in partitions:
+            future, is_new = self._submit(partition.mountpoint)
+            futures.append((partition, future))
+            if is_new:
+                fresh.append(future)
+        # 只等待本次新派发的探测；已知卡住的挂载点直接报告为 unavailable
+        wait(fresh, timeout=self.timeout)
+
+        disks = []
+        for partition, future in futures:
+            disk: Dict[str, Any] = {
+                "device": partition.device,
+                "mountpoint": partition.mountpoint,
+                "fstype": partition.fstype,
+            }
+            if not future.done():
+                disk.update(status="unavailable", total=None, used=None, free=None, percent=None)
+                disks.append(disk)
+                continue
+            error = future.exception()
+            if isinstance(error, PermissionError):
+                continue
+            if error is not None:
+                disk.update(status="unavailable", total=None, used=None, free=None, percent=None)
+            else:
+                result = future.result()
+                disk.update(
+                    status="ok",
+                    total=result.total,
+                    used=result.used,
+                    free=result.free,
+                    percent=result.percent,
+                )
+            disks.append(disk)
+        return disks
+
+
+# 无权读取名称的进程在列表中显示的名称
+ACCESS_DENIED_NAME = "<无权访问>"
+
+
+class _ProcessEntry:
+    """进程表中的一项：复用的 psutil.Process 对象及缓存的静态字段
+
+    无权读取的进程仍保留在表中，cpu_percent 与 memory_percent 为 None。
+    由 /proc/<pid>/stat 刷新的条目不持有 psutil.Process，首次读取命令行或详情时才创建。
+    """
+
+    __slots__ = (
+        "proc", "key", "name", "name_lower", "cmdline", "exe", "username",
+        "ppid", "cpu_percent", "memory_percent", "cpu_time", "sampled_at",
+    )
+
+    def __init__(self, pid: int, create_time: float, name: str, proc: Optional[psutil.Process] = None):
+        self.proc = proc
+        self.key = (pid, create_time)
+        self.name = name
+        self.name_lower = name.lower()
+        self.cmdline: Optional[str] = None  # 首次展示时才读取
+        self.exe: Optional[str] = None  # 首次查看详情时才读取
+        self.username: Optional[str] = None
+        self.ppid = 0  # 父进程退出后会被重新挂到 init/subreaper 下，每次刷新更新
+        self.cpu_percent: Optional[float] = 0.0
+        self.memory_percent: Optional[float] = 0.0
+        self.cpu_time = 0.0  # 上一次刷新时的累计 CPU 时间与时刻（仅 /proc 刷新使用）
+        self.sampled_at = 0.0
+
+
+def _optional(call: Callable[[], Any]) -> Any:
+    """读取可能因权限或平台不支持而不可用的进程属性，不可用时返回 None"""
+    try:
+        return call()
+    except (psutil.AccessDenied, psutil.ZombieProcess, NotImplementedError, AttributeError):
+        return None
+
+
+def _process_name(proc: psutil.Process) -> str:
+    """进程名，无权读取时返回占位名称；进程已退出（含僵尸进程）时抛出 NoSuchProcess"""
+    try:
+        return proc.name()
+    except psutil.AccessDenied:
+        return ACCESS_DENIED_NAME
+
+
+class ProcessTable:
+    """跨请求持久化的进程表，以 (pid, create_time) 标识进程
+
+    采集后端提供 process_stats()（procfs）时，每次刷新只读取各进程的 /proc/<pid>/stat，
+    按两次刷新之间的 CPU 时间差计算 cpu_percent，5000 个进程的刷新 + 建树约 60 ms；
+    否则复用 psutil.Process 对象，使 cpu_percent 能基于上一次采样计算出真实值。
+    名称、命令行等静态字段只读取一次。
+    """
+
+    def __init__(self, min_refresh_interval: float = 0.5, collector: Any = None):
+        self.min_refresh_interval = min_refresh_interval
+        self._process_stats: Optional[Callable[[], Dict[int, Any]]] = getattr(collector, "process_stats", None)
+        self._entries: Dict[int, _ProcessEntry] = {}
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _from_process(proc: psutil.Process) -> _ProcessEntry:
+        return _ProcessEntry(proc.pid, _optional(proc.create_time) or 0.0, _process_name(proc), proc)
+
+    @staticmethod
+    def _proc(entry: _ProcessEntry) -> psutil.Process:
+        """条目对应的 psutil.Process，没有时创建；PID 已被复用时抛出 NoSuchProcess"""
+        if entry.proc is None:
+            pid, create_time = entry.key
+            proc = psutil.Process(pid)
+            if create_time and abs((_optional(proc.create_time) or create_time) - create_time) > 0.01:
+                raise psutil.NoSuchProcess(pid)
+            entry.proc = proc
+        return entry.proc
+
+    def _running(self, entry: _ProcessEntry) -> bool:
+        """条目对应的进程是否仍在运行（PID 未被复用）"""
+        try:
+            return self._proc(entry).is_running()
+        except psutil.NoSuchProcess:
+            return False
+
+    def _refresh(self) -> None:
+        """同步进程列表并更新动态字段，调用方需持有锁"""
+        now = time.monotonic()
+        if now - self._last_refresh < self.min_refresh_interval:
+            return
+        self._last_refresh = now
+        if self._process_stats is not None:
+            self._refresh_procfs(now)
+        else:
+            self._refresh_psutil()
+
+    def _refresh_procfs(self, now: float) -> None:
+        stats = self._process_stats()
+        entries = self._entries
+        for pid in [pid for pid in entries if pid not in stats]:
+            del entries[pid]
+        memory_total = psutil.virtual_memory().total
+
+        for pid, stat in stats.items():
+            entry = entries.get(pid)
+            if stat is None:
+                # 无权读取的进程照常列出，指标未知
+                if entry is None:
+                    entry = entries[pid] = _ProcessEntry(pid, 0.0, ACCESS_DENIED_NAME)
+                entry.cpu_percent = entry.memory_percent = None
+                continue
+            ppid, name, create_time, cpu_time, rss = stat
+            if entry is None or entry.key[1] != create_time:
+                # 新进程或 PID 被复用；首次刷新的 cpu_percent 与 psutil 一样为 0
+                proc = None
+                if len(name) >= 15:
+                    # comm 被内核截断，与 psutil 相同地从命令行还原完整名称
+                    try:
+                        proc = psutil.Process(pid)
+                        name = _process_name(proc)
+                    except psutil.NoSuchProcess:
+                        proc = None
+                entry = entries[pid] = _ProcessEntry(pid, create_time, name, proc)
+            elif entry.sampled_at:
+                elapsed = now - entry.sampled_at
+                entry.cpu_percent = round((cpu_time - entry.cpu_time) / elapsed * 100, 1) if elapsed > 0 else 0.0
+            entry.cpu_time = cpu_time
+            entry.sampled_at = now
+            entry.ppid = ppid
+            entry.memory_percent = rss / memory_total * 100
+
+    def _refresh_psutil(self) -> None:
+        pids = psutil.pids()
+        alive = set(pids)
+        for pid in [pid for pid in self._entries if pid not in alive]:
+            del self._entries[pid]
+
+        for pid in pids:
+            entry = self._entries.get(pid)
+            try:
+                if entry is None:
+                    entry = self._from_process(psutil.Process(pid))
+                    self._entries[pid] = entry
+                with entry.proc.oneshot():
+                    entry.cpu_percent = entry.proc.cpu_percent()
+                    entry.memory_percent = entry.proc.memory_percent()
+                    entry.ppid = entry.proc.ppid()
+            except psutil.NoSuchProcess:
+                # 包括 ZombieProcess
+                self._entries.pop(pid, None)
+            except psutil.AccessDenied:
+                # 无权读取的进程照常列出，指标未知
+                entry.cpu_percent = entry.memory_percent = None
+
+    def _cmdline(self, entry: _ProcessEntry) -> str:
+        if entry.cmdline is None:
+            try:
+                entry.cmdline = " ".join(self._proc(entry).cmdline())
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                entry.cmdline = ""
+        return entry.cmdline
+
+    def _static(self, entry: _ProcessEntry) -> None:
+        """读取详情用的静态字段；条目按 (pid, create_time) 标识，PID 复用时会重建，缓存不会串号"""
+        if entry.exe is None:
+            proc = self._proc(entry)
+            entry.exe = _optional(proc.exe) or ""
+            entry.username = _optional(proc.username) or ""
+
+    def _detail(self, entry: _ProcessEntry) -> Dict[str, Any]:
+        """读取动态详情（RSS/USS、线程数、打开的文件描述符数、I/O 计数），进程已退出时抛出 NoSuchProcess"""
+        proc = self._proc(entry)
+        self._static(entry)
+        with proc.oneshot():
+            memory = _optional(proc.memory_info)
+            io = _optional(proc.io_counters)
+            if hasattr(proc, "num_fds"):
+                fds = _optional(proc.num_fds)
+            else:
+                fds = _optional(proc.num_handles)
+            detail = {
+                "status": _optional(proc.status),
+                "num_threads": _optional(proc.num_threads),
+                "num_fds": fds,
+                "memory": {
+                    "rss": getattr(memory, "rss", None),
+                    "vms": getattr(memory, "vms", None),
+                    # USS 需要遍历内存映射（Linux 上读取 smaps），只在展开时计算
+                    "uss": getattr(_optional(proc.memory_full_info), "uss", None),
+                },
+                "io": None if io is None else {
+                    "read_count": io.read_count,
+                    "write_count": io.write_count,
+                    "read_bytes": io.read_bytes,
+                    "write_bytes": io.write_bytes,
+                },
+            }
+        return detail
+
+    def _get_entry(self, pid: int) -> Optional[_ProcessEntry]:
+        """取得 pid 对应的条目，PID 已被复用或条目尚不存在时重建，调用方需持有锁"""
+        entry = self._entries.get(pid)
+        if entry is not None and self._running(entry):
+            return entry
+        self._entries.pop(pid, None)
+        try:
+            proc = psutil.Process(pid)
+            entry = self._from_process(proc)
+            entry.ppid = _optional(proc.ppid) or 0
+        except psutil.NoSuchProcess:
+            return None
+        self._entries[pid] = entry
+        return entry
+
+    def detail(self, pid: int) -> Optional[Dict[str, Any]]:
+        """单个进程的详情，进程不存在时返回 None；无权读取的字段为 None
+
+        与 tree() 相同先按 min_refresh_interval 刷新进程表，children、ppid 与 CPU 占用不会取自空表或过期的表。
+        """
+        with self._lock:
+            self._refresh()
+            entry = self._get_entry(pid)
+            if entry is None:
+                return None
+            try:
+                detail = self._detail(entry)
+            except psutil.NoSuchProcess:
+                self._entries.pop(pid, None)
+                return None
+            except psutil.AccessDenied:
+                return None
+            return {
+                "pid": pid,
+                "ppid": entry.ppid,
+                "name": entry.name,
+                "exe": entry.exe,
+                "cmdline": self._cmdline(entry),
+                "username": entry.username,
+                "create_time": entry.key[1],
+                "cpu_percent": entry.cpu_percent,
+                "memory_percent": entry.memory_percent,
+                **detail,
+                "children": sorted(e.key[0] for e in self._entries.values() if e.ppid == pid and e is not entry),
+            }
+
+    def tree(
+        self,
+        root: Optional[int] = None,
+        depth: Optional[int] = None,
+        expand: Tuple[int, ...] = (),
+    ) -> Optional[List[Dict[str, Any]]]:
+        """父子结构的进程树，root 不存在时返回 None
+
+        每个节点只含列表中的轻量字段与 children_count；子节点展开到 depth 层（None 表示全部），
+        expand 中的节点无论深度都展开子节点，并附带 detail。
+        树以迭代方式构建（不受递归深度限制），构建开销与进程数成线性。
+        """
+        with self._lock:
+            self._refresh()
+            entries = self._entries
+            children: Dict[Optional[int], List[_ProcessEntry]] = {}
+            for entry in entries.values():
+                pid, ppid = entry.key[0], entry.ppid
+                # 父进程不在表中（或 pid 0 自身为父）的进程作为顶层节点
+                parent = ppid if ppid != pid and ppid in entries else None
+                siblings = children.get(parent)
+                if siblings is None:
+                    children[parent] = [entry]
+                else:
+                    siblings.append(entry)
+
+            if root is None:
+                top = children.get(None, [])
+            elif root in entries:
+                top = [entries[root]]
+            else:
+                return None
+            expanded = set(expand)
+            by_pid = attrgetter("key")
+
+            result: List[Dict[str, Any]] = []
+            stack = [(entry, 0, result) for entry in sorted(top, key=by_pid, reverse=True)]
+            while stack:
+                entry, level, siblings = stack.pop()
+                pid = entry.key[0]
+                kids = children.get(pid, ())
+                node = {
+                    "pid": pid,
+                    "name": entry.name,
+                    "cpu_percent": entry.cpu_percent,
+                    "memory_percent": entry.memory_percent,
+                    "children_count": len(kids),
+                }
+                if pid in expanded:
+                    try:
+                        node["detail"] = self._detail(entry)
+                    except (psutil.NoSuchProcess, psutil.AccessDenied):
+                        node["detail"] = None
+                siblings.append(node)
+                if kids and (depth is None or level < depth or pid in expanded):
+                    node["children"] = nested = []
+                    stack.extend((kid, level + 1, nested) for kid in sorted(kids, key=by_pid, reverse=True))
+            return result
+
+    def query(
+        self,
+        sort_by: str = "cpu",
+        limit: int = 10,
+        offset: int = 0,
+        name: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """返回 (当前页进程列表, 过滤后的总数)
+
+        只用堆选出前 offset + limit 项，不对整张表排序。
+        """
+        with self._lock:
+            self._refresh()
+            entries: Any = self._entries.values()
+            if name:
+                needle = name.lower()
+                entries = [e for e in entries if needle in e.name_lower]
+            else:
+                entries = list(entries)
+            total = len(entries)
+
+            k = max(offset, 0) + max(limit, 0)
+            # 指标为 None（无权读取）的进程排在最后
+            if sort_by == "cpu":
+                top = heapq.nlargest(k, entries, key=lambda e: -1.0 if e.cpu_percent is None else e.cpu_percent)
+            elif sort_by == "memory":
+                top = heapq.nlargest(k, entries, key=lambda e: -1.0 if e.memory_percent is None else e.memory_percent)
+            else:
+                top = heapq.nsmallest(k, entries, key=lambda e: e.key[0])
+
+            rows = []
+            for entry in top[max(offset, 0):]:
+                # 只对返回的行做 PID 复用检查，被复用的条目下次刷新时重建
+                if not self._running(entry):
+                    self._entries.pop(entry.key[0], None)
+                    continue
+                rows.append({
+                    "pid": entry.key[0],
+                    "name": entry.name,
+                    "cmdline": self._cmdline(entry),
+                    "cpu_percent": entry.cpu_percent,
+                    "memory_percent": entry.memory_percent,
+                })
+            return rows, total
+
+
+class Tick:
+    """一次采样结果；dict 形式、展开与 v1 编码在所有客户端之间共享，按需计算一次"""
+
+    __slots__ = ("snapshot", "_legacy_frame")
+
+    def __init__(self, snapshot: MonitorSnapshot):
+        self.snapshot = snapshot
+        self._legacy_frame: Optional[str] = None
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        return self.snapshot.to_dict()
+
+    @property
+    def flat(self) -> Dict[str, Any]:
+        return self.snapshot.flat()
+
+    @property
+    def legacy_frame(self) -> str:
+        if self._legacy_frame is None:
+            self._legacy_frame, _ = encode({"type": "monitor_data", "data": self.data}, "json")
+        return self._legacy_frame
+
+
+class MonitorClient:
+    """/ws/monitor 的一个连接：订阅、有界发送缓冲与独立的发送任务
+
+    未发出的快照只保留最新一份（旧快照被合并），控制消息队列有上限，
+    落后超过 max_lag 秒的客户端会被断开，因此无论客户端快慢内存占用都有上界。
+    """
+
+    CONTROL_QUEUE_SIZE = 8
+
+    def __init__(self, websocket: WebSocket, subscription: Subscription, stats: SamplerStats, max_lag: float):
+        self.websocket = websocket
+        self.subscription = subscription
+        self.stats = stats
+        self.max_lag = max_lag
+        self.connected_at = time.time()
+        self.frames_sent = 0
+        self.frames_coalesced = 0
+        self.frames_dropped = 0
+        self.lagging = False
+        self.writer: Optional[asyncio.Task] = None
+        self._pending: Optional[Tick] = None
+        self._control: Deque[Dict[str, Any]] = deque()
+        self._wakeup = asyncio.Event()
+        self._behind_since: Optional[float] = None
+
+    def lag(self, now: Optional[float] = None) -> float:
+        """最早一帧未送达的数据已等待的秒数"""
+        if self._behind_since is None:
+            return 0.0
+        return (now if now is not None else time.monotonic()) - self._behind_since
+
+    def _drop(self, count: int = 1) -> None:
+        self.frames_dropped += count
+        self.stats.frames_dropped += count
+
+    def offer(self, tick: Tick) -> None:
+        """投递一次采样；若上一份仍未发出则用新快照替换（合并）"""
+        if self.lagging:
+            return
+        now = time.monotonic()
+        subscription = self.subscription
+        if subscription.version > 1:
+            if not subscription.due(now):
+                return
+            subscription.last_sent = now
+
+        if self._pending is not None:
+            self.frames_coalesced += 1
+            self.stats.frames_coalesced += 1
+        self._pending = tick
+        if self._behind_since is None:
+            self._behind_since = now
+        elif now - self._behind_since > self.max_lag:
+            self.disconnect_lagging()
+            return
+        self._wakeup.set()
+
+    def send_control(self, message: Dict[str, Any]) -> None:
+        """排队一条控制消息（如订阅确认），队列满时丢弃最旧的一条"""
+        if len(self._control) >= self.CONTROL_QUEUE_SIZE:
+            self._control.popleft()
+            self._drop()
+        self._control.append(message)
+        self._wakeup.set()
+
+    def disconnect_lagging(self) -> None:
+        """断开长期跟不上的客户端，丢弃尚未发出的数据"""
+        self.lagging = True
+        pending = len(self._control) + (1 if self._pending is not None else 0)
+        if pending:
+            self._drop(pending)
+        self._pending = None
+        self._control.clear()
+        if self.writer is not None:
+            self.writer.cancel()
+
+    def _build(self, tick: Tick) -> Optional[Tuple[Any, bool]]:
+        subscription = self.subscription
+        if subscription.version == 1:
+            return tick.legacy_frame, False
+        frame = subscription.build_frame(tick.data, tick.flat)
+        if frame is None:
+            return None
+        return encode(frame, subscription.encoding)
+
+    async def _send(self, payload: Any, binary: bool) -> None:
+        if binary:
+            await self.websocket.send_bytes(payload)
+        else:
+            await self.websocket.send_text(payload)
+        self.frames_sent += 1
+        self.stats.frames_sent += 1
+
+    async def run(self) -> None:
+        """发送任务：每个连接独占，慢客户端只会阻塞自己"""
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._control:
+                payload, binary = encode(self._control.popleft(), "json")
+                await self._send(payload, binary)
+            tick, self._pending = self._pending, None
+            if tick is not None:
+                frame = self._build(tick)
+                if frame is not None:
+                    await self._send(*frame)
+            if self._pending is None and not self._control:
+                self._behind_since = None
+
+    def describe(self) -> Dict[str, Any]:
+        client = self.websocket.client
+        return {
+            "remote": f"{client.host}:{client.port}" if client else None,
+            "connected_at": self.connected_at,
+            "version": self.subscription.version,
+            "groups": self.subscription.groups,
+            "interval": self.subscription.interval,
+            "encoding": self.subscription.encoding,
+            "frames_sent": self.frames_sent,
+            "frames_coalesced": self.frames_coalesced,
+            "frames_dropped": self.frames_dropped,
+            "lag": round(self.lag(), 3),
+        }
+
 
 class SystemMonitor:
     """系统监控类"""
 
-    def __init__(self):
-        self.monitoring_clients: List[WebSocket] = []
+    def __init__(
+        self,
+        sample_interval: float = 1.0,
+        history_retention: float = 0,
+        store: Optional[MetricStore] = None,
+        alerts: Optional[AlertEngine] = None,
+        collector: Any = None,
+    ):
+        self.monitoring_clients: List[MonitorClient] = []
+        self.sample_interval = sample_interval
+        self.history: Optional[MetricHistory] = None
+        if history_retention > 0:
+            self.history = MetricHistory(
+                list(HISTORY_METRICS),
+                capacity=max(1, int(history_retention / sample_interval)),
+                resolution=sample_interval,
+            )
+        self.store = store
+        self.alerts = alerts if alerts is not None else AlertEngine(sample_interval)
+        self._store_maintained_at = time.monotonic()
+        self._sampler_task: Optional[asyncio.Task] = None
+        self._clients_changed = asyncio.Event()
+        self.stats = SamplerStats()
+        self._system_info: Optional[Dict[str, Any]] = None
+        self._system_info_payload: Optional[Tuple[bytes, str]] = None
+        self.latest_snapshot: Optional[MonitorSnapshot] = None
+        self.latest_slow: Optional[Dict[str, Any]] = None
+        # 进程数、磁盘容量等慢速指标不在启动时采集：首次 /metrics 请求时按需采集，之后按间隔刷新
+        self._slow_collected_at = time.monotonic()
+        self.collector = collector if collector is not None else PsutilCollector()
+        self.cpu_sampler = CpuSampler(self.collector)
+        self.process_table = ProcessTable(collector=self.collector)
+        self.disk_probe = DiskProbe(timeout=DISK_PROBE_TIMEOUT)
+        self.network_rates = CounterRates({
+            "bytes_sent": "bytes_sent_per_sec",
+            "bytes_recv": "bytes_recv_per_sec",
+            "packets_sent": "packets_sent_per_sec",
+            "packets_recv": "packets_recv_per_sec",
+        })
+        self.disk_io_rates = CounterRates({
+            "read_bytes": "read_bytes_per_sec",
+            "write_bytes": "write_bytes_per_sec",
+            "read_count": "read_iops",
+            "write_count": "write_iops",
+        })
 
     def get_system_info(self) -> Dict[str, Any]:
-        """获取静态系统信息"""
+        """获取静态系统信息（成功后缓存，进程生命周期内不再变化）"""
+        if self._system_info is not None:
+            return self._system_info
         try:
             boot_time = psutil.boot_time()
             boot_time_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(boot_time))
 
-            return {
+            self._system_info = {
                 "platform": platform.system(),
                 "platform_release": platform.release(),
                 "platform_version": platform.version(),
@@ -55,198 +910,667 @@ class SystemMonitor:
                 "cpu_count_logical": psutil.cpu_count(logical=True),
                 "boot_time": boot_time_str,
             }
+            return self._system_info
         except Exception as e:
             return {"error": str(e)}
 
-    def get_cpu_info(self) -> Dict[str, Any]:
-        """获取 CPU 信息"""
+    def get_system_info_payload(self) -> Tuple[bytes, str]:
+        """返回系统信息的 JSON 编码及 ETag，编码结果随系统信息一起缓存"""
+        if self._system_info_payload is None:
+            info = self.get_system_info()
+            payload = json_etag(info)
+            if "error" in info:
+                return payload
+            self._system_info_payload = payload
+        return self._system_info_payload
+
+    def sample_cpu(self) -> Any:
+        """采样 CPU，返回 CpuSample 或 ErrorSample"""
         try:
-            cpu_percent = psutil.cpu_percent(interval=0.1)
-            cpu_percent_per_core = psutil.cpu_percent(interval=0.1, percpu=True)
-            cpu_freq = psutil.cpu_freq()
+            cpu_percent, cpu_percent_per_core = self.cpu_sampler.sample()
+            return CpuSample(cpu_percent, cpu_percent_per_core, psutil.cpu_freq())
+        except Exception as e:
+            return ErrorSample(str(e))
 
-            return {
-                "percent": cpu_percent,
-                "percent_per_core": cpu_percent_per_core,
-                "frequency": {
-                    "current": cpu_freq.current if cpu_freq else 0,
-                    "min": cpu_freq.min if cpu_freq else 0,
-                    "max": cpu_freq.max if cpu_freq else 0,
-                } if cpu_freq else None,
-            }
+    def sample_memory(self) -> Any:
+        """采样内存，返回 MemorySample 或 ErrorSample"""
+        try:
+            return MemorySample(*self.collector.memory())
         except Exception as e:
-            return {"error": str(e)}
+            return ErrorSample(str(e))
 
-    def get_memory_info(self) -> Dict[str, Any]:
-        """获取内存信息"""
+    def sample_network(self) -> Any:
+        """采样逐网卡计数器与速率，返回 NetworkSample 或 ErrorSample"""
         try:
-            mem = psutil.virtual_memory()
-            swap = psutil.swap_memory()
+            return self.network_rates.update(self.collector.net_io_counters(), NetworkSample)
+        except Exception as e:
+            return ErrorSample(str(e))
 
-            return {
-                "total": mem.total,
-                "available": mem.available,
-                "used": mem.used,
-                "percent": mem.percent,
-                "swap_total": swap.total,
-                "swap_used": swap.used,
-                "swap_percent": swap.percent,
-            }
+    def sample_disk_io(self) -> Any:
+        """采样逐磁盘 I/O 计数器与速率，返回 CounterSample 或 ErrorSample"""
+        try:
+            return self.disk_io_rates.update(self.collector.disk_io_counters())
         except Exception as e:
-            return {"error": str(e)}
+            return ErrorSample(str(e))
+
+    def get_cpu_info(self) -> Dict[str, Any]:
+        """获取 CPU 信息"""
+        return self.sample_cpu().to_dict()
+
+    def get_memory_info(self) -> Dict[str, Any]:
+        """获取内存信息"""
+        return self.sample_memory().to_dict()
 
     def get_disk_info(self) -> List[Dict[str, Any]]:
         """获取磁盘信息"""
         try:
-            disks = []
-            for partition in psutil.disk_partitions():
-                try:
-                    usage = psutil.disk_usage(partition.mountpoint)
-                    disks.append({
-                        "device": partition.device,
-                        "mountpoint": partition.mountpoint,
-                        "fstype": partition.fstype,
-                        "total": usage.total,
-                        "used": usage.used,
-                        "free": usage.free,
-                        "percent": usage.percent,
-                    })
-                except PermissionError:
-                    continue
-            return disks
+            return self.disk_probe.usage()
         except Exception as e:
             return [{"error": str(e)}]
 
     def get_network_info(self) -> Dict[str, Any]:
-        """获取网络信息"""
+        """获取网络信息（总量与逐网卡的累计值及每秒速率）"""
+        return self.sample_network().to_dict()
+
+    def get_disk_io_info(self) -> Dict[str, Any]:
+        """获取逐磁盘 I/O 吞吐量与 IOPS"""
+        return self.sample_disk_io().to_dict()
+
+    def get_processes(
+        self,
+        sort_by: str = "cpu",
+        limit: int = 10,
+        offset: int = 0,
+        name: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """获取进程列表，返回 (当前页, 总数)"""
         try:
-            net_io = psutil.net_io_counters()
-            return {
-                "bytes_sent": net_io.bytes_sent,
-                "bytes_recv": net_io.bytes_recv,
-                "packets_sent": net_io.packets_sent,
-                "packets_recv": net_io.packets_recv,
-            }
+            return self.process_table.query(sort_by, limit, offset, name)
         except Exception as e:
-            return {"error": str(e)}
+            return [{"error": str(e)}], 0
 
-    def get_processes(self, sort_by: str = "cpu", limit: int = 10) -> List[Dict[str, Any]]:
-        """获取进程列表"""
-        try:
-            processes = []
-            for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
-                try:
-                    pinfo = proc.info
-                    processes.append({
-                        "pid": pinfo['pid'],
-                        "name": pinfo['name'],
-                        "cpu_percent": pinfo['cpu_percent'] or 0,
-                        "memory_percent": pinfo['memory_percent'] or 0,
-                    })
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
+    def collect_snapshot(self) -> MonitorSnapshot:
+        """采集一次实时监控快照（所有订阅者共享），并记录各采集器耗时"""
+        timed = self.stats.timed
+        snapshot = MonitorSnapshot(
+            time.time(),
+            cpu=timed("cpu", self.sample_cpu),
+            memory=timed("memory", self.sample_memory),
+            network=timed("network", self.sample_network),
+            disk_io=timed("disk_io", self.sample_disk_io),
+        )
+        self.latest_snapshot = snapshot
+        return snapshot
+
+    def collect_slow(self) -> Dict[str, Any]:
+        """采集变化较慢的指标，供 /metrics 使用"""
+        timed = self.stats.timed
+        slow = {
+            "system": timed("system", self.get_system_info),
+            "disk": timed("disk", self.get_disk_info),
+            "process_count": timed("process_count", lambda: len(psutil.pids())),
+        }
+        self.latest_slow = slow
+        self._slow_collected_at = time.monotonic()
+        return slow
+
+    async def render_metrics(self) -> str:
+        """生成 /metrics 文本；仅在从未采样过时才同步采集一次"""
+        if self.latest_snapshot is None:
+            await asyncio.to_thread(self.collect_snapshot)
+        if self.latest_slow is None:
+            await asyncio.to_thread(self.collect_slow)
+        return render_openmetrics(
+            self.latest_snapshot.to_dict(), self.latest_slow, self.stats, len(self.monitoring_clients)
+        )
+
+    @property
+    def recording(self) -> bool:
+        """是否开启了内存历史或持久化存储（开启时即使没有订阅者也持续采样）"""
+        return self.history is not None or self.store is not None
+
+    @property
+    def keep_sampling(self) -> bool:
+        """没有订阅者时是否仍需后台采样（记录历史或有告警规则）"""
+        return self.recording or bool(self.alerts.rules)
+
+    def record_history(self, snapshot: MonitorSnapshot) -> None:
+        """将快照中的标量指标写入历史缓冲区与持久化存储"""
+        if not self.recording:
+            return
+        values = {name: snapshot.value(group, field) for name, (group, field) in HISTORY_METRICS.items()}
+        if self.history is not None:
+            self.history.record(snapshot.timestamp, values)
+        if self.store is not None:
+            self.store.record(snapshot.timestamp, values)
+
+    def history_source(self, start: float) -> Optional[Any]:
+        """选择查询来源：内存缓冲区覆盖起始时间时优先使用，否则使用持久化存储"""
+        if self.history is not None:
+            oldest = self.history.oldest
+            if self.store is None or (oldest is not None and oldest <= start):
+                return self.history
+        return self.store
+
+    def ensure_sampler(self) -> None:
+        """按需启动后台采样任务"""
+        if self._sampler_task is None or self._sampler_task.done():
+            self._sampler_task = asyncio.create_task(self.sampler_loop())
+
+    def add_client(self, client: MonitorClient) -> None:
+        """注册订阅者，并按需启动后台采样任务"""
+        self.monitoring_clients.append(client)
+        self._clients_changed.set()
+        self.ensure_sampler()
+
+    def remove_client(self, client: MonitorClient) -> None:
+        """注销订阅者"""
+        if client in self.monitoring_clients:
+            self.monitoring_clients.remove(client)
+
+    def broadcast(self, snapshot: MonitorSnapshot) -> None:
+        """将本次快照投递给所有订阅者，实际发送由各连接的发送任务完成"""
+        tick = Tick(snapshot)
+        for client in list(self.monitoring_clients):
+            client.offer(tick)
+
+    async def sampler_loop(self) -> None:
+        """后台采样循环：每个进程只有一个，每秒采样一次并广播
+
+        未开启历史记录（内存或持久化）、没有告警规则且无订阅者时暂停采样。
+        """
+        while True:
+            try:
+                if not self.monitoring_clients and not self.keep_sampling:
+                    self._clients_changed.clear()
+                    await self._clients_changed.wait()
                     continue
 
-            # 排序
-            if sort_by == "cpu":
-                processes.sort(key=lambda x: x['cpu_percent'], reverse=True)
-            elif sort_by == "memory":
-                processes.sort(key=lambda x: x['memory_percent'], reverse=True)
+                # psutil 调用放到线程池执行，避免阻塞事件循环
+                snapshot = await asyncio.to_thread(self.collect_snapshot)
+                self.record_history(snapshot)
+                if self.alerts.rules:
+                    self.alerts.evaluate(snapshot.timestamp, snapshot.flat())
+                if self.monitoring_clients:
+                    self.broadcast(snapshot)
+                if time.monotonic() - self._slow_collected_at >= SLOW_COLLECT_INTERVAL:
+                    await asyncio.to_thread(self.collect_slow)
+                if self.store is not None and time.monotonic() - self._store_maintained_at >= STORE_MAINTENANCE_INTERVAL:
+                    self._store_maintained_at = time.monotonic()
+                    asyncio.get_running_loop().run_in_executor(None, self.store.maintain)
+                await asyncio.sleep(self.sample_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"监控循环错误: {e}", file=sys.stderr)
+                await asyncio.sleep(self.sample_interval)
 
-            return processes[:limit]
-        except Exception as e:
-            return [{"error": str(e)}]
+    async def loop_lag_monitor(self, interval: float = 0.5) -> None:
+        """测量事件循环调度延迟：定时器实际唤醒时间与预期之差"""
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            self.stats.observe_loop_lag(max(0.0, loop.time() - expected))
 
-    async def monitor_loop(self, websocket: WebSocket) -> None:
-        """监控循环，每秒推送一次数据到指定 WebSocket"""
-        try:
-            while True:
-                data = {
-                    "cpu": self.get_cpu_info(),
-                    "memory": self.get_memory_info(),
-                    "network": self.get_network_info(),
-                    "timestamp": time.time(),
-                }
-                await websocket.send_json({"type": "monitor_data", "data": data})
-                await asyncio.sleep(1)
-        except WebSocketDisconnect:
-            pass
-        except Exception as e:
-            print(f"监控循环错误: {e}", file=sys.stderr)
+
+def _open_store() -> Optional[MetricStore]:
+    if not STORE_DIR.strip():
+        return None
+    try:
+        return MetricStore(
+            os.path.expanduser(STORE_DIR),
+            list(HISTORY_METRICS),
+            raw_retention=parse_duration(STORE_RAW_RETENTION),
+            rollup_retention=parse_duration(STORE_ROLLUP_RETENTION),
+        )
+    except (OSError, ValueError) as e:
+        print(f"错误: 无法打开指标存储 {STORE_DIR}: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+def _create_collector() -> Any:
+    try:
+        return create_collector(COLLECTOR.strip() or "auto")
+    except (OSError, ValueError) as e:
+        print(f"错误: 无法创建采集后端 {COLLECTOR}: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+def _load_alerts() -> Optional[AlertEngine]:
+    if not ALERT_RULES_FILE.strip():
+        return None
+    try:
+        return AlertEngine.from_file(os.path.expanduser(ALERT_RULES_FILE))
+    except (OSError, ValueError) as e:
+        print(f"错误: 无法加载告警规则 {ALERT_RULES_FILE}: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+monitor = SystemMonitor(
+    history_retention=0 if HISTORY_RETENTION.strip() in ("", "0") else parse_duration(HISTORY_RETENTION),
+    store=_open_store(),
+    alerts=_load_alerts(),
+    collector=_create_collector(),
+)
+
+
+fleet: Optional[FleetAggregator] = None
+if FLEET_UPSTREAMS.strip():
+    try:
+        fleet = FleetAggregator(
+            parse_upstreams(FLEET_UPSTREAMS),
+            interval=monitor.sample_interval,
+            stale_after=FLEET_STALE_AFTER,
+        )
+    except (ValueError, RuntimeError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """启动事件循环延迟监测；开启历史记录或配置了告警规则时，启动即开始采样；汇聚模式下连接所有上游
+
+    退出时对持久化存储刷盘。
+    """
+    lag_task = asyncio.create_task(monitor.loop_lag_monitor())
+    if monitor.keep_sampling:
+        monitor.ensure_sampler()
+    print(f"采集后端: {monitor.collector.name}", file=sys.stderr)
+    if fleet is not None:
+        print(f"汇聚模式: {len(fleet.hosts)} 个上游", file=sys.stderr)
+        fleet.start()
+    try:
+        yield
+    finally:
+        lag_task.cancel()
+        if fleet is not None:
+            await fleet.stop()
+        if monitor.store is not None:
+            await asyncio.to_thread(monitor.store.maintain)
 
 
 # 创建 FastAPI 应用
-app = FastAPI(title="系统信息监控", version="2.0.0")
-monitor = SystemMonitor()
+app = FastAPI(
+    title="系统信息监控",
+    version="2.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
+)
+
+# JSON 等文本响应按 Accept-Encoding 压缩
+app.add_middleware(CompressionMiddleware)
 
-# 静态文件服务
+# 静态文件服务：优先返回预压缩文件，带哈希的资源长期缓存；首次请求时才创建
 dist_path = Path(__file__).parent.parent / "dist"
+dist_files: Optional[LazyStaticFiles] = None
 if dist_path.exists():
-    app.mount("/assets", StaticFiles(directory=dist_path / "assets"), name="assets")
+    dist_files = LazyStaticFiles(dist_path)
+    app.mount("/assets", LazyStaticFiles(dist_path / "assets", prefix="assets/"), name="assets")
 
 
 @app.get("/")
-async def index():
+async def index(request: Request):
     """返回前端页面"""
-    index_file = dist_path / "index.html"
-    if index_file.exists():
-        return FileResponse(index_file)
+    if dist_files is not None and (dist_path / "index.html").exists():
+        return await dist_files.get_response("index.html", request.scope)
     return {"error": "前端文件未找到，请先构建前端: npm run build"}
 
 
 @app.get("/api/system")
-async def get_system_info():
-    """获取系统信息"""
-    return monitor.get_system_info()
+async def get_system_info(request: Request):
+    """获取系统信息（带 ETag，支持 If-None-Match 条件请求）"""
+    body, etag = await asyncio.to_thread(monitor.get_system_info_payload)
+    return json_response_with_etag(request, body, etag)
 
 
 @app.get("/api/cpu")
 async def get_cpu_info():
     """获取 CPU 信息"""
-    return monitor.get_cpu_info()
+    return await asyncio.to_thread(monitor.get_cpu_info)
 
 
 @app.get("/api/memory")
 async def get_memory_info():
     """获取内存信息"""
-    return monitor.get_memory_info()
+    return await asyncio.to_thread(monitor.get_memory_info)
 
 
 @app.get("/api/disk")
 async def get_disk_info():
     """获取磁盘信息"""
-    return monitor.get_disk_info()
+    return await asyncio.to_thread(monitor.get_disk_info)
 
 
 @app.get("/api/network")
 async def get_network_info():
     """获取网络信息"""
-    return monitor.get_network_info()
+    return await asyncio.to_thread(monitor.get_network_info)
+
+
+@app.get("/api/disk/io")
+async def get_disk_io_info():
+    """获取磁盘 I/O 速率"""
+    return await asyncio.to_thread(monitor.get_disk_io_info)
 
 
 @app.get("/api/processes")
-async def get_processes(sort_by: str = "cpu", limit: int = 10):
-    """获取进程列表"""
-    return monitor.get_processes(sort_by, limit)
+async def get_processes(
+    response: Response,
+    sort_by: str = "cpu",
+    limit: int = Query(10, ge=0),
+    offset: int = Query(0, ge=0),
+    name: Optional[str] = None,
+):
+    """获取进程列表，支持分页与按名称过滤；总数通过 X-Total-Count 返回"""
+    processes, total = await asyncio.to_thread(monitor.get_processes, sort_by, limit, offset, name)
+    response.headers["X-Total-Count"] = str(total)
+    return processes
+
+
+# /api/processes/tree 单次最多展开详情的节点数
+MAX_EXPANDED_PROCESSES = 64
+
+
+@app.get("/api/processes/tree")
+async def get_process_tree(
+    root: Optional[int] = None,
+    depth: Optional[int] = Query(None, ge=0),
+    expand: Optional[str] = None,
+):
+    """获取进程树
+
+    - root: 只返回以该进程为根的子树，省略时返回所有顶层进程
+    - depth: 展开的层数，省略时展开全部
+    - expand: 逗号分隔的 PID，这些节点总是展开子节点并附带 detail（RSS/USS、线程、文件描述符、I/O）
+    """
+    try:
+        expanded = tuple(int(pid) for pid in expand.split(",") if pid.strip()) if expand else ()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"无效的 expand: {expand}")
+    if len(expanded) > MAX_EXPANDED_PROCESSES:
+        raise HTTPException(status_code=400, detail=f"expand 最多 {MAX_EXPANDED_PROCESSES} 个进程")
+    tree = await asyncio.to_thread(monitor.process_table.tree, root, depth, expanded)
+    if tree is None:
+        raise HTTPException(status_code=404, detail=f"进程不存在: {root}")
+    return tree
+
+
+@app.get("/api/processes/{pid}")
+async def get_process_detail(pid: int):
+    """获取单个进程的详情"""
+    detail = await asyncio.to_thread(monitor.process_table.detail, pid)
+    if detail is None:
+        raise HTTPException(status_code=404, detail=f"进程不存在或无权访问: {pid}")
+    return detail
+
+
+# /api/snapshot 可选的分组；processes 支持 processes.top<N>
+SNAPSHOT_FIELDS = ("system", "cpu", "memory", "disk", "disk_io", "network", "processes")
+SNAPSHOT_MAX_PROCESSES = 1000
+
+
+@app.get("/api/snapshot")
+async def get_snapshot(fields: str = ",".join(SNAPSHOT_FIELDS), sort_by: str = "cpu"):
+    """一次请求获取多个分组，各分组并发采集，返回带统一时间戳的文档
+
+    例如 /api/snapshot?fields=cpu,memory,processes.top10
+    """
+    getters = {
+        "system": monitor.get_system_info,
+        "cpu": monitor.get_cpu_info,
+        "memory": monitor.get_memory_info,
+        "disk": monitor.get_disk_info,
+        "disk_io": monitor.get_disk_io_info,
+        "network": monitor.get_network_info,
+    }
+    collectors: Dict[str, Any] = {}
+    for field in fields.split(","):
+        field = field.strip()
+        if not field:
+            continue
+        group, _, option = field.partition(".")
+        if group == "processes":
+            match = re.fullmatch(r"top(\d+)", option) if option else None
+            if option and match is None:
+                raise HTTPException(
+                    status_code=400,
+                    detail={"error": f"无效字段: {field}", "fields": list(SNAPSHOT_FIELDS)},
+                )
+            limit = min(int(match.group(1)), SNAPSHOT_MAX_PROCESSES) if match else 10
+            collectors[group] = lambda limit=limit: monitor.get_processes(sort_by, limit)[0]
+        elif group in getters and not option:
+            collectors[group] = getters[group]
+        else:
+            raise HTTPException(
+                status_code=400,
+                detail={"error": f"无效字段: {field}", "fields": list(SNAPSHOT_FIELDS)},
+            )
+
+    timestamp = time.time()
+    results = await asyncio.gather(*(asyncio.to_thread(collect) for collect in collectors.values()))
+    return {"timestamp": timestamp, **dict(zip(collectors, results))}
+
+
+@app.get("/api/history")
+async def get_history(
+    metric: str,
+    range_: str = Query("1h", alias="range"),
+    step: Optional[str] = None,
+):
+    """获取指标历史的降采样序列（min/max/avg）
+
+    range/step 支持 "300"、"5m"、"1h"、"1d" 等写法；
+    未指定 step 时自动选择，使结果不超过约 300 个点。
+    内存缓冲区不足以覆盖 range 时从持久化存储读取。
+    """
+    if not monitor.recording:
+        raise HTTPException(status_code=404, detail="历史记录未开启")
+    if metric not in HISTORY_METRICS:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": f"未知指标: {metric}", "metrics": list(HISTORY_METRICS)},
+        )
+    try:
+        span = parse_duration(range_)
+        step_seconds = parse_duration(step) if step else span / 300
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    end = time.time()
+    source = monitor.history_source(end - span)
+    return await asyncio.to_thread(source.query, metric, end - span, end, step_seconds)
+
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+@app.get("/api/history/export")
+async def export_history(
+    range_: str = Query("1h", alias="range"),
+    metrics: Optional[str] = None,
+    format: str = "ndjson",
+):
+    """流式导出持久化存储中的原始记录（NDJSON 或 CSV），按块读取，不会一次性加载整个范围"""
+    if monitor.store is None:
+        raise HTTPException(status_code=404, detail="持久化存储未开启（设置 MONITOR_STORE_DIR）")
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"不支持的格式: {format}，可选: ndjson, csv")
+    selected = metrics.split(",") if metrics else list(HISTORY_METRICS)
+    unknown = [name for name in selected if name not in HISTORY_METRICS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": f"未知指标: {', '.join(unknown)}", "metrics": list(HISTORY_METRICS)},
+        )
+    try:
+        span = parse_duration(range_)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    end = time.time()
+    return StreamingResponse(
+        monitor.store.export(end - span, end, selected, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="metrics.{format}"'},
+    )
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """OpenMetrics 格式的指标，基于缓存的最新快照生成"""
+    return Response(await monitor.render_metrics(), media_type=OPENMETRICS_CONTENT_TYPE)
+
+
+async def _read_monitor_control(websocket: WebSocket, client: MonitorClient) -> None:
+    """读取客户端的订阅控制消息，直到连接断开"""
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                continue
+            if not isinstance(message, dict):
+                continue
+            if message.get("type") == "subscribe":
+                client.subscription = Subscription.negotiate(message, monitor.sample_interval)
+                client.send_control(client.subscription.describe())
+            elif message.get("type") == "resync":
+                client.subscription.reset()
+    except WebSocketDisconnect:
+        pass
+
+
+async def _serve_client(websocket: WebSocket, client: MonitorClient, reader: Any, registry: Any) -> None:
+    """运行一个推送连接的发送任务与读取任务，任一结束即注销并清理"""
+    client.writer = asyncio.create_task(client.run())
+    reader = asyncio.create_task(reader)
+    registry.add_client(client)
+    try:
+        # 客户端断开、发送失败或因落后过多被断开时结束
+        await asyncio.wait({reader, client.writer}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        registry.remove_client(client)
+        reader.cancel()
+        client.writer.cancel()
+        if client.lagging:
+            try:
+                await asyncio.wait_for(websocket.close(code=1013, reason="client too slow"), timeout=1.0)
+            except Exception:
+                pass
+
+
+async def _drain_until_disconnect(websocket: WebSocket) -> None:
+    """只读推送连接：忽略客户端发来的消息，直到连接断开"""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
 
 
 @app.websocket("/ws/monitor")
 async def websocket_monitor(websocket: WebSocket):
-    """实时监控 WebSocket"""
+    """实时监控 WebSocket
+
+    默认使用 v1 协议（完整 JSON）。v2 客户端可通过查询参数
+    ?version=2&groups=cpu,memory&interval=2&encoding=msgpack 协商，
+    也可在连接后发送 {"type": "subscribe", ...} 修改订阅，
+    发送 {"type": "resync"} 请求关键帧。
+    """
     await websocket.accept()
-    monitor.monitoring_clients.append(websocket)
+    subscription = Subscription.negotiate(dict(websocket.query_params), monitor.sample_interval)
+    client = MonitorClient(websocket, subscription, monitor.stats, WS_MAX_LAG)
+    if subscription.version > 1:
+        client.send_control(subscription.describe())
+
+    await _serve_client(websocket, client, _read_monitor_control(websocket, client), monitor)
+
+
+@app.get("/api/monitor/clients")
+async def get_monitor_clients():
+    """获取各 WebSocket 客户端的订阅与发送统计"""
+    return [client.describe() for client in monitor.monitoring_clients]
+
+
+@app.get("/api/alerts")
+async def get_alerts():
+    """告警规则、当前状态（ok/firing/nodata）与最近的状态变化"""
+    return monitor.alerts.describe()
+
+
+@app.post("/api/alerts/rules")
+async def add_alert_rule(spec: Dict[str, Any] = Body(...)):
+    """添加或替换（同名）一条告警规则"""
     try:
-        await monitor.monitor_loop(websocket)
-    finally:
-        if websocket in monitor.monitoring_clients:
-            monitor.monitoring_clients.remove(websocket)
+        rule = monitor.alerts.add_rule(spec)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    monitor.ensure_sampler()
+    return rule.describe()
 
 
-def main():
-    """启动 HTTP 服务器"""
-    port = 8001  # 默认端口
-    print(f"启动系统信息监控服务: http://127.0.0.1:{port}", file=sys.stderr)
-    uvicorn.run(app, host="127.0.0.1", port=port, log_level="info")
+@app.delete("/api/alerts/rules/{name}")
+async def delete_alert_rule(name: str):
+    """删除一条告警规则"""
+    if not monitor.alerts.remove_rule(name):
+        raise HTTPException(status_code=404, detail=f"规则不存在: {name}")
+    return {"deleted": name}
 
 
-if __name__ == "__main__":
-    main()
+@app.websocket("/ws/alerts")
+async def websocket_alerts(websocket: WebSocket):
+    """告警推送：连接后先发送一次 {"type": "alerts", ...} 全量状态，之后推送状态变化
+
+    {"type": "alert", "seq", "rule", "from", "state", "value", "timestamp"}；
+    seq 不连续说明有事件因客户端过慢被丢弃，可重新获取 /api/alerts。
+    """
+    await websocket.accept()
+    client = MonitorClient(websocket, Subscription(version=1), monitor.stats, WS_MAX_LAG)
+    client.send_control({"type": "alerts", **monitor.alerts.describe()})
+    await _serve_client(websocket, client, _drain_until_disconnect(websocket), monitor.alerts)
+
+
+def _parse_groups(groups: Optional[str]) -> Optional[List[str]]:
+    if not groups:
+        return None
+    requested = set(groups.split(","))
+    unknown = requested - set(MONITOR_GROUPS)
+    if unknown:
+        raise ValueError(f"未知的分组: {', '.join(sorted(unknown))}")
+    return [group for group in MONITOR_GROUPS if group in requested]
+
+
+@app.get("/api/fleet")
+async def get_fleet(groups: Optional[str] = None, hosts: Optional[str] = None):
+    """汇聚模式：所有上游主机的最新快照、数据年龄与连接状态
+
+    groups 限定返回的指标分组（逗号分隔），hosts 限定主机名（逗号分隔）。
+    """
+    if fleet is None:
+        raise HTTPException(status_code=404, detail="未启用汇聚模式（设置 MONITOR_FLEET_UPSTREAMS）")
+    try:
+        selected = _parse_groups(groups)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return fleet.snapshot(selected, hosts.split(",") if hosts else None)
+
+
+@app.websocket("/ws/fleet")
+async def websocket_fleet(websocket: WebSocket):
+    """汇聚模式实时推送：每个采样周期发送一次完整的合并视图
+
+    {"type": "fleet_data", "timestamp", "summary", "hosts": {...}}，可用 ?groups=cpu,memory 限定分组。
+    慢客户端只会收到最新一帧（旧帧被合并），与 /ws/monitor 相同。
+    """
+    await websocket.accept()
+    if fleet is None:
+        await websocket.close(code=1008, reason="fleet mode disabled")
+        return
+    try:
+        groups = _parse_groups(websocket.query_params.get("groups"))
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    client = MonitorClient(websocket, Subscription(version=1, groups=groups), monitor.stats, WS_MAX_LAG)
+    await _serve_client(websocket, client, _drain_until_disconnect(websocket), fleet)
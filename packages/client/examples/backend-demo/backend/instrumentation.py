@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+后端自监控与 OpenMetrics 文本输出
+不依赖 prometheus_client，/metrics 只读取缓存的最新快照，不触发 psutil 调用
+"""
+
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# 秒级延迟直方图的桶边界
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Histogram:
+    """固定桶边界的累积直方图，线程安全"""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> Tuple[List[Tuple[str, int]], int, float]:
+        """返回 ([(le, 累积计数)], 总数, 总和)"""
+        with self._lock:
+            counts = list(self._counts)
+            total_sum = self._sum
+        cumulative = []
+        running = 0
+        for bound, count in zip(self.buckets, counts):
+            running += count
+            cumulative.append((_format_value(bound), running))
+        running += counts[-1]
+        cumulative.append(("+Inf", running))
+        return cumulative, running, total_sum
+
+
+class SamplerStats:
+    """采样器与推送链路的自监控数据"""
+
+    def __init__(self):
+        self.collector_latency: Dict[str, Histogram] = {}
+        self.loop_lag = Histogram()
+        self.last_loop_lag = 0.0
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.frames_coalesced = 0
+        self._lock = threading.Lock()
+
+    def observe_collector(self, name: str, seconds: float) -> None:
+        histogram = self.collector_latency.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.collector_latency.setdefault(name, Histogram())
+        histogram.observe(seconds)
+
+    def timed(self, name: str, func: Any, *args: Any) -> Any:
+        """执行采集函数并记录耗时"""
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.observe_collector(name, time.perf_counter() - start)
+
+    def observe_loop_lag(self, seconds: float) -> None:
+        self.last_loop_lag = seconds
+        self.loop_lag.observe(seconds)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+class OpenMetricsWriter:
+    """按指标族拼接 OpenMetrics 文本"""
+
+    def __init__(self):
+        self._lines: List[str] = []
+
+    def family(
+        self,
+        name: str,
+        kind: str,
+        help_text: str,
+        samples: Iterable[Tuple[Dict[str, Any], Any]],
+        unit: Optional[str] = None,
+    ) -> None:
+        """写入一个指标族；counter/info 的样本名自动追加 _total/_info，值为 None 的样本会被跳过"""
+        rows = [(labels, value) for labels, value in samples if isinstance(value, (int, float))]
+        if not rows:
+            return
+        self._lines.append(f"# TYPE {name} {kind}")
+        if unit:
+            self._lines.append(f"# UNIT {name} {unit}")
+        self._lines.append(f"# HELP {name} {_escape(help_text)}")
+        sample_name = {"counter": f"{name}_total", "info": f"{name}_info"}.get(kind, name)
+        for labels, value in rows:
+            self._lines.append(f"{sample_name}{self._labels(labels)} {_format_value(value)}")
+
+    def histogram(self, name: str, help_text: str, series: Iterable[Tuple[Dict[str, Any], Histogram]]) -> None:
+        series = list(series)
+        if not series:
+            return
+        self._lines.append(f"# TYPE {name} histogram")
+        self._lines.append(f"# UNIT {name} seconds")
+        self._lines.append(f"# HELP {name} {_escape(help_text)}")
+        for labels, histogram in series:
+            buckets, count, total = histogram.snapshot()
+            for le, cumulative in buckets:
+                self._lines.append(f"{name}_bucket{self._labels({**labels, 'le': le})} {cumulative}")
+            self._lines.append(f"{name}_count{self._labels(labels)} {count}")
+            self._lines.append(f"{name}_sum{self._labels(labels)} {_format_value(total)}")
+
+    @staticmethod
+    def _labels(labels: Dict[str, Any]) -> str:
+        if not labels:
+            return ""
+        return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+    def render(self) -> str:
+        return "\n".join(self._lines + ["# EOF", ""])
+
+
+def _group(data: Optional[Dict[str, Any]], name: str) -> Dict[str, Any]:
+    value = (data or {}).get(name)
+    return value if isinstance(value, dict) and "error" not in value else {}
+
+
+def render_openmetrics(
+    snapshot: Optional[Dict[str, Any]],
+    slow: Optional[Dict[str, Any]],
+    stats: SamplerStats,
+    clients: int,
+) -> str:
+    """由缓存的快照与自监控数据生成 /metrics 文本"""
+    w = OpenMetricsWriter()
+
+    cpu = _group(snapshot, "cpu")
+    w.family("system_cpu_usage_percent", "gauge", "Overall CPU usage", [({}, cpu.get("percent"))])
+    w.family(
+        "system_cpu_core_usage_percent", "gauge", "Per-core CPU usage",
+        [({"core": i}, v) for i, v in enumerate(cpu.get("percent_per_core") or [])],
+    )
+    freq = cpu.get("frequency") or {}
+    w.family("system_cpu_frequency_mhz", "gauge", "Current CPU frequency in MHz", [({}, freq.get("current"))])
+
+    memory = _group(snapshot, "memory")
+    w.family("system_memory_total_bytes", "gauge", "Total physical memory", [({}, memory.get("total"))], "bytes")
+    w.family("system_memory_available_bytes", "gauge", "Available memory", [({}, memory.get("available"))], "bytes")
+    w.family("system_memory_used_bytes", "gauge", "Used memory", [({}, memory.get("used"))], "bytes")
+    w.family("system_memory_usage_percent", "gauge", "Memory usage", [({}, memory.get("percent"))])
+    w.family("system_swap_total_bytes", "gauge", "Total swap", [({}, memory.get("swap_total"))], "bytes")
+    w.family("system_swap_used_bytes", "gauge", "Used swap", [({}, memory.get("swap_used"))], "bytes")
+    w.family("system_swap_usage_percent", "gauge", "Swap usage", [({}, memory.get("swap_percent"))])
+
+    interfaces = _group(snapshot, "network").get("interfaces") or {}
+    for field, metric, help_text, unit in (
+        ("bytes_sent", "system_network_transmit_bytes", "Bytes sent per interface", "bytes"),
+        ("bytes_recv", "system_network_receive_bytes", "Bytes received per interface", "bytes"),
+        ("packets_sent", "system_network_transmit_packets", "Packets sent per interface", None),
+        ("packets_recv", "system_network_receive_packets", "Packets received per interface", None),
+    ):
+        w.family(metric, "counter", help_text, [({"interface": nic}, c.get(field)) for nic, c in interfaces.items()], unit)
+
+    disk_io = _group(snapshot, "disk_io")
+    for field, metric, help_text, unit in (
+        ("read_bytes", "system_disk_read_bytes", "Bytes read per disk", "bytes"),
+        ("write_bytes", "system_disk_written_bytes", "Bytes written per disk", "bytes"),
+        ("read_count", "system_disk_reads", "Read operations per disk", None),
+        ("write_count", "system_disk_writes", "Write operations per disk", None),
+    ):
+        w.family(metric, "counter", help_text, [({"disk": disk}, c.get(field)) for disk, c in disk_io.items()], unit)
+
+    disks = [d for d in (slow or {}).get("disk") or [] if isinstance(d, dict) and "mountpoint" in d]
+    labels = [{"mountpoint": d["mountpoint"], "device": d["device"], "fstype": d["fstype"]} for d in disks]
+    w.family("system_filesystem_size_bytes", "gauge", "Filesystem size", [(l, d["total"]) for l, d in zip(labels, disks)], "bytes")
+    w.family("system_filesystem_used_bytes", "gauge", "Filesystem used space", [(l, d["used"]) for l, d in zip(labels, disks)], "bytes")
+    w.family("system_filesystem_free_bytes", "gauge", "Filesystem free space", [(l, d["free"]) for l, d in zip(labels, disks)], "bytes")
+    w.family(
+        "system_filesystem_available", "gauge", "Whether the filesystem answered its usage probe in time",
+        [(l, d.get("status") == "ok") for l, d in zip(labels, disks)],
+    )
+
+    w.family("system_processes", "gauge", "Number of processes", [({}, (slow or {}).get("process_count"))])
+    system = _group(slow, "system")
+    if system:
+        info_labels = {k: system.get(k) for k in ("platform", "platform_release", "architecture", "hostname")}
+        w.family("system_host", "info", "Static system information", [(info_labels, 1)])
+        w.family("system_cpu_count", "gauge", "Logical CPU count", [({}, system.get("cpu_count_logical"))])
+
+    # 后端自身状态
+    if snapshot:
+        w.family(
+            "booltox_monitor_snapshot_timestamp_seconds", "gauge", "Time of the cached snapshot",
+            [({}, snapshot.get("timestamp"))], "seconds",
+        )
+    w.histogram(
+        "booltox_monitor_collector_duration_seconds", "Sampling latency per collector",
+        [({"collector": name}, h) for name, h in sorted(stats.collector_latency.items())],
+    )
+    w.family("booltox_monitor_websocket_clients", "gauge", "Connected /ws/monitor clients", [({}, clients)])
+    w.family("booltox_monitor_frames_sent", "counter", "WebSocket frames sent", [({}, stats.frames_sent)])
+    w.family("booltox_monitor_frames_dropped", "counter", "WebSocket frames dropped", [({}, stats.frames_dropped)])
+    w.family(
+        "booltox_monitor_frames_coalesced", "counter", "Stale WebSocket frames replaced by a newer snapshot",
+        [({}, stats.frames_coalesced)],
+    )
+    w.histogram("booltox_monitor_event_loop_lag_seconds", "Event loop scheduling lag", [({}, stats.loop_lag)])
+    return w.render()
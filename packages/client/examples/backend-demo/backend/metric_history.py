@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+监控指标历史 - 固定内存的环形缓冲区
+所有指标共享一条时间轴，按列存放在预分配的 NumPy 数组中，
+写入为 O(1)，查询时以向量化方式做 min/max/avg 降采样
+"""
+
+from __future__ import annotations
+
+import math
+import sys
+import threading
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    print("错误: numpy 库未安装，请运行: pip install numpy", file=sys.stderr)
+    sys.exit(1)
+
+
+# 时间范围后缀 -> 秒
+_RANGE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_duration(value: str) -> float:
+    """解析 "300" / "5m" / "1h" / "1d" 形式的时长，返回秒数"""
+    text = value.strip().lower()
+    if not text:
+        raise ValueError("时长不能为空")
+    unit = _RANGE_UNITS.get(text[-1])
+    number = text[:-1] if unit else text
+    try:
+        seconds = float(number) * (unit or 1)
+    except ValueError:
+        raise ValueError(f"无效的时长: {value}") from None
+    if not math.isfinite(seconds) or seconds <= 0:
+        raise ValueError(f"无效的时长: {value}")
+    return seconds
+
+
+Partials = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+def bucket_partials(
+    buckets: np.ndarray,
+    mins: np.ndarray,
+    maxs: np.ndarray,
+    sums: np.ndarray,
+    counts: np.ndarray,
+) -> Partials:
+    """按桶编号（单调不减）分组聚合，返回 (桶编号, min, max, sum, count)
+
+    输入既可以是原始采样（min = max = sum = 值，count = 是否有效），
+    也可以是已聚合的分组结果，因此分段计算的结果可以再次合并。
+    """
+    if buckets.size == 0:
+        empty = np.empty(0)
+        return buckets, empty, empty, empty, empty
+    # 桶编号单调，用 reduceat 一次性完成分组聚合
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+    return (
+        buckets[starts],
+        np.fmin.reduceat(mins, starts),
+        np.fmax.reduceat(maxs, starts),
+        np.add.reduceat(sums, starts),
+        np.add.reduceat(counts, starts),
+    )
+
+
+def raw_partials(timestamps: np.ndarray, values: np.ndarray, start: float, step: float) -> Partials:
+    """原始采样 -> 分桶聚合结果，NaN 视为缺失"""
+    values = values.astype(np.float64)
+    valid = ~np.isnan(values)
+    buckets = np.floor((timestamps - start) / step).astype(np.int64)
+    return bucket_partials(buckets, values, values, np.where(valid, values, 0.0), valid.astype(np.int64))
+
+
+def merge_partials(parts: Sequence[Partials]) -> Partials:
+    """合并按时间顺序排列的多段分桶结果（相邻段可能共享边界桶）"""
+    if len(parts) == 1:
+        return parts[0]
+    if not parts:
+        return bucket_partials(np.empty(0, dtype=np.int64), *(np.empty(0),) * 4)
+    return bucket_partials(*(np.concatenate(columns) for columns in zip(*parts)))
+
+
+def history_result(metric: str, start: float, end: float, step: float, partials: Partials) -> Dict[str, Any]:
+    """把分桶结果转换为 /api/history 的响应结构；空桶不会出现在结果中"""
+    buckets, mins, maxs, sums, counts = partials
+    keep = counts > 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avgs = sums / counts
+    return {
+        "metric": metric,
+        "start": start,
+        "end": end,
+        "step": step,
+        "timestamps": (start + buckets[keep] * step).tolist(),
+        "min": np.round(mins[keep], 3).tolist(),
+        "max": np.round(maxs[keep], 3).tolist(),
+        "avg": np.round(avgs[keep], 3).tolist(),
+    }
+
+
+class MetricHistory:
+    """多指标环形缓冲区
+
+    内存占用固定为 capacity * (8 + 4 * 指标数) 字节：
+    时间戳为 float64，指标值为 float32（约 7 位有效数字，足够绘图），缺失值以 NaN 表示。
+    例如 24 小时 @ 1 秒（86400 个采样点）、10 个指标约占 4.1 MB。
+    """
+
+    def __init__(self, metrics: Sequence[str], capacity: int, resolution: float = 1.0):
+        if capacity <= 0:
+            raise ValueError("capacity 必须大于 0")
+        self.metrics: List[str] = list(metrics)
+        self.capacity = capacity
+        self.resolution = resolution
+        self._index = {name: i for i, name in enumerate(self.metrics)}
+        self._timestamps = np.zeros(capacity, dtype=np.float64)
+        self._values = np.full((len(self.metrics), capacity), np.nan, dtype=np.float32)
+        self._head = 0  # 下一次写入的位置
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        """缓冲区实际占用的字节数"""
+        return self._timestamps.nbytes + self._values.nbytes
+
+    def __len__(self) -> int:
+        return self._size
+
+    def record(self, timestamp: float, values: Mapping[str, Optional[float]]) -> None:
+        """追加一个采样点，未提供的指标记为 NaN"""
+        with self._lock:
+            pos = self._head
+            self._timestamps[pos] = timestamp
+            column = self._values[:, pos]
+            column.fill(np.nan)
+            for name, value in values.items():
+                i = self._index.get(name)
+                if i is not None and value is not None:
+                    column[i] = value
+            self._head = (pos + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def _ordered(self, row: int) -> Tuple[np.ndarray, np.ndarray]:
+        """按时间顺序返回 (时间戳, 指标值) 的副本"""
+        with self._lock:
+            if self._size < self.capacity:
+                return (
+                    self._timestamps[: self._size].copy(),
+                    self._values[row, : self._size].copy(),
+                )
+            head = self._head
+            timestamps = np.concatenate((self._timestamps[head:], self._timestamps[:head]))
+            values = np.concatenate((self._values[row, head:], self._values[row, :head]))
+            return timestamps, values
+
+    def query(self, metric: str, start: float, end: float, step: float) -> Dict[str, Any]:
+        """返回 [start, end] 内按 step 秒分桶的 min/max/avg 序列
+
+        空桶不会出现在结果中；时间戳为每个桶的起始时间。
+        """
+        row = self._index.get(metric)
+        if row is None:
+            raise KeyError(metric)
+        step = max(step, self.resolution)
+
+        timestamps, values = self._ordered(row)
+        lo = int(np.searchsorted(timestamps, start, side="left"))
+        hi = int(np.searchsorted(timestamps, end, side="right"))
+        partials = raw_partials(timestamps[lo:hi], values[lo:hi], start, step)
+        return history_result(metric, start, end, step, partials)
+
+    @property
+    def oldest(self) -> Optional[float]:
+        """最早一个采样点的时间戳，缓冲区为空时返回 None"""
+        with self._lock:
+            if self._size == 0:
+                return None
+            return float(self._timestamps[0 if self._size < self.capacity else self._head])
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+持久化指标存储 - 内存映射的定长列式分段文件
+后端重启后历史数据不丢失：
+
+- 原始分段 raw-<起始时间>.seg：按 segment_seconds（默认 1 天）切分，
+  文件创建时按容量预分配，时间戳与每个指标各占一段连续的列，读取单个指标只触及该列；
+  追加写入只是对 mmap 的几次赋值，不涉及系统调用
+- 汇总分段 rollup<步长>-<起始时间>.seg：超过 raw_retention 的原始分段被压缩为
+  每 rollup_step 秒一行的 min/max/avg/count，原始分段随后删除
+- 查询逐分段在 mmap 上二分定位并降采样，只有命中的列页被读入内存；
+  导出以固定行数分块生成 NDJSON/CSV，不会一次性加载整个时间范围
+
+文件布局：
+    [0:8)    魔数 b"BTXSEG01"
+    [8:16)   已写入行数（uint64，小端）
+    [16:20)  头部 JSON 长度（uint32）
+    [20:...) 头部 JSON：{"kind", "start", "step", "capacity", "metrics", "fields"}
+    [DATA_OFFSET:) 时间戳列（float64 × capacity），随后每个 (指标, 字段) 一列 float32 × capacity
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from fast_json import dumps
+from metric_history import Partials, bucket_partials, history_result, merge_partials, raw_partials
+
+try:
+    import numpy as np
+except ImportError:
+    print("错误: numpy 库未安装，请运行: pip install numpy", file=sys.stderr)
+    sys.exit(1)
+
+
+MAGIC = b"BTXSEG01"
+DATA_OFFSET = 4096
+RAW_FIELDS = ("value",)
+ROLLUP_FIELDS = ("min", "max", "avg", "count")
+SEGMENT_NAME = re.compile(r"^(raw|rollup(\d+))-(\d+)\.seg$")
+
+# 导出时每次从 mmap 读取的行数
+EXPORT_CHUNK_ROWS = 4096
+
+
+class Segment:
+    """一个分段文件：头部 + 预分配的定长列"""
+
+    def __init__(self, path: str, writable: bool = False):
+        self.path = path
+        with open(path, "rb") as f:
+            prefix = f.read(20)
+            if len(prefix) < 20 or prefix[:8] != MAGIC:
+                raise ValueError(f"不是有效的分段文件: {path}")
+            header_len = int.from_bytes(prefix[16:20], "little")
+            header = json.loads(f.read(header_len))
+        self.kind: str = header["kind"]
+        self.start: float = header["start"]
+        self.step: float = header["step"]
+        self.capacity: int = header["capacity"]
+        self.metrics: List[str] = header["metrics"]
+        self.fields: List[str] = header["fields"]
+        self._columns = {
+            (metric, field): i for i, (metric, field) in enumerate((m, f) for m in self.metrics for f in self.fields)
+        }
+
+        self._map = np.memmap(path, dtype=np.uint8, mode="r+" if writable else "r")
+        self._count = np.ndarray((1,), dtype="<u8", buffer=self._map, offset=8)
+        self.timestamps = np.ndarray((self.capacity,), dtype="<f8", buffer=self._map, offset=DATA_OFFSET)
+        self.values = np.ndarray(
+            (len(self._columns), self.capacity), dtype="<f4", buffer=self._map,
+            offset=DATA_OFFSET + 8 * self.capacity,
+        )
+
+    @classmethod
+    def create(
+        cls,
+        path: str,
+        kind: str,
+        start: float,
+        step: float,
+        capacity: int,
+        metrics: Sequence[str],
+        fields: Sequence[str],
+    ) -> "Segment":
+        header = json.dumps({
+            "kind": kind, "start": start, "step": step, "capacity": capacity,
+            "metrics": list(metrics), "fields": list(fields),
+        }).encode("utf-8")
+        if 20 + len(header) > DATA_OFFSET:
+            raise ValueError("指标过多，分段头部超出 4 KB")
+        size = DATA_OFFSET + capacity * (8 + 4 * len(metrics) * len(fields))
+        with open(path, "wb") as f:
+            f.write(MAGIC + (0).to_bytes(8, "little") + len(header).to_bytes(4, "little") + header)
+            f.truncate(size)  # 预分配（稀疏文件），未写入的数据页不占磁盘
+        return cls(path, writable=True)
+
+    @property
+    def count(self) -> int:
+        return int(self._count[0])
+
+    @property
+    def end(self) -> float:
+        return self.start + self.capacity * self.step
+
+    @property
+    def last_timestamp(self) -> Optional[float]:
+        count = self.count
+        return float(self.timestamps[count - 1]) if count else None
+
+    def column(self, metric: str, field: str) -> Optional[np.ndarray]:
+        index = self._columns.get((metric, field))
+        return None if index is None else self.values[index]
+
+    def append(self, timestamp: float, row: np.ndarray) -> bool:
+        """追加一行（row 按 metrics × fields 顺序排列）；分段已满时返回 False"""
+        count = self.count
+        if count >= self.capacity:
+            return False
+        self.timestamps[count] = timestamp
+        self.values[:, count] = row
+        self._count[0] = count + 1  # 最后更新行数，读取方看到的行总是完整的
+        return True
+
+    def span(self, start: float, end: float) -> Tuple[int, int]:
+        """[start, end] 在本分段内的行号区间"""
+        timestamps = self.timestamps[: self.count]
+        return (
+            int(np.searchsorted(timestamps, start, side="left")),
+            int(np.searchsorted(timestamps, end, side="right")),
+        )
+
+    def partials(self, metric: str, start: float, end: float, step: float) -> Optional[Partials]:
+        """本分段内某指标在 [start, end] 的分桶聚合结果"""
+        lo, hi = self.span(start, end)
+        if lo >= hi:
+            return None
+        timestamps = self.timestamps[lo:hi]
+        if self.kind == "raw":
+            values = self.column(metric, "value")
+            return None if values is None else raw_partials(timestamps, values[lo:hi], start, step)
+
+        avg = self.column(metric, "avg")
+        if avg is None:
+            return None
+        counts = self.column(metric, "count")[lo:hi].astype(np.float64)
+        buckets = np.floor((timestamps - start) / step).astype(np.int64)
+        return bucket_partials(
+            buckets,
+            self.column(metric, "min")[lo:hi].astype(np.float64),
+            self.column(metric, "max")[lo:hi].astype(np.float64),
+            np.where(counts > 0, avg[lo:hi].astype(np.float64) * counts, 0.0),
+            counts,
+        )
+
+    def flush(self) -> None:
+        self._map.flush()
+
+
+class MetricStore:
+    """按时间分段的持久化指标存储
+
+    写入只在事件循环线程中进行；查询、导出与压缩在线程池中运行，
+    读取方先取得分段列表与行数的快照，已写入的行不会再被修改，因此无需持锁读取数据。
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        metrics: Sequence[str],
+        resolution: float = 1.0,
+        segment_seconds: float = 86400.0,
+        raw_retention: float = 7 * 86400.0,
+        rollup_step: float = 60.0,
+        rollup_retention: float = 365 * 86400.0,
+    ):
+        self.directory = directory
+        self.metrics: List[str] = list(metrics)
+        self.resolution = resolution
+        self.segment_seconds = segment_seconds
+        self.raw_retention = raw_retention
+        self.rollup_step = rollup_step
+        self.rollup_retention = rollup_retention
+        self._index = {name: i for i, name in enumerate(self.metrics)}
+        self._row = np.full(len(self.metrics), np.nan, dtype=np.float32)
+        self._lock = threading.Lock()
+        self._maintenance = threading.Lock()
+        self._active: Optional[Segment] = None
+        self._segments: List[Segment] = []  # 按起始时间排序，含活动分段
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self) -> None:
+        segments = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".tmp"):
+                os.remove(path)  # 上次压缩中断留下的临时文件
+                continue
+            if not SEGMENT_NAME.match(name):
+                continue
+            try:
+                segments.append(Segment(path))
+            except (OSError, ValueError, KeyError) as e:
+                print(f"跳过损坏的分段 {name}: {e}", file=sys.stderr)
+        segments.sort(key=lambda seg: (seg.start, seg.kind != "raw"))
+        self._segments = segments
+
+        # 最新的原始分段如果指标一致且未满，重启后继续写入
+        raws = [seg for seg in segments if seg.kind == "raw"]
+        if raws and raws[-1].metrics == self.metrics and raws[-1].count < raws[-1].capacity:
+            latest = Segment(raws[-1].path, writable=True)
+            self._segments[self._segments.index(raws[-1])] = latest
+            self._active = latest
+
+    def _segment_path(self, kind: str, start: float) -> str:
+        return os.path.join(self.directory, f"{kind}-{int(start)}.seg")
+
+    def _rotate(self, timestamp: float) -> Segment:
+        start = math.floor(timestamp / self.segment_seconds) * self.segment_seconds
+        path = self._segment_path("raw", start)
+        if os.path.exists(path):  # 同一时间窗内指标集合变化或分段已满：另起一个文件
+            start = timestamp
+            path = self._segment_path("raw", start)
+        capacity = int(math.ceil((start + self.segment_seconds - timestamp) / self.resolution)) + 1
+        # 采样间隔抖动时同一时间窗内可能多写几行，预留 5%
+        capacity = int(capacity * 1.05) + 16
+        segment = Segment.create(path, "raw", start, self.resolution, capacity, self.metrics, RAW_FIELDS)
+        with self._lock:
+            if self._active is not None:
+                self._active.flush()
+            self._segments.append(segment)
+            self._active = segment
+        return segment
+
+    def record(self, timestamp: float, values: Dict[str, Optional[float]]) -> None:
+        """追加一个采样点（时间戳必须递增，回退的采样会被忽略）"""
+        row = self._row
+        row.fill(np.nan)
+        index = self._index
+        for name, value in values.items():
+            i = index.get(name)
+            if i is not None and value is not None:
+                row[i] = value
+
+        active = self._active
+        if active is not None:
+            last = active.last_timestamp
+            if last is not None and timestamp <= last:
+                return
+            if timestamp < active.start + self.segment_seconds and active.append(timestamp, row):
+                return
+        self._rotate(timestamp).append(timestamp, row)
+
+    def _snapshot(self, start: float, end: float) -> List[Segment]:
+        with self._lock:
+            return [seg for seg in self._segments if seg.start <= end and (seg.last_timestamp or seg.start) >= start]
+
+    @property
+    def oldest(self) -> Optional[float]:
+        with self._lock:
+            for seg in self._segments:
+                if seg.count:
+                    return float(seg.timestamps[0])
+        return None
+
+    def query(self, metric: str, start: float, end: float, step: float) -> Dict[str, Any]:
+        """与 MetricHistory.query 相同的结构；跨越原始与汇总分段时按 step 合并"""
+        if metric not in self._index:
+            raise KeyError(metric)
+        step = max(step, self.resolution)
+        parts = []
+        for segment in self._snapshot(start, end):
+            part = segment.partials(metric, start, end, step)
+            if part is not None:
+                parts.append(part)
+        return history_result(metric, start, end, step, merge_partials(parts))
+
+    def export(self, start: float, end: float, metrics: Sequence[str], fmt: str = "ndjson") -> Iterator[bytes]:
+        """逐块生成 [start, end] 内的原始记录（汇总分段输出其 avg），每块最多 EXPORT_CHUNK_ROWS 行"""
+        if fmt == "csv":
+            yield (",".join(["timestamp", *metrics]) + "\n").encode("utf-8")
+        for segment in self._snapshot(start, end):
+            field = "value" if segment.kind == "raw" else "avg"
+            columns = [segment.column(metric, field) for metric in metrics]
+            lo, hi = segment.span(start, end)
+            for chunk_start in range(lo, hi, EXPORT_CHUNK_ROWS):
+                chunk_end = min(chunk_start + EXPORT_CHUNK_ROWS, hi)
+                timestamps = segment.timestamps[chunk_start:chunk_end].tolist()
+                values = [
+                    [None] * len(timestamps) if column is None
+                    else [None if v != v else round(v, 3) for v in column[chunk_start:chunk_end].tolist()]
+                    for column in columns
+                ]
+                lines: List[bytes] = []
+                for i, timestamp in enumerate(timestamps):
+                    row = [column[i] for column in values]
+                    if fmt == "csv":
+                        line = ",".join([repr(timestamp), *("" if v is None else repr(v) for v in row)])
+                        lines.append(line.encode("utf-8"))
+                    else:
+                        lines.append(dumps({"timestamp": timestamp, **dict(zip(metrics, row))}))
+                yield b"\n".join(lines) + b"\n"
+
+    def _compact(self, segment: Segment) -> Segment:
+        """把一个已封存的原始分段压缩为汇总分段"""
+        step = self.rollup_step
+        capacity = int(math.ceil((segment.end - segment.start) / step)) + 2
+        path = self._segment_path(f"rollup{int(step)}", segment.start)
+        rollup = Segment.create(path + ".tmp", "rollup", segment.start, step, capacity, segment.metrics, ROLLUP_FIELDS)
+        count = segment.count
+        timestamps = segment.timestamps[:count]
+        parts = [
+            raw_partials(timestamps, segment.column(metric, "value")[:count], segment.start, step)
+            for metric in segment.metrics
+        ]
+        if parts and parts[0][0].size:
+            ids = parts[0][0]
+            rows = ids.size
+            rollup.timestamps[:rows] = segment.start + ids * step
+            for m, (_, mins, maxs, sums, counts) in enumerate(parts):
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    avgs = np.where(counts > 0, sums / counts, np.nan)
+                base = m * len(ROLLUP_FIELDS)
+                rollup.values[base, :rows] = mins
+                rollup.values[base + 1, :rows] = maxs
+                rollup.values[base + 2, :rows] = avgs
+                rollup.values[base + 3, :rows] = counts
+            rollup._count[0] = rows
+        rollup.flush()
+        os.replace(rollup.path, path)
+        return Segment(path)
+
+    def maintain(self, now: Optional[float] = None) -> None:
+        """刷盘、压缩过期的原始分段并删除超过保留期的汇总分段（在线程池中调用）"""
+        if not self._maintenance.acquire(blocking=False):
+            return
+        try:
+            self._maintain(time.time() if now is None else now)
+        except (OSError, ValueError) as e:
+            print(f"指标存储维护失败: {e}", file=sys.stderr)
+        finally:
+            self._maintenance.release()
+
+    def _maintain(self, now: float) -> None:
+        with self._lock:
+            active = self._active
+            segments = list(self._segments)
+        if active is not None:
+            active.flush()
+        for segment in segments:
+            if segment is active:
+                continue
+            last = segment.last_timestamp or segment.start
+            if segment.kind == "raw" and last < now - self.raw_retention:
+                replacement = self._compact(segment)
+                with self._lock:
+                    self._segments[self._segments.index(segment)] = replacement
+                os.remove(segment.path)
+            elif segment.kind == "rollup" and last < now - self.rollup_retention:
+                with self._lock:
+                    self._segments.remove(segment)
+                os.remove(segment.path)
+
+    def disk_usage(self) -> int:
+        """分段文件实际占用的磁盘字节数"""
+        with self._lock:
+            paths = [seg.path for seg in self._segments]
+        total = 0
+        for path in paths:
+            try:
+                total += os.stat(path).st_blocks * 512
+            except OSError:
+                pass
+        return total
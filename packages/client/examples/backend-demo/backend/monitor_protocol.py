@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+/ws/monitor 推送协议
+
+v1（默认）：每次采样推送完整 JSON {"type": "monitor_data", "data": {...}}
+v2（协商）：客户端订阅指标分组与推送间隔，服务端发送关键帧 + 增量帧，
+           帧可使用 msgpack 二进制编码，JSON 作为回退
+
+v2 帧格式：
+    {"type": "keyframe", "seq": n, "timestamp_ms": t, "data": {分组: {...}}}
+    {"type": "delta", "seq": n, "base": n - 1, "timestamp_ms": t, "changes": {"cpu.percent": 12.5, "cpu.percent_per_core.3": 4.0}}
+增量帧中的键为点分路径，数字段表示列表下标；结构变化（如核心数变化）时发送关键帧。
+时间戳使用整数毫秒，msgpack 以 float32 打包其余浮点数时不会损失时间精度。
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from fast_json import dumps_text
+
+try:
+    import msgpack
+except ImportError:  # 可选依赖，缺失时仅提供 JSON 编码
+    msgpack = None
+
+
+PROTOCOL_VERSIONS = (1, 2)
+MONITOR_GROUPS = ("cpu", "memory", "network", "disk_io")
+ENCODINGS = ("msgpack", "json") if msgpack is not None else ("json",)
+
+# 每隔多少帧强制发送一次关键帧，限制客户端状态漂移
+KEYFRAME_INTERVAL = 30
+MAX_INTERVAL = 60.0
+
+
+def flatten(value: Any, prefix: str = "", out: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """将嵌套的 dict/list 展开为 {点分路径: 标量}"""
+    if out is None:
+        out = {}
+    if isinstance(value, dict):
+        for key, item in value.items():
+            flatten(item, f"{prefix}.{key}" if prefix else str(key), out)
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            flatten(item, f"{prefix}.{index}" if prefix else str(index), out)
+    else:
+        out[prefix] = value
+    return out
+
+
+def _walk(container: Any, parts: List[str]) -> Optional[Tuple[Any, Any]]:
+    """沿点分路径找到 (父容器, 最后一段的键/下标)，找不到时返回 None
+
+    dict 键本身可能含点（如 VLAN 网卡 eth0.100），因此依次尝试把多个段拼成一个键。
+    """
+    if isinstance(container, list):
+        try:
+            index = int(parts[0])
+        except ValueError:
+            return None
+        if not 0 <= index < len(container):
+            return None
+        return (container, index) if len(parts) == 1 else _walk(container[index], parts[1:])
+    if not isinstance(container, dict):
+        return None
+    for width in range(1, len(parts) + 1):
+        key = ".".join(parts[:width])
+        if key not in container:
+            continue
+        if width == len(parts):
+            return container, key
+        found = _walk(container[key], parts[width:])
+        if found is not None:
+            return found
+    return None
+
+
+def apply_delta(data: Dict[str, Any], changes: Dict[str, Any]) -> bool:
+    """把增量帧的 changes 应用到关键帧数据上；路径无法解析时返回 False（应请求 resync）"""
+    for path, value in changes.items():
+        found = _walk(data, path.split("."))
+        if found is None:
+            return False
+        parent, key = found
+        parent[key] = value
+    return True
+
+
+def encode(message: Dict[str, Any], encoding: str) -> Tuple[Any, bool]:
+    """编码一帧，返回 (负载, 是否为二进制)"""
+    if encoding == "msgpack" and msgpack is not None:
+        # 浮点数按 float32 打包，逐核数组等数值字段体积减半
+        return msgpack.packb(message, use_single_float=True), True
+    return dumps_text(message), False
+
+
+class Subscription:
+    """单个客户端的协商结果与增量状态"""
+
+    def __init__(
+        self,
+        version: int = 1,
+        groups: Optional[Iterable[str]] = None,
+        interval: float = 0.0,
+        encoding: str = "json",
+    ):
+        self.version = version
+        self.groups: List[str] = list(groups) if groups else list(MONITOR_GROUPS)
+        self.interval = interval
+        self.encoding = encoding
+        self.reset()
+
+    @classmethod
+    def negotiate(cls, request: Dict[str, Any], min_interval: float) -> "Subscription":
+        """根据客户端请求协商订阅参数，不支持的取值回退到服务端能力范围内"""
+        try:
+            version = int(request.get("version", 1))
+        except (TypeError, ValueError):
+            version = 1
+        if version not in PROTOCOL_VERSIONS:
+            version = max(PROTOCOL_VERSIONS)
+
+        groups = request.get("groups") or MONITOR_GROUPS
+        if isinstance(groups, str):
+            groups = groups.split(",")
+        groups = [g for g in MONITOR_GROUPS if g in set(groups)] or list(MONITOR_GROUPS)
+
+        try:
+            interval = float(request.get("interval", min_interval))
+        except (TypeError, ValueError):
+            interval = min_interval
+        interval = min(max(interval, min_interval), MAX_INTERVAL)
+
+        encoding = request.get("encoding", "json")
+        if version == 1 or encoding not in ENCODINGS:
+            encoding = "json"
+
+        return cls(version, groups, interval, encoding)
+
+    def reset(self) -> None:
+        """清空增量状态，下一帧发送关键帧"""
+        self.seq = 0
+        self.last_sent = 0.0
+        self.frames_since_keyframe = 0
+        self.state: Optional[Dict[str, Any]] = None
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "type": "subscribed",
+            "version": self.version,
+            "groups": self.groups,
+            "interval": self.interval,
+            "encoding": self.encoding,
+            "encodings": list(ENCODINGS),
+        }
+
+    def due(self, now: float) -> bool:
+        """是否到达该客户端的推送时间（留出 5% 余量吸收采样抖动）"""
+        return now - self.last_sent >= self.interval * 0.95
+
+    def build_frame(self, snapshot: Dict[str, Any], flat: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """为 v2 客户端生成关键帧或增量帧；无变化时返回 None"""
+        prefixes = tuple(f"{group}." for group in self.groups)
+        current = {path: value for path, value in flat.items() if path.startswith(prefixes)}
+
+        self.seq += 1
+        if (
+            self.state is None
+            or self.frames_since_keyframe >= KEYFRAME_INTERVAL
+            or current.keys() != self.state.keys()
+        ):
+            self.state = current
+            self.frames_since_keyframe = 0
+            return {
+                "type": "keyframe",
+                "seq": self.seq,
+                "timestamp_ms": int(snapshot["timestamp"] * 1000),
+                "data": {group: snapshot.get(group) for group in self.groups},
+            }
+
+        changes = {path: value for path, value in current.items() if self.state[path] != value}
+        self.state = current
+        self.frames_since_keyframe += 1
+        if not changes:
+            self.seq -= 1
+            return None
+        return {
+            "type": "delta",
+            "seq": self.seq,
+            "base": self.seq - 1,
+            "timestamp_ms": int(snapshot["timestamp"] * 1000),
+            "changes": changes,
+        }
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+采样快照的紧凑表示
+每个分组是 __slots__ 记录，逐设备计数器存放在 array 中；
+嵌套 dict 只在需要 JSON 时生成一次（to_dict 结果缓存），
+展开为点分路径时复用缓存的路径字符串，避免每次采样重复分配
+"""
+
+from __future__ import annotations
+
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# 展开路径缓存：设备集合与核心数在运行期间很少变化，路径字符串只生成一次
+_core_paths: Dict[int, Tuple[str, ...]] = {}
+_counter_paths: Dict[Tuple[Any, ...], Tuple[Tuple[str, ...], Tuple[str, ...]]] = {}
+_group_field_paths: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+
+def _core_path_list(count: int) -> Tuple[str, ...]:
+    paths = _core_paths.get(count)
+    if paths is None:
+        paths = _core_paths[count] = tuple(f"cpu.percent_per_core.{i}" for i in range(count))
+    return paths
+
+
+def _group_paths(group: str, fields: Sequence[str]) -> Tuple[str, ...]:
+    key = (group, *fields)
+    paths = _group_field_paths.get(key)
+    if paths is None:
+        paths = _group_field_paths[key] = tuple(f"{group}.{field}" for field in fields)
+    return paths
+
+
+def _device_paths(
+    prefix: str, devices: Tuple[str, ...], fields: Tuple[str, ...], rate_fields: Tuple[str, ...]
+) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """按 array 的平铺顺序返回 (计数器路径, 速率路径)"""
+    key = (prefix, devices, fields, rate_fields)
+    paths = _counter_paths.get(key)
+    if paths is None:
+        if len(_counter_paths) > 64:  # 设备频繁变化（如容器网卡）时避免无限增长
+            _counter_paths.clear()
+        paths = _counter_paths[key] = (
+            tuple(f"{prefix}.{device}.{field}" for device in devices for field in fields),
+            tuple(f"{prefix}.{device}.{field}" for device in devices for field in rate_fields),
+        )
+    return paths
+
+
+class ErrorSample:
+    """采集失败的分组"""
+
+    __slots__ = ("message",)
+
+    def __init__(self, message: str):
+        self.message = message
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"error": self.message}
+
+    def flat_into(self, group: str, out: Dict[str, Any]) -> None:
+        out[f"{group}.error"] = self.message
+
+
+class CpuSample:
+    __slots__ = ("percent", "per_core", "freq_current", "freq_min", "freq_max")
+
+    def __init__(self, percent: float, per_core: List[float], freq: Any = None):
+        self.percent = percent
+        self.per_core = per_core
+        if freq:
+            self.freq_current, self.freq_min, self.freq_max = freq.current, freq.min, freq.max
+        else:
+            self.freq_current = self.freq_min = self.freq_max = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "percent": self.percent,
+            "percent_per_core": self.per_core,
+            "frequency": {
+                "current": self.freq_current,
+                "min": self.freq_min,
+                "max": self.freq_max,
+            } if self.freq_current is not None else None,
+        }
+
+    def flat_into(self, group: str, out: Dict[str, Any]) -> None:
+        out["cpu.percent"] = self.percent
+        out.update(zip(_core_path_list(len(self.per_core)), self.per_core))
+        if self.freq_current is None:
+            out["cpu.frequency"] = None
+        else:
+            out["cpu.frequency.current"] = self.freq_current
+            out["cpu.frequency.min"] = self.freq_min
+            out["cpu.frequency.max"] = self.freq_max
+
+
+class MemorySample:
+    __slots__ = ("total", "available", "used", "percent", "swap_total", "swap_used", "swap_percent")
+
+    FIELDS = __slots__
+    PATHS = tuple(f"memory.{field}" for field in FIELDS)
+
+    def __init__(self, mem: Any, swap: Any):
+        self.total = mem.total
+        self.available = mem.available
+        self.used = mem.used
+        self.percent = mem.percent
+        self.swap_total = swap.total
+        self.swap_used = swap.used
+        self.swap_percent = swap.percent
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def flat_into(self, group: str, out: Dict[str, Any]) -> None:
+        out.update(zip(self.PATHS, (getattr(self, field) for field in self.FIELDS)))
+
+
+class CounterSample:
+    """逐设备累计计数器与速率，按设备顺序平铺在两个 array 中"""
+
+    __slots__ = ("devices", "fields", "rate_fields", "counters", "rates")
+
+    def __init__(
+        self,
+        devices: Tuple[str, ...],
+        fields: Tuple[str, ...],
+        rate_fields: Tuple[str, ...],
+        counters: array,
+        rates: array,
+    ):
+        self.devices = devices
+        self.fields = fields
+        self.rate_fields = rate_fields
+        self.counters = counters  # len(devices) * len(fields)，类型码 'Q'
+        self.rates = rates  # len(devices) * len(rate_fields)，类型码 'd'
+
+    def device_dict(self, index: int) -> Dict[str, Any]:
+        nf, nr = len(self.fields), len(self.rate_fields)
+        info: Dict[str, Any] = dict(zip(self.fields, self.counters[index * nf:(index + 1) * nf]))
+        info.update(zip(self.rate_fields, self.rates[index * nr:(index + 1) * nr]))
+        return info
+
+    def totals(self) -> Dict[str, Any]:
+        """所有设备求和后的计数器与速率"""
+        nf, nr = len(self.fields), len(self.rate_fields)
+        totals: Dict[str, Any] = {
+            field: sum(self.counters[i::nf]) for i, field in enumerate(self.fields)
+        }
+        for i, field in enumerate(self.rate_fields):
+            totals[field] = round(sum(self.rates[i::nr]), 1)
+        return totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {device: self.device_dict(i) for i, device in enumerate(self.devices)}
+
+    def flat_into(self, group: str, out: Dict[str, Any]) -> None:
+        counter_paths, rate_paths = _device_paths(group, self.devices, self.fields, self.rate_fields)
+        out.update(zip(counter_paths, self.counters))
+        out.update(zip(rate_paths, self.rates))
+
+
+class NetworkSample(CounterSample):
+    """网络分组：顶层为所有网卡的合计，逐网卡数据位于 interfaces 下"""
+
+    __slots__ = ("_totals",)
+
+    def __init__(self, *args: Any):
+        super().__init__(*args)
+        self._totals: Optional[Dict[str, Any]] = None
+
+    def totals(self) -> Dict[str, Any]:
+        if self._totals is None:
+            self._totals = super().totals()
+        return self._totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**self.totals(), "interfaces": super().to_dict()}
+
+    def flat_into(self, group: str, out: Dict[str, Any]) -> None:
+        totals = self.totals()
+        out.update(zip(_group_paths(group, tuple(totals)), totals.values()))
+        super().flat_into(f"{group}.interfaces", out)
+
+
+class MonitorSnapshot:
+    """一次采样的全部分组；dict 形式与展开结果按需生成并缓存，供所有订阅者共享"""
+
+    __slots__ = ("timestamp", "cpu", "memory", "network", "disk_io", "_dict", "_flat")
+
+    GROUPS = ("cpu", "memory", "network", "disk_io")
+
+    def __init__(self, timestamp: float, cpu: Any, memory: Any, network: Any, disk_io: Any):
+        self.timestamp = timestamp
+        self.cpu = cpu
+        self.memory = memory
+        self.network = network
+        self.disk_io = disk_io
+        self._dict: Optional[Dict[str, Any]] = None
+        self._flat: Optional[Dict[str, Any]] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        if self._dict is None:
+            data = {group: getattr(self, group).to_dict() for group in self.GROUPS}
+            data["timestamp"] = self.timestamp
+            self._dict = data
+        return self._dict
+
+    def flat(self) -> Dict[str, Any]:
+        if self._flat is None:
+            out: Dict[str, Any] = {}
+            for group in self.GROUPS:
+                getattr(self, group).flat_into(group, out)
+            self._flat = out
+        return self._flat
+
+    def value(self, group: str, field: str) -> Optional[float]:
+        """读取分组中的标量字段，用于写入历史"""
+        sample = getattr(self, group, None)
+        if isinstance(sample, NetworkSample):
+            value = sample.totals().get(field)
+        else:
+            value = getattr(sample, field, None)
+        return value if isinstance(value, (int, float)) else None
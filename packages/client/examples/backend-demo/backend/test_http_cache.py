@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+静态文件缓存头的测试
+
+用法: python3 -m unittest test_http_cache（或 python3 -m pytest test_http_cache.py）
+"""
+
+from __future__ import annotations
+
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from starlette.applications import Starlette
+from starlette.testclient import TestClient
+
+from http_cache import IMMUTABLE_CACHE, REVALIDATE_CACHE, LazyStaticFiles
+
+
+class StaticCacheControlTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.dist = Path(tempfile.mkdtemp(prefix="booltox-dist-"))
+        (self.dist / "assets").mkdir()
+        for name in ("assets/index-BfD3k2xQ.js", "assets/index.interface.js", "index-BfD3k2xQ.js", "index.html"):
+            (self.dist / name).write_text("x")
+        # 与 http_server 相同的挂载方式：dist/assets 挂载在 /assets，根目录页面由整个 dist 提供
+        app = Starlette()
+        app.mount("/assets", LazyStaticFiles(self.dist / "assets", prefix="assets/"), name="assets")
+        app.mount("/", LazyStaticFiles(self.dist), name="dist")
+        self.client = TestClient(app)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.dist)
+
+    def cache_control(self, path: str) -> str:
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, path)
+        return response.headers["cache-control"]
+
+    def test_hashed_asset_is_immutable(self) -> None:
+        self.assertEqual(self.cache_control("/assets/index-BfD3k2xQ.js"), IMMUTABLE_CACHE)
+
+    def test_unhashed_asset_revalidates(self) -> None:
+        self.assertEqual(self.cache_control("/assets/index.interface.js"), REVALIDATE_CACHE)
+
+    def test_hash_like_name_outside_assets_revalidates(self) -> None:
+        self.assertEqual(self.cache_control("/index-BfD3k2xQ.js"), REVALIDATE_CACHE)
+        self.assertEqual(self.cache_control("/index.html"), REVALIDATE_CACHE)
+
+
+if __name__ == "__main__":
+    unittest.main()
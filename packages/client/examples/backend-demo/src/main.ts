@@ -16,6 +16,7 @@ import type {
   DiskInfo,
   ProcessInfo,
   MonitorData,
+  Snapshot,
 } from './types';
 import { formatBytes, getPercentColor, createCircularProgress } from './utils';
 
@@ -187,6 +188,19 @@ function renderDiskInfo(disks: DiskInfo[]): void {
 
   let html = '<div class="disk-list">';
   disks.forEach((disk) => {
+    if (disk.status === 'unavailable') {
+      html += `
+      <div class="disk-item">
+        <div class="disk-header">
+          <div class="disk-name">${disk.mountpoint}</div>
+          <div class="disk-percent">不可用</div>
+        </div>
+        <div class="disk-info">${disk.device} (${disk.fstype})</div>
+      </div>
+    `;
+      return;
+    }
+
     const color = getPercentColor(disk.percent);
     html += `
       <div class="disk-item">
@@ -210,6 +224,13 @@ function renderDiskInfo(disks: DiskInfo[]): void {
   elements.diskInfo.innerHTML = html;
 }
 
+/**
+ * 格式化进程的 CPU / 内存占比，无权读取（null）时显示占位符
+ */
+function formatPercent(value: number | null): string {
+  return value === null ? '—' : `${value.toFixed(1)}%`;
+}
+
 /**
  * 渲染进程列表
  */
@@ -237,8 +258,8 @@ function renderProcessList(processes: ProcessInfo[]): void {
       <tr>
         <td>${proc.pid}</td>
         <td>${proc.name}</td>
-        <td>${proc.cpu_percent.toFixed(1)}%</td>
-        <td>${proc.memory_percent.toFixed(1)}%</td>
+        <td>${formatPercent(proc.cpu_percent)}</td>
+        <td>${formatPercent(proc.memory_percent)}</td>
       </tr>
     `;
   });
@@ -326,19 +347,16 @@ function stopMonitoring(): void {
  */
 async function refreshData(): Promise<void> {
   try {
-    const [systemInfo, cpuInfo, memoryInfo, diskInfo, processes] = await Promise.all([
-      callAPI<SystemInfo>('/api/system'),
-      callAPI<CPUInfo>('/api/cpu'),
-      callAPI<MemoryInfo>('/api/memory'),
-      callAPI<DiskInfo[]>('/api/disk'),
-      callAPI<ProcessInfo[]>('/api/processes?sort_by=cpu&limit=10'),
-    ]);
-
-    renderSystemInfo(systemInfo);
-    renderCPUInfo(cpuInfo);
-    renderMemoryInfo(memoryInfo);
-    renderDiskInfo(diskInfo);
-    renderProcessList(processes);
+    // 一次请求获取所有分组，后端并发采集
+    const snapshot = await callAPI<Snapshot>(
+      '/api/snapshot?fields=system,cpu,memory,disk,processes.top10&sort_by=cpu',
+    );
+
+    if (snapshot.system) renderSystemInfo(snapshot.system);
+    if (snapshot.cpu) renderCPUInfo(snapshot.cpu);
+    if (snapshot.memory) renderMemoryInfo(snapshot.memory);
+    if (snapshot.disk) renderDiskInfo(snapshot.disk);
+    if (snapshot.processes) renderProcessList(snapshot.processes);
   } catch (error) {
     console.error('刷新数据失败:', error);
     alert(`刷新数据失败: ${error}`);
@@ -40,33 +40,79 @@ export interface MemoryInfo {
   swap_percent: number;
 }
 
-export interface DiskInfo {
-  device: string;
-  mountpoint: string;
-  fstype: string;
-  total: number;
-  used: number;
-  free: number;
-  percent: number;
-}
+export type DiskInfo =
+  | {
+      device: string;
+      mountpoint: string;
+      fstype: string;
+      status: 'ok';
+      total: number;
+      used: number;
+      free: number;
+      percent: number;
+    }
+  | {
+      device: string;
+      mountpoint: string;
+      fstype: string;
+      status: 'unavailable';
+      total: null;
+      used: null;
+      free: null;
+      percent: null;
+    };
 
-export interface NetworkInfo {
+export interface NetworkCounters {
   bytes_sent: number;
   bytes_recv: number;
   packets_sent: number;
   packets_recv: number;
+  bytes_sent_per_sec: number;
+  bytes_recv_per_sec: number;
+  packets_sent_per_sec: number;
+  packets_recv_per_sec: number;
+}
+
+export interface NetworkInfo extends NetworkCounters {
+  interfaces: Record<string, NetworkCounters>;
 }
 
+export interface DiskIOCounters {
+  read_bytes: number;
+  write_bytes: number;
+  read_count: number;
+  write_count: number;
+  read_bytes_per_sec: number;
+  write_bytes_per_sec: number;
+  read_iops: number;
+  write_iops: number;
+}
+
+export type DiskIOInfo = Record<string, DiskIOCounters>;
+
 export interface ProcessInfo {
   pid: number;
   name: string;
-  cpu_percent: number;
-  memory_percent: number;
+  /** 无权读取该进程时为 null */
+  cpu_percent: number | null;
+  memory_percent: number | null;
 }
 
 export interface MonitorData {
   cpu: CPUInfo;
   memory: MemoryInfo;
   network: NetworkInfo;
+  disk_io: DiskIOInfo;
+  timestamp: number;
+}
+
+export interface Snapshot {
   timestamp: number;
+  system?: SystemInfo;
+  cpu?: CPUInfo;
+  memory?: MemoryInfo;
+  disk?: DiskInfo[];
+  disk_io?: DiskIOInfo;
+  network?: NetworkInfo;
+  processes?: ProcessInfo[];
 }
@@ -1,9 +1,36 @@
-import { defineConfig } from 'vite'
+import { defineConfig, type Plugin } from 'vite'
+import fs from 'node:fs'
 import path from 'node:path'
+import { brotliCompressSync, constants, gzipSync } from 'node:zlib'
+
+/**
+ * 构建后为文本资源生成 .gz / .br 预压缩文件，由后端按 Accept-Encoding 直接返回
+ */
+function precompress(): Plugin {
+  return {
+    name: 'booltox-precompress',
+    apply: 'build',
+    writeBundle(options, bundle) {
+      const outDir = options.dir ?? path.dirname(options.file ?? '')
+      for (const fileName of Object.keys(bundle)) {
+        if (!/\.(js|css|html|svg|json)$/.test(fileName)) continue
+        const file = path.join(outDir, fileName)
+        const source = fs.readFileSync(file)
+        if (source.length < 1024) continue
+        fs.writeFileSync(`${file}.gz`, gzipSync(source, { level: 9 }))
+        fs.writeFileSync(
+          `${file}.br`,
+          brotliCompressSync(source, { params: { [constants.BROTLI_PARAM_QUALITY]: 11 } }),
+        )
+      }
+    },
+  }
+}
 
 export default defineConfig({
   root: 'src',
   base: './',
+  plugins: [precompress()],
   build: {
     outDir: '../dist',
     emptyOutDir: true,
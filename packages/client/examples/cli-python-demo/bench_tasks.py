@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+任务存储基准
+在临时目录中生成大量任务，测量：
+- 旧实现（每次修改读取并以 indent=2 重写整个 JSON 文件）与追加日志的单次添加耗时
+- 按 ID 完成/删除、检查文件是否被其他进程修改（refresh）的耗时
+- 加载快照并重放日志、压缩的耗时
+- SQLite 存储的导入、添加、完成、删除、统计与清除耗时
+- 批量模式（一个事务、结束时一次写入）下的添加耗时
+- 两种存储的分页列表、筛选排序与关键词搜索耗时，以及新进程加载 JSON 存储后首次搜索的耗时
+
+用法: python3 bench_tasks.py [--tasks 100000] [--ops 2000]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import unicodedata
+from datetime import datetime
+
+from task_store import SqliteTaskStore, TaskStore
+
+
+TOPICS = ('整理周报', '部署测试环境', '采购办公用品', '准备季度预算', '修复登录问题', '编写接口文档', '安排团队会议')
+WORDS = ('alpha', 'beta', 'gamma', 'delta', 'release', 'review', 'report', 'backup', 'deploy', 'budget', 'meeting')
+
+
+def make_tasks(count):
+    return [
+        {
+            'id': i,
+            'task': f'{TOPICS[i % len(TOPICS)]} {WORDS[i % len(WORDS)]} {WORDS[i * 7 % len(WORDS)]} #{i}',
+            'done': i % 3 == 0,
+            'created_at': f'2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}T{i % 24:02d}:00:00',
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def legacy_add(path, text):
+    """重构前 cmd_add 的做法"""
+    with open(path, 'r', encoding='utf-8') as f:
+        tasks = json.load(f)
+    tasks.append({'id': len(tasks) + 1, 'task': text, 'done': False, 'created_at': datetime.now().isoformat()})
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(tasks, f, ensure_ascii=False, indent=2)
+
+
+def measure(call, count):
+    began = time.perf_counter()
+    for i in range(count):
+        call(i)
+    return (time.perf_counter() - began) / count
+
+
+def pad(label, width=34):
+    """按显示宽度补齐标签（中文占两列）"""
+    shown = sum(2 if unicodedata.east_asian_width(c) in 'WF' else 1 for c in label)
+    return label + ' ' * max(1, width - shown)
+
+
+def bench_queries(store, label):
+    """分页列表、筛选排序与搜索，每项取 20 次平均（首次搜索单独计时）"""
+    cases = [
+        ('首页', lambda: store.query(limit=20)),
+        ('第 1000 页', lambda: store.query(offset=20000, limit=20)),
+        ('待完成按创建时间倒序', lambda: store.query(done=False, order='created', descending=True, limit=20)),
+        ('一个月内', lambda: store.query(since='2025-03-01', until='2025-04-01', limit=20)),
+    ]
+    searches = [('常见词「周报」', '周报'), ('短语「季度预算」', '季度预算'), ('「接口 review」', '接口 review'), ('无结果', '不存在的任务')]
+
+    began = time.perf_counter()
+    total, _ = store.search('周报', limit=20)
+    print(f"{pad(f'{label} 首次搜索:')}{(time.perf_counter() - began) * 1000:10.1f} ms")
+    for name, call in cases:
+        print(f"{pad(f'{label} 列表 {name}:')}{measure(lambda i: call(), 20) * 1000:10.2f} ms")
+    for name, text in searches:
+        total, _ = store.search(text, limit=20)
+        elapsed = measure(lambda i: store.search(text, limit=20), 20)
+        print(f"{pad(f'{label} 搜索 {name}:')}{elapsed * 1000:10.2f} ms（{total} 项）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='任务存储基准')
+    parser.add_argument('--tasks', type=int, default=100000, help='初始任务数')
+    parser.add_argument('--ops', type=int, default=2000, help='测量的添加次数')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='booltox-todo-')
+    try:
+        path = os.path.join(directory, 'todo.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(make_tasks(args.tasks), f, ensure_ascii=False, indent=2)
+
+        legacy = measure(lambda i: legacy_add(path, f'新任务 {i}'), 3)
+        print(f"旧实现添加:          {legacy * 1000:10.1f} ms/次")
+
+        began = time.perf_counter()
+        store = TaskStore(path)
+        print(f"迁移旧格式:          {(time.perf_counter() - began) * 1000:10.1f} ms")
+
+        added = measure(lambda i: store.add(f'新任务 {i}'), args.ops)
+        print(f"日志追加添加:        {added * 1e6:10.1f} µs/次（{args.tasks} 个任务）")
+        done = measure(lambda i: store.mark_done(args.tasks - i), args.ops)
+        print(f"按 ID 完成:          {done * 1e6:10.1f} µs/次")
+        deleted = measure(lambda i: store.delete(args.tasks - i), args.ops)
+        print(f"按 ID 删除:          {deleted * 1e6:10.1f} µs/次")
+        refreshed = measure(lambda i: store.refresh(), args.ops)
+        print(f"refresh（无变化）:   {refreshed * 1e6:10.1f} µs/次")
+        with store.batch():
+            batched = measure(lambda i: store.add(f'批量任务 {i}'), args.ops)
+        print(f"批量添加:            {batched * 1e6:10.1f} µs/次")
+        store.close()
+
+        began = time.perf_counter()
+        store = TaskStore(path)
+        print(f"加载（重放 {store.journal_ops} 条）: {(time.perf_counter() - began) * 1000:10.1f} ms")
+
+        began = time.perf_counter()
+        store.compact()
+        print(f"压缩（含写入索引）:  {(time.perf_counter() - began) * 1000:10.1f} ms")
+        store.close()
+
+        # 批量模式的每条命令都是新进程：加载后直接使用索引文件，不在内存中重建索引
+        began = time.perf_counter()
+        store = TaskStore(path)
+        loaded = time.perf_counter() - began
+        store.search('周报', limit=20)
+        searched = time.perf_counter() - began - loaded
+        print(f"新进程加载 + 首次搜索: {loaded * 1000:8.1f} + {searched * 1000:.1f} ms")
+        bench_queries(store, 'JSON')
+        deleted = measure(lambda i: store.delete(i + 1), args.ops)
+        print(f"删除（维护索引）:    {deleted * 1e6:10.1f} µs/次")
+        store.close()
+
+        print()
+        began = time.perf_counter()
+        db = SqliteTaskStore(os.path.join(directory, 'todo.db'), path)
+        print(f"SQLite 导入 {db.migrated} 个:   {(time.perf_counter() - began) * 1000:10.1f} ms")
+        added = measure(lambda i: db.add(f'新任务 {i}'), args.ops)
+        print(f"SQLite 添加:         {added * 1e6:10.1f} µs/次")
+        with db.batch():
+            batched = measure(lambda i: db.add(f'批量任务 {i}'), args.ops)
+        print(f"SQLite 批量添加:     {batched * 1e6:10.1f} µs/次")
+        done = measure(lambda i: db.mark_done(i + 1), args.ops)
+        print(f"SQLite 按 ID 完成:   {done * 1e6:10.1f} µs/次")
+        deleted = measure(lambda i: db.delete(i + 2), args.ops)
+        print(f"SQLite 按 ID 删除:   {deleted * 1e6:10.1f} µs/次")
+        counted = measure(lambda i: db.stats(), 100)
+        print(f"SQLite 统计:         {counted * 1000:10.2f} ms/次")
+        bench_queries(db, 'SQLite')
+        began = time.perf_counter()
+        cleared = db.clear_done()
+        print(f"SQLite 清除 {cleared} 个:  {(time.perf_counter() - began) * 1000:10.1f} ms")
+        db.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,29 +5,58 @@ Licensed under CC-BY-NC-4.0
 
 任务管理器 - 交互式 TUI 示例
 演示如何将交互式 CLI 工具集成到 BoolTox（零改造）
+
+不带参数在终端中运行时进入交互模式；带命令参数、-f 脚本文件或从管道输入时以批量模式运行：
+    python cli.py add 写周报 \\; done 3
+    python cli.py -f commands.txt
+    cat tasks.ndjson | python cli.py import /dev/stdin
 """
 
 from prompt_toolkit import prompt
 from prompt_toolkit.completion import WordCompleter
 from prompt_toolkit.formatted_text import HTML
+import argparse
+import csv
 import json
 import os
-from datetime import datetime
+import sys
+from contextlib import nullcontext, redirect_stdout
+from datetime import datetime, timedelta
+
+from task_store import ORDERS, open_store
 
-# 数据存储文件
+# 数据存储文件（快照；操作日志为同名 .journal 文件）
 DATA_FILE = os.path.expanduser('~/.booltox-todo.json')
 
-def load_tasks():
-    """加载任务列表"""
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return []
+# 存储后端：json（默认）或 sqlite；sqlite 首次使用时自动导入 JSON 中的任务
+STORE = os.environ.get('BOOLTOX_TODO_STORE', 'json')
+DB_FILE = os.path.expanduser(os.environ.get('BOOLTOX_TODO_DB', '~/.booltox-todo.db'))
+
+# 批量模式的退出码（参数错误由 argparse 以 2 退出）
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_INTERRUPTED = 130
+
+# list / search 每页显示的任务数
+PAGE_SIZE = 20
 
-def save_tasks(tasks):
-    """保存任务列表"""
-    with open(DATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(tasks, f, ensure_ascii=False, indent=2)
+_store = None
+_listing = None  # 上一次 list / search 未显示完时的 (标题, 查询函数, 下一页偏移, 每页数量, 无结果提示)
+_interactive = False  # 交互模式中提示 more；批量模式每次调用都是新进程，提示 --offset
+
+class CommandError(Exception):
+    """命令执行失败；交互模式下打印后继续，批量模式下回滚全部修改"""
+
+def get_store():
+    """获取任务存储：首次调用时加载，之后只在文件被其他进程修改时同步"""
+    global _store
+    if _store is None:
+        _store = open_store(STORE, DATA_FILE, DB_FILE)
+        if getattr(_store, 'migrated', 0):
+            print(f"📦 已从 {DATA_FILE} 导入 {_store.migrated} 个任务")
+    else:
+        _store.refresh()
+    return _store
 
 def print_header():
     """打印欢迎界面"""
@@ -40,99 +69,174 @@ def print_help():
     """打印帮助信息"""
     print("📋 可用命令:")
     print("  add <任务内容>       - 添加新任务")
-    print("  list                 - 列出所有任务")
+    print("  list [选项]          - 分页列出任务，选项见下")
+    print("  more                 - 显示上一次 list / search 的下一页")
+    print("  search <关键词>      - 搜索任务内容（支持中文）")
     print("  done <任务ID>        - 标记任务为已完成")
     print("  delete <任务ID>      - 删除任务")
     print("  clear                - 清除已完成的任务")
     print("  stats                - 显示统计信息")
+    print("  import <文件>        - 从 NDJSON / CSV 文件导入任务")
     print("  help                 - 显示此帮助")
     print("  exit / quit          - 退出程序")
     print()
+    print("🔎 list 选项:")
+    print("  --done / --pending               - 只看已完成 / 待完成")
+    print("  --since <日期> / --until <日期>  - 按创建日期筛选（含首尾，如 2025-01-31）")
+    print("  --sort id|created|-id|-created   - 排序，- 表示倒序")
+    print(f"  --limit <数量> / --offset <数量> - 分页（默认每页 {PAGE_SIZE} 项）；--all 显示全部")
+    print()
+
+def _task_id(args):
+    if not args:
+        raise CommandError("请输入任务 ID")
+    try:
+        return int(args[0])
+    except ValueError:
+        raise CommandError("任务 ID 必须是数字")
 
 def cmd_add(args):
     """添加任务"""
     if not args:
-        print("❌ 请输入任务内容")
-        return
+        raise CommandError("请输入任务内容")
 
     task_text = ' '.join(args)
-    tasks = load_tasks()
-    new_task = {
-        'id': len(tasks) + 1,
-        'task': task_text,
-        'done': False,
-        'created_at': datetime.now().isoformat()
-    }
-    tasks.append(new_task)
-    save_tasks(tasks)
+    new_task = get_store().add(task_text)
     print(f"✅ 任务已添加: {task_text} (ID: {new_task['id']})")
 
-def cmd_list(args):
-    """列出任务"""
-    tasks = load_tasks()
+def _print_task(task):
+    status = '✓' if task['done'] else '○'
+    print(f"  [{status}] {task['id']}. {task['task']}")
+    if task['done']:
+        print(f"      （已完成于: {task.get('completed_at', '未知')[:10]}）")
+
+def _show_page(title, fetch, offset, limit, empty):
+    """显示一页结果；还有后续时记录位置，供 more 继续"""
+    global _listing
+    total, tasks = fetch(offset, limit)
+    _listing = None
     if not tasks:
-        print("📭 暂无任务")
+        print(empty if offset == 0 else "📭 没有更多任务了")
         return
 
-    print(f"\n📋 任务列表（共 {len(tasks)} 项）:\n")
+    end = offset + len(tasks)
+    if offset == 0 and end == total:
+        print(f"\n{title}（共 {total} 项）:\n")
+    else:
+        print(f"\n{title}（第 {offset + 1}-{end} 项，共 {total} 项）:\n")
     for task in tasks:
-        status = '✓' if task['done'] else '○'
-        print(f"  [{status}] {task['id']}. {task['task']}")
-        if task['done']:
-            print(f"      （已完成于: {task.get('completed_at', '未知')[:10]}）")
+        _print_task(task)
     print()
+    if end < total:
+        _listing = (title, fetch, end, limit, empty)
+        if _interactive:
+            print(f"💡 输入 'more' 查看后续 {min(limit, total - end)} 项\n")
+        else:
+            print(f"💡 加上 --offset {end} 查看后续 {min(limit, total - end)} 项\n")
+
+def _parse_date(value, option):
+    """解析日期或日期时间，返回 ISO 字符串；只给日期时 --until 包含当天"""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"{option} 的日期格式应为 YYYY-MM-DD: {value}")
+    if option == '--until' and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed.isoformat()
 
-def cmd_done(args):
-    """标记完成"""
-    if not args:
-        print("❌ 请输入任务 ID")
-        return
-
+def _parse_count(value, option):
     try:
-        task_id = int(args[0])
-        tasks = load_tasks()
-
-        for task in tasks:
-            if task['id'] == task_id:
-                task['done'] = True
-                task['completed_at'] = datetime.now().isoformat()
-                save_tasks(tasks)
-                print(f"✅ 任务 #{task_id} 已完成！")
-                return
-
-        print(f"❌ 未找到任务 #{task_id}")
+        count = int(value)
     except ValueError:
-        print("❌ 任务 ID 必须是数字")
+        count = -1
+    if count < 0:
+        raise CommandError(f"{option} 需要一个非负整数: {value}")
+    return count
+
+def _parse_list_options(args, allow_filters=True):
+    """解析 list / search 的选项，返回 (选项, 其余参数)"""
+    options = {'offset': 0, 'limit': PAGE_SIZE}
+    rest = []
+    args = iter(args)
+    for arg in args:
+        if not arg.startswith('--'):
+            rest.append(arg)
+        elif arg == '--all':
+            options['limit'] = None
+        elif arg in ('--done', '--pending') and allow_filters:
+            options['done'] = arg == '--done'
+        elif arg in ('--since', '--until', '--sort', '--limit', '--offset') and (allow_filters or arg in ('--limit', '--offset')):
+            value = next(args, None)
+            if value is None:
+                raise CommandError(f"{arg} 需要一个参数")
+            if arg in ('--since', '--until'):
+                options[arg[2:]] = _parse_date(value, arg)
+            elif arg == '--sort':
+                order = value.lstrip('-')
+                if order not in ORDERS:
+                    raise CommandError(f"--sort 可选: {', '.join(ORDERS)}（前加 - 表示倒序）")
+                options['order'], options['descending'] = order, value.startswith('-')
+            else:
+                options[arg[2:]] = _parse_count(value, arg)
+        else:
+            raise CommandError(f"未知选项: {arg}")
+    if options['limit'] == 0:
+        raise CommandError("--limit 必须大于 0")
+    return options, rest
 
-def cmd_delete(args):
-    """删除任务"""
-    if not args:
-        print("❌ 请输入任务 ID")
-        return
+def cmd_list(args):
+    """分页列出任务，可按状态、创建日期筛选并排序"""
+    options, rest = _parse_list_options(args)
+    if rest:
+        raise CommandError(f"未知参数: {' '.join(rest)}（搜索请用 search）")
+    offset, limit = options.pop('offset'), options.pop('limit')
+    filtered = any(key in options for key in ('done', 'since', 'until'))
+    _show_page(
+        "📋 任务列表",
+        lambda offset, limit: get_store().query(offset=offset, limit=limit, **options),
+        offset,
+        limit,
+        "📭 没有符合条件的任务" if filtered else "📭 暂无任务",
+    )
 
-    try:
-        task_id = int(args[0])
-        tasks = load_tasks()
+def cmd_more(args):
+    """显示下一页"""
+    if _listing is None:
+        raise CommandError("没有可以继续显示的列表，请先执行 list 或 search")
+    title, fetch, offset, limit, empty = _listing
+    _show_page(title, fetch, offset, limit, empty)
+
+def cmd_search(args):
+    """按关键词搜索任务"""
+    options, words = _parse_list_options(args, allow_filters=False)
+    text = ' '.join(words)
+    if not text.strip():
+        raise CommandError("请输入搜索关键词")
+    _show_page(
+        f"🔍 搜索「{text}」",
+        lambda offset, limit: get_store().search(text, offset=offset, limit=limit),
+        options['offset'],
+        options['limit'],
+        f"🔍 没有找到包含「{text}」的任务",
+    )
 
-        for i, task in enumerate(tasks):
-            if task['id'] == task_id:
-                tasks.pop(i)
-                save_tasks(tasks)
-                print(f"🗑️  任务 #{task_id} 已删除")
-                return
+def cmd_done(args):
+    """标记完成"""
+    task_id = _task_id(args)
+    if get_store().mark_done(task_id) is None:
+        raise CommandError(f"未找到任务 #{task_id}")
+    print(f"✅ 任务 #{task_id} 已完成！")
 
-        print(f"❌ 未找到任务 #{task_id}")
-    except ValueError:
-        print("❌ 任务 ID 必须是数字")
+def cmd_delete(args):
+    """删除任务"""
+    task_id = _task_id(args)
+    if not get_store().delete(task_id):
+        raise CommandError(f"未找到任务 #{task_id}")
+    print(f"🗑️  任务 #{task_id} 已删除")
 
 def cmd_clear(args):
     """清除已完成任务"""
-    tasks = load_tasks()
-    before = len(tasks)
-    tasks = [t for t in tasks if not t['done']]
-    save_tasks(tasks)
-
-    cleared = before - len(tasks)
+    cleared = get_store().clear_done()
     if cleared > 0:
         print(f"✅ 已清除 {cleared} 个已完成任务")
     else:
@@ -140,13 +244,11 @@ def cmd_clear(args):
 
 def cmd_stats(args):
     """显示统计"""
-    tasks = load_tasks()
-    if not tasks:
+    total, done = get_store().stats()
+    if not total:
         print("📭 暂无任务")
         return
 
-    total = len(tasks)
-    done = sum(1 for t in tasks if t['done'])
     pending = total - done
 
     print("\n📊 任务统计:")
@@ -157,6 +259,60 @@ def cmd_stats(args):
         print(f"  完成率: {done / total * 100:.1f}%")
     print()
 
+def _read_records(f, csv_format):
+    """逐行读取 NDJSON（每行一个对象或字符串）或 CSV（首行为表头），生成 (行号, 记录)"""
+    if csv_format:
+        reader = csv.DictReader(f)
+        try:
+            for record in reader:
+                yield reader.line_num, record
+        except csv.Error as e:
+            raise CommandError(f"第 {reader.line_num} 行 CSV 格式错误: {e}")
+        return
+    for number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise CommandError(f"第 {number} 行不是有效的 JSON")
+        yield number, {'task': record} if isinstance(record, str) else record
+
+def _is_done(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'y', 'x', 'done', '✓')
+    return bool(value)
+
+def cmd_import(args):
+    """从 NDJSON / CSV 文件导入任务（流式读取，整个文件在一个事务中导入）"""
+    if not args:
+        raise CommandError("请输入文件路径")
+
+    path = os.path.expanduser(' '.join(args))
+    try:
+        f = open(path, 'r', encoding='utf-8', newline='')
+    except OSError as e:
+        raise CommandError(f"无法读取 {path}: {e.strerror}")
+
+    store = get_store()
+    count = 0
+    try:
+        with f, store.batch():
+            for number, record in _read_records(f, path.lower().endswith('.csv')):
+                text = str(record.get('task') or '').strip() if isinstance(record, dict) else ''
+                if not text:
+                    raise CommandError(f"第 {number} 行缺少任务内容（task）")
+                store.add(
+                    text,
+                    done=_is_done(record.get('done', False)),
+                    created_at=record.get('created_at') or None,
+                    completed_at=record.get('completed_at') or None,
+                )
+                count += 1
+    except CommandError as e:
+        raise CommandError(f"{path} {e}")
+    print(f"✅ 已导入 {count} 个任务")
+
 # 命令映射
 COMMANDS = {
     'add': cmd_add,
@@ -167,12 +323,23 @@ COMMANDS = {
     'del': cmd_delete,
     'clear': cmd_clear,
     'stats': cmd_stats,
+    'import': cmd_import,
+    'more': cmd_more,
+    'search': cmd_search,
+    'find': cmd_search,
     'help': lambda _: print_help(),
 }
 
-def main():
-    """主循环"""
+def repl():
+    """交互模式主循环"""
+    global _interactive
+    _interactive = True
     print_header()
+    try:
+        get_store()
+    except ValueError as e:
+        print(f"❌ 错误: {e}", file=sys.stderr)
+        sys.exit(EXIT_FAILED)
     print("💡 输入 'help' 查看可用命令\n")
 
     # 命令补全
@@ -209,6 +376,8 @@ def main():
                 print(f"❌ 未知命令: {cmd}")
                 print("💡 输入 'help' 查看可用命令")
 
+        except CommandError as e:
+            print(f"❌ {e}")
         except KeyboardInterrupt:
             print("\n\n👋 按 Ctrl+C 退出，或输入 'exit'")
             continue
@@ -218,5 +387,85 @@ def main():
         except Exception as e:
             print(f"❌ 错误: {e}")
 
+    if _store is not None:
+        _store.close()
+
+def _argv_commands(words):
+    """命令行参数中的命令，以单独的 ";" 分隔，生成 (位置描述, 命令行)"""
+    number, current = 1, []
+    for word in words + [';']:
+        if word != ';':
+            current.append(word)
+        elif current:
+            yield f"命令 {number}", ' '.join(current)
+            number, current = number + 1, []
+
+def _script_commands(f):
+    """脚本中的命令，每行一条，逐行读取"""
+    for number, line in enumerate(f, 1):
+        yield f"第 {number} 行", line
+
+def run_batch(commands, quiet=False):
+    """在一个事务中依次执行命令，结束时一次写入；任一命令失败时回滚全部修改，返回退出码"""
+    try:
+        store = get_store()
+    except ValueError as e:
+        print(f"❌ 错误: {e}", file=sys.stderr)
+        return EXIT_FAILED
+
+    where = None
+    devnull = open(os.devnull, 'w', encoding='utf-8') if quiet else None
+    try:
+        with redirect_stdout(devnull) if quiet else nullcontext(), store.batch():
+            for where, line in commands:
+                parts = line.split()
+                if not parts or parts[0].startswith('#'):
+                    continue
+                cmd = parts[0].lower()
+                if cmd in ('exit', 'quit'):
+                    break
+                if cmd not in COMMANDS:
+                    raise CommandError(f"未知命令: {cmd}")
+                COMMANDS[cmd](parts[1:])
+    except CommandError as e:
+        print(f"❌ {where}: {e}", file=sys.stderr)
+        print("↩️  已回滚，本次没有任何修改", file=sys.stderr)
+        return EXIT_FAILED
+    except KeyboardInterrupt:
+        print("\n↩️  已中断并回滚，本次没有任何修改", file=sys.stderr)
+        return EXIT_INTERRUPTED
+    finally:
+        if devnull is not None:
+            devnull.close()
+        store.close()
+    return EXIT_OK
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='BoolTox 任务管理器；不带参数时进入交互模式',
+        epilog='批量模式下所有命令在一个事务中执行，全部成功退出码为 0，任一命令失败时回滚并以 1 退出',
+    )
+    parser.add_argument('-f', '--file', metavar='脚本', help='从脚本文件执行命令，每行一条，"-" 表示标准输入')
+    parser.add_argument('-q', '--quiet', action='store_true', help='批量模式下不输出各命令的结果')
+    parser.add_argument('command', nargs=argparse.REMAINDER, help='要执行的命令，多条命令用单独的 ";" 分隔')
+    return parser.parse_args(argv)
+
+def main():
+    """入口：交互模式或批量模式"""
+    args = parse_args()
+    if args.command:
+        sys.exit(run_batch(_argv_commands(args.command), args.quiet))
+    if args.file and args.file != '-':
+        try:
+            f = open(args.file, 'r', encoding='utf-8')
+        except OSError as e:
+            print(f"❌ 无法读取 {args.file}: {e.strerror}", file=sys.stderr)
+            sys.exit(EXIT_FAILED)
+        with f:
+            sys.exit(run_batch(_script_commands(f), args.quiet))
+    if args.file == '-' or not sys.stdin.isatty():
+        sys.exit(run_batch(_script_commands(sys.stdin), args.quiet))
+    repl()
+
 if __name__ == '__main__':
     main()
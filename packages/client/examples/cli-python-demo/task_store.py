@@ -0,0 +1,936 @@
+#!/usr/bin/env python3
+"""
+Copyright (c) 2025 ByteTrue
+Licensed under CC-BY-NC-4.0
+
+任务存储 - 追加式操作日志 + 快照
+
+- 快照（~/.booltox-todo.json）：{"version": 2, "generation": N, "next_id": M, "tasks": [...]}
+- 日志（~/.booltox-todo.json.journal）：首行 {"generation": N}，之后每行一条操作（add/done/delete/clear）
+
+每次修改只向日志追加一行，不再重写整个文件；日志条数超过阈值时压缩：把内存中的任务写成新快照
+（generation + 1），再换成只有新表头的空日志。启动时加载快照并重放 generation 相同的日志，
+generation 不同说明日志已被压缩进快照（压缩中途退出），重放时忽略；末尾不完整的一行（写入中途退出）不重放。
+旧版本的 JSON 数组文件在首次加载时转换为快照格式。
+
+batch() 内的修改先缓存在内存中，结束时一次写入日志，前后加 begin/commit 标记；重放时没有 commit 的
+批量操作整体丢弃，批量修改要么全部生效要么全部不生效。缓存超过 BATCH_FLUSH_BYTES 时提前写入（仍在标记之内），
+导入大量任务时内存不随输入增长。
+
+多个进程可以同时打开同一份任务。追加、截断日志与压缩都在锁文件（~/.booltox-todo.json.lock）的排他锁内进行，
+取得锁后先同步其他进程已提交的修改再分配 ID；批量修改从开始到结束一直持有锁。读取不加锁，也不修改任何文件：
+日志末尾未提交的内容在重放时跳过，由下一个取得锁的进程截掉——持锁时不会有进行中的批量修改，
+这些内容只可能来自已退出的进程。
+
+同一会话中任务只加载一次：内存中按 ID 建立索引并增量维护完成/待完成计数；每条命令前 refresh()
+比较快照与日志的 inode、大小和修改时间，其他进程只追加了日志时重放新增部分，否则完整重新加载。
+任务 ID 由单调递增的 next_id 分配并随快照保存，删除任务后也不会复用。
+
+query() 按完成状态、创建时间范围筛选并排序分页；search() 使用倒排索引（见 text_index.py）按关键词检索。
+索引随快照一起保存（~/.booltox-todo.json.index）：表头记录对应快照文件的签名与当时的 next_id，之后每行
+“检索词\tID,ID,...”。新进程搜索时直接在文件中查找检索词，不必重建索引；索引之后删除的任务按是否仍存在过滤，
+之后添加的任务（ID 不小于表头的 next_id）逐条分词核对。压缩时重写索引；快照缺少对应的索引（旧版本或写入中途退出）时，
+加载后补建。没有可用的索引文件时在内存中建立，之后随任务增删增量维护。
+
+SqliteTaskStore 把任务保存在 SQLite 数据库（~/.booltox-todo.db）中，适合任务很多的情况，命令与 TaskStore 相同；
+首次打开时一次性导入已有的 JSON 任务，倒排索引保存在 task_tokens 表中。后端由 open_store(kind) 选择：
+json（默认）或 sqlite。
+"""
+
+import heapq
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+
+from text_index import TextIndex, query_terms, tokenize
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+STORES = ('json', 'sqlite')
+
+# query() 支持的排序字段：id（即添加顺序）与 created（创建时间）
+ORDERS = ('id', 'created')
+
+SNAPSHOT_VERSION = 2
+
+# 日志至少积累这么多条操作、且不少于任务数的一半时才压缩，压缩开销均摊到每次操作上为 O(1)
+COMPACT_MIN_OPS = 1000
+COMPACT_RATIO = 0.5
+
+# 批量修改的日志缓存上限，超过后提前写入
+BATCH_FLUSH_BYTES = 1 << 20
+BATCH_BEGIN = b'{"op":"begin"}\n'
+BATCH_COMMIT = b'{"op":"commit"}\n'
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+def _signature(stat):
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def _file_signature(path):
+    """文件的 (inode, 大小, 修改时间)，不存在时为 None"""
+    try:
+        return _signature(os.stat(path))
+    except FileNotFoundError:
+        return None
+
+
+def _committed_ops(data, start):
+    """依次给出 data[start:] 中已提交的 (操作列表, 结束位置)；遇到不完整的行时停止，未提交的批量操作不给出"""
+    position = start
+    batch = None
+    while position < len(data):
+        end = data.find(b'\n', position)
+        if end < 0:
+            return
+        try:
+            op = json.loads(data[position:end])
+        except ValueError:
+            return
+        position = end + 1
+        kind = op['op']
+        if kind == 'begin':
+            batch = []  # 之前未提交的批量操作（若有）一并丢弃
+        elif kind == 'commit':
+            yield batch or [], position
+            batch = None
+        elif batch is not None:
+            batch.append(op)
+        else:
+            yield [op], position
+
+
+def _lock(f, blocking):
+    """对锁文件加排他锁，返回是否取得；blocking 时一直等到取得为止"""
+    if os.name == 'nt':
+        while True:
+            try:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+                time.sleep(0.05)
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def _unlock(f):
+    if os.name == 'nt':
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class TaskStore:
+    """任务列表及其持久化；tasks 为 ID -> 任务字典，按添加顺序排列
+
+    readonly=True 时只读取文件：不转换旧格式、不压缩，用于把任务导入其他存储。
+    """
+
+    def __init__(self, path, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        self.journal_path = path + '.journal'
+        self.index_path = path + '.index'
+        self.tasks = {}
+        self.next_id = 1
+        self.done_count = 0
+        self.generation = 0
+        self.journal_ops = 0  # 日志中尚未压缩进快照的操作数
+        self._journal = None
+        self._journal_offset = 0  # 已重放或写入的日志字节数
+        self._snapshot_signature = None
+        self._journal_signature = None
+        self._batch = None  # 批量修改中尚未写入的日志行
+        self._batch_bytes = 0
+        self._batch_start = None  # 本批 begin 标记在日志中的偏移，尚未写入时为 None
+        self._index = None  # 内存中的倒排索引，没有可用的索引文件时在首次搜索时建立
+        self._index_stale = False  # 快照缺少对应的索引文件，加载后补建
+        self._rewrite = False  # 快照需要重写（旧格式或重复 ID）
+        self._journal_stale = False  # 日志的 generation 与快照不符，下一次写入前重建
+        self._lock_file = None
+        self._lock_depth = 0
+        self.load()
+
+    def stats(self):
+        """返回 (总数, 已完成数)"""
+        return len(self.tasks), self.done_count
+
+    def iter_tasks(self):
+        """按添加顺序遍历任务"""
+        return iter(self.tasks.values())
+
+    def query(self, done=None, since=None, until=None, order='id', descending=False, offset=0, limit=None):
+        """筛选、排序并分页，返回 (符合条件的总数, 本页任务)；since/until 为创建时间的 ISO 字符串，until 不含"""
+        tasks = reversed(self.tasks.values()) if descending else self.tasks.values()
+        if since is None and until is None:
+            # 只按状态筛选时总数直接取自计数器，本页取到即停止遍历
+            total = len(self.tasks) if done is None else (self.done_count if done else len(self.tasks) - self.done_count)
+            if done is not None:
+                tasks = (t for t in tasks if t['done'] == done)
+        else:
+            tasks = [
+                t for t in tasks
+                if (done is None or t['done'] == done)
+                and (since is None or t['created_at'] >= since)
+                and (until is None or t['created_at'] < until)
+            ]
+            total = len(tasks)
+
+        end = None if limit is None else offset + limit
+        if order == 'created':
+            key = lambda t: (t['created_at'], t['id'])
+            if end is None:
+                return total, sorted(tasks, key=key, reverse=descending)[offset:]
+            # 只需要前 end 项时用堆选出，不必整体排序
+            select = heapq.nlargest if descending else heapq.nsmallest
+            return total, select(end, tasks, key=key)[offset:]
+        return total, list(islice(tasks, offset, end))
+
+    def search(self, text, offset=0, limit=None):
+        """按关键词检索（所有检索词都要包含），按 ID 排序并分页，返回 (匹配总数, 本页任务)"""
+        terms, phrases = query_terms(text)
+        if terms:
+            ids = self._search_saved(terms, phrases) if self._index is None else None
+            if ids is None:
+                if self._index is None:
+                    self._index = self._build_index()
+                ids = self._index.search(terms, phrases, lambda task_id: self.tasks[task_id]['task'])
+        elif phrases:
+            # 只有单个汉字等无法用索引回答的条件，逐条扫描
+            ids = sorted(t['id'] for t in self.tasks.values() if all(p in t['task'] for p in phrases))
+        else:
+            ids = []
+        end = None if limit is None else offset + limit
+        return len(ids), [self.tasks[task_id] for task_id in ids[offset:end]]
+
+    def _build_index(self):
+        index = TextIndex()
+        for task in self.tasks.values():
+            index.add(task['id'], task['task'])
+        return index
+
+    def _search_saved(self, terms, phrases):
+        """用保存的索引文件检索，返回匹配的 ID（升序）；索引文件不存在或不对应当前快照时返回 None
+
+        任务文本添加后不再改变、ID 不会复用，因此索引中的 ID 只需确认任务仍然存在，
+        索引写入之后添加的任务逐条核对。
+        """
+        try:
+            with open(self.index_path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        header = self._index_header(data[:data.find(b'\n') + 1])
+        if header is None:
+            return None
+
+        sets = []
+        for term in terms:
+            key = b'\n' + term.encode('utf-8') + b'\t'
+            start = data.find(key)
+            if start < 0:
+                sets.append(set())
+                continue
+            start += len(key)
+            end = data.find(b'\n', start)
+            if end < 0:
+                return None
+            sets.append(set(map(int, data[start:end].split(b','))))
+        sets.sort(key=len)
+        result = {i for i in sets[0].intersection(*sets[1:]) if i in self.tasks}
+
+        next_id = header['next_id']
+        result.update(
+            t['id'] for t in self.tasks.values()
+            if t['id'] >= next_id and terms <= tokenize(t['task'])
+        )
+        if phrases:
+            result = {i for i in result if all(p in self.tasks[i]['task'] for p in phrases)}
+        return sorted(result)
+
+    def _index_header(self, line):
+        """解析索引文件的表头；不完整或不对应当前快照文件时返回 None"""
+        try:
+            header = json.loads(line)
+        except ValueError:
+            return None
+        if self._snapshot_signature is None or header.get('snapshot') != list(self._snapshot_signature):
+            return None
+        return header
+
+    # ---- 加载 ----
+
+    def load(self):
+        """加载快照并重放日志"""
+        self._read()
+        self._maybe_compact()
+
+    def refresh(self):
+        """其他进程修改了快照或日志时同步内存中的任务，返回是否有变化；批量修改期间不同步"""
+        if self._batch is not None or not self._sync():
+            return False
+        self._maybe_compact()
+        return True
+
+    def _read(self):
+        """完整读取快照并重放日志；只读取，不修改任何文件"""
+        self._close_journal()
+        self._snapshot_signature = _file_signature(self.path)
+        self._rewrite = self._read_snapshot()
+        self._index_stale = self._snapshot_signature is not None and not self._saved_index_current()
+        self.journal_ops = 0
+        self._journal_offset = 0
+        self._replay()
+
+    def _sync(self):
+        """快照或日志有变化时同步，返回是否有变化；其他进程只追加了日志时只重放新增部分"""
+        snapshot = _file_signature(self.path)
+        journal = _file_signature(self.journal_path)
+        if snapshot == self._snapshot_signature and journal == self._journal_signature:
+            return False
+        known = self._journal_signature
+        if (
+            snapshot == self._snapshot_signature
+            and not self._journal_stale
+            and journal is not None and known is not None
+            and journal[0] == known[0] and journal[1] > self._journal_offset
+        ):
+            # 同一个日志文件被追加：只重放新增的操作；未提交的部分留到下次（提交后）再重放
+            stat, data = self._read_journal(self._journal_offset)
+            if stat is not None and stat.st_ino == known[0]:
+                self._journal_offset += self._replay_ops(data, 0)
+                self._journal_signature = _signature(stat)
+                return True
+        self._read()
+        return True
+
+    def _read_journal(self, offset):
+        """读取日志 offset 之后的内容，返回 (读取时的文件状态, 内容)；日志不存在时为 (None, b'')
+
+        状态与内容取自同一个文件句柄，且只读到 fstat 时的大小：读取期间其他进程追加的内容
+        不会被计入签名，下次同步时签名不符，再重放这部分。
+        """
+        try:
+            f = open(self.journal_path, 'rb')
+        except FileNotFoundError:
+            return None, b''
+        with f:
+            stat = os.fstat(f.fileno())
+            f.seek(offset)
+            return stat, f.read(max(stat.st_size - offset, 0))
+
+    def _read_snapshot(self):
+        """读取快照，返回是否需要重写（旧版本的 JSON 数组格式，或存在重复 ID）"""
+        self.tasks, self.next_id, self.done_count, self.generation = {}, 1, 0, 0
+        self._index = None
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        legacy = isinstance(data, list)
+        tasks = data if legacy else data['tasks']
+        if not legacy:
+            self.generation = data['generation']
+            self.next_id = data.get('next_id', 1)
+        self.next_id = max(self.next_id, max((t['id'] for t in tasks), default=0) + 1)
+
+        renumbered = False
+        for task in tasks:
+            if task['id'] in self.tasks:
+                # 旧版本以 len(tasks) + 1 分配 ID，删除后再添加会产生重复 ID，为后出现的任务重新编号
+                task['id'] = self.next_id
+                self.next_id += 1
+                renumbered = True
+            self.tasks[task['id']] = task
+            self.done_count += bool(task['done'])
+        return legacy or renumbered
+
+    def _replay(self):
+        self._journal_stale = False
+        stat, data = self._read_journal(0)
+        self._journal_signature = None if stat is None else _signature(stat)
+        if stat is None:
+            return
+
+        end = data.find(b'\n')
+        try:
+            header = json.loads(data[:end]) if end >= 0 else None
+        except ValueError:
+            header = None
+        if header is None or header.get('generation') != self.generation:
+            # 表头不完整，或日志已在上次压缩时写入快照（压缩中途退出）；下一次写入前重建
+            self._journal_stale = True
+            return
+        # 写入中途中断的最后一行与未提交的批量操作不重放，也不在这里截掉：
+        # 它们可能属于仍在进行的批量修改，由下一个取得写锁的进程处理（见 _prepare_write）
+        self._journal_offset = end + 1 + self._replay_ops(data, end + 1)
+
+    def _replay_ops(self, data, start):
+        """重放 data[start:] 中完整的操作行，返回消耗的字节数；未提交的批量操作不重放、不计入"""
+        valid = start
+        for ops, valid in _committed_ops(data, start):
+            for op in ops:
+                self._apply(op)
+            self.journal_ops += len(ops)
+        return valid - start
+
+    # ---- 修改 ----
+
+    def add(self, text, done=False, created_at=None, completed_at=None):
+        """添加任务并返回；导入时可指定完成状态与时间，已完成但没有完成时间的记为当前时间（与 mark_done 相同）"""
+        with self._writing():
+            task = {
+                'id': self.next_id,
+                'task': text,
+                'done': done,
+                'created_at': created_at or datetime.now().isoformat()
+            }
+            if done:
+                task['completed_at'] = completed_at or datetime.now().isoformat()
+            self._commit({'op': 'add', 'task': task})
+        return task
+
+    def mark_done(self, task_id):
+        """标记任务完成，返回该任务；不存在时返回 None"""
+        with self._writing():
+            task = self.tasks.get(task_id)
+            if task is not None:
+                self._commit({'op': 'done', 'id': task_id, 'at': datetime.now().isoformat()})
+        return task
+
+    def delete(self, task_id):
+        """删除任务，返回是否存在"""
+        with self._writing():
+            if task_id not in self.tasks:
+                return False
+            self._commit({'op': 'delete', 'id': task_id})
+        return True
+
+    def clear_done(self):
+        """清除已完成的任务，返回清除的数量"""
+        with self._writing():
+            cleared = self.done_count
+            if cleared:
+                self._commit({'op': 'clear'})
+        return cleared
+
+    def _apply(self, op):
+        kind = op['op']
+        if kind == 'add':
+            task = op['task']
+            previous = self.tasks.pop(task['id'], None)
+            if previous is not None:
+                self.done_count -= bool(previous['done'])
+                if self._index is not None:
+                    self._index.remove(previous['id'], previous['task'])
+            self.tasks[task['id']] = task
+            self.done_count += bool(task['done'])
+            self.next_id = max(self.next_id, task['id'] + 1)
+            if self._index is not None:
+                self._index.add(task['id'], task['task'])
+        elif kind == 'done':
+            task = self.tasks.get(op['id'])
+            if task is not None:
+                self.done_count += not task['done']
+                task['done'] = True
+                task['completed_at'] = op['at']
+        elif kind == 'delete':
+            task = self.tasks.pop(op['id'], None)
+            if task is not None:
+                self.done_count -= bool(task['done'])
+                if self._index is not None:
+                    self._index.remove(task['id'], task['task'])
+        elif kind == 'clear':
+            if self._index is not None:
+                for task in self.tasks.values():
+                    if task['done']:
+                        self._index.remove(task['id'], task['task'])
+            self.tasks = {task_id: t for task_id, t in self.tasks.items() if not t['done']}
+            self.done_count = 0
+        else:
+            raise ValueError(f"未知的日志操作: {kind}")
+
+    @contextmanager
+    def _writing(self):
+        """单条修改：取得写锁并同步其他进程的修改后再分配 ID、写入日志；批量修改中已持有写锁"""
+        if self._batch is not None:
+            yield
+            return
+        with self._locked():
+            self._prepare_write()
+            yield
+            if self._should_compact():
+                self._compact()
+
+    def _commit(self, op):
+        """先写日志再修改内存，写入失败时内存中的任务保持不变；批量修改中只缓存日志行。调用方需持有写锁"""
+        line = (_dumps(op) + '\n').encode('utf-8')
+        if self._batch is not None:
+            self._batch.append(line)
+            self._batch_bytes += len(line)
+            self._apply(op)
+            self.journal_ops += 1
+            if self._batch_bytes >= BATCH_FLUSH_BYTES:
+                self._flush_batch(final=False)
+            return
+        self._write(line)
+        self._apply(op)
+        self.journal_ops += 1
+
+    @contextmanager
+    def batch(self):
+        """批量修改：结束时一次写入日志，块内抛出异常时丢弃整批修改；可以嵌套，以最外层为准
+
+        整个批量修改期间持有写锁：其他进程的修改等待本批结束，读取不受影响。
+        """
+        if self._batch is not None:
+            yield self
+            return
+        with self._locked():
+            self._prepare_write()
+            self._batch, self._batch_bytes, self._batch_start = [], 0, None
+            try:
+                yield self
+                self._flush_batch(final=True)
+            except BaseException:
+                self._batch = None
+                self._rollback()
+                raise
+            self._batch = None
+            if self._should_compact():
+                self._compact()
+
+    def _flush_batch(self, final):
+        lines = self._batch
+        if not lines and self._batch_start is None:
+            return
+        if final and self._batch_start is None and len(lines) == 1:
+            data = lines[0]  # 只有一条操作时无需标记
+        else:
+            if self._batch_start is None:
+                if self._journal is None:
+                    self._open_journal()
+                self._batch_start = os.fstat(self._journal.fileno()).st_size
+                lines.insert(0, BATCH_BEGIN)
+            if final:
+                lines.append(BATCH_COMMIT)
+            data = b''.join(lines)
+        self._write(data)
+        self._batch, self._batch_bytes = [], 0
+
+    def _rollback(self):
+        if self._batch_start is not None:
+            # 已提前写入的部分没有 commit 标记；持有写锁，其后没有其他进程追加的内容，截掉后重新加载
+            os.truncate(self.journal_path, self._batch_start)
+            self._batch_start = None
+        self._read()
+
+    # ---- 写锁、日志与压缩 ----
+
+    @contextmanager
+    def _locked(self, blocking=True):
+        """跨进程的写锁（<path>.lock 上的排他锁），可重入；blocking=False 且锁被占用时得到 False"""
+        if self._lock_depth == 0:
+            if self._lock_file is None:
+                self._lock_file = open(self.path + '.lock', 'a+b')
+            if not _lock(self._lock_file, blocking):
+                yield False
+                return
+        self._lock_depth += 1
+        try:
+            yield True
+        finally:
+            self._lock_depth -= 1
+            if self._lock_depth == 0:
+                _unlock(self._lock_file)
+
+    def _prepare_write(self):
+        """取得写锁后、写入日志前调用：同步其他进程已提交的修改，并清理崩溃的进程留下的内容
+
+        其他进程的批量修改在结束前一直持有写锁，因此此时日志末尾未提交的操作与不完整的行
+        只可能来自已退出的进程，可以安全截掉，之后追加的内容不会被接在它们后面。
+        截掉之前在锁内重新读取末尾，确认其中没有已提交的操作；有则完整重新加载，绝不丢弃已提交的修改。
+        """
+        self._sync()
+        if not self._journal_stale:
+            _, tail = self._read_journal(self._journal_offset)
+            if next(_committed_ops(tail, 0), None) is not None:
+                self._read()  # 持锁时没有其他进程写入，重新加载后末尾只剩未提交的内容
+        if self._journal_stale:
+            self._close_journal()
+            self._write_journal_header()
+            self._journal_stale = False
+            self._journal_signature = _file_signature(self.journal_path)
+            self._journal_offset = self._journal_signature[1]
+            return
+        journal = _file_signature(self.journal_path)
+        if journal is not None and journal[1] > self._journal_offset:
+            os.truncate(self.journal_path, self._journal_offset)
+            self._journal_signature = _file_signature(self.journal_path)
+
+    def _write(self, data):
+        """追加到日志，并在没有其他进程同时写入时记录日志文件的签名"""
+        if self._journal is None:
+            self._open_journal()
+        view = memoryview(data)
+        while view:
+            view = view[self._journal.write(view):]
+
+        stat = os.fstat(self._journal.fileno())
+        if self._journal_signature is not None and stat.st_size == self._journal_offset + len(data):
+            self._journal_offset = stat.st_size
+            self._journal_signature = _signature(stat)
+        else:
+            # 其他进程修改或同时追加了日志，下次 refresh 时完整重新加载
+            self._journal_signature = None
+
+    def _open_journal(self):
+        if not os.path.exists(self.journal_path):
+            self._write_journal_header()
+            self._journal_signature = _file_signature(self.journal_path)
+        # 无缓冲：每条操作写入后立即交给操作系统，进程崩溃也不会丢失
+        self._journal = open(self.journal_path, 'ab', buffering=0)
+        stat = os.fstat(self._journal.fileno())
+        if _signature(stat) != self._journal_signature:
+            self._journal_signature = None  # 加载后日志已被其他进程修改
+        self._journal_offset = stat.st_size
+
+    def _write_journal_header(self):
+        tmp = self.journal_path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write((_dumps({'generation': self.generation}) + '\n').encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.journal_path)
+
+    def _should_compact(self):
+        return self.journal_ops >= COMPACT_MIN_OPS and self.journal_ops >= len(self.tasks) * COMPACT_RATIO
+
+    def _maybe_compact(self):
+        """需要转换旧格式或日志过长时压缩，快照缺少索引文件时补建；其他进程持有写锁（如正在导入）时跳过，留到之后"""
+        if self.readonly or self._batch is not None or not (self._rewrite or self._should_compact() or self._index_stale):
+            return
+        with self._locked(blocking=False) as locked:
+            if not locked:
+                return
+            if self._rewrite or self._should_compact():
+                self._compact()
+            else:
+                self._sync()
+                if self._index_stale:
+                    self._write_index()
+
+    def compact(self):
+        """把内存中的任务写成新快照并清空日志"""
+        with self._locked():
+            self._compact()
+
+    def _compact(self):
+        """持有写锁时调用：先同步其他进程的修改，再写快照"""
+        self._sync()
+        generation = self.generation + 1
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(_dumps({
+                'version': SNAPSHOT_VERSION,
+                'generation': generation,
+                'next_id': self.next_id,
+                'tasks': list(self.tasks.values()),
+            }))
+            f.flush()
+            os.fsync(f.fileno())
+        # 快照替换后、日志重置前退出时，旧日志的 generation 与快照不符，下次加载时被丢弃
+        os.replace(tmp, self.path)
+        self.generation = generation
+        self._rewrite = False
+        self._close_journal()
+        self._write_journal_header()
+        self._journal_stale = False
+        self.journal_ops = 0
+        self._snapshot_signature = _file_signature(self.path)
+        self._journal_signature = _file_signature(self.journal_path)
+        self._journal_offset = self._journal_signature[1]
+        self._write_index()
+
+    def _saved_index_current(self):
+        """索引文件是否对应当前的快照文件"""
+        try:
+            with open(self.index_path, 'rb') as f:
+                return self._index_header(f.readline()) is not None
+        except OSError:
+            return False
+
+    def _write_index(self):
+        """持有写锁且不在批量修改中时调用：把当前任务的倒排索引写入索引文件，表头记录当前快照的签名
+
+        快照替换后、索引写入前退出时，旧索引的签名与新快照不符，不会被使用。
+        """
+        if self._index is None:
+            self._index = self._build_index()
+        tmp = self.index_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(_dumps({'snapshot': list(self._snapshot_signature), 'next_id': self.next_id}) + '\n')
+            f.writelines(f"{token}\t{','.join(map(str, ids))}\n" for token, ids in self._index.postings.items())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.index_path)
+        self._index_stale = False
+
+    def close(self):
+        self._close_journal()
+        if self._lock_file is not None and self._lock_depth == 0:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _close_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+
+class SqliteTaskStore:
+    """SQLite 任务存储：done 与 created_at 上有索引，WAL 模式；sqlite3 模块按 SQL 文本缓存预编译语句"""
+
+    # 1：任务表及索引；2：搜索用的倒排索引表 task_tokens 与 (done, created_at) 索引
+    SCHEMA_VERSION = 2
+
+    def __init__(self, path, json_path=None):
+        self.path = path
+        self.migrated = 0  # 从 JSON 导入的任务数
+        self._in_batch = False
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        # WAL 模式下读写互不阻塞；NORMAL 只在检查点时 fsync，进程崩溃不会丢失已提交的事务
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version < self.SCHEMA_VERSION:
+            self._upgrade(version, json_path)
+
+    def _upgrade(self, version, json_path):
+        """从 version 逐步升级到当前结构，在同一个事务中完成"""
+        with self.conn:
+            if version < 1:
+                self._create_tasks(json_path)
+            if version < 2:
+                # (检索词, 任务 ID)；按任务 ID 的索引用于删除任务时清理
+                self.conn.execute(
+                    'CREATE TABLE IF NOT EXISTS task_tokens ('
+                    ' token TEXT NOT NULL,'
+                    ' task_id INTEGER NOT NULL,'
+                    ' PRIMARY KEY (token, task_id)) WITHOUT ROWID'
+                )
+                self.conn.execute('CREATE INDEX IF NOT EXISTS task_tokens_task ON task_tokens (task_id)')
+                # 按状态筛选并按创建时间排序的分页查询
+                self.conn.execute('CREATE INDEX IF NOT EXISTS tasks_done_created_at ON tasks (done, created_at)')
+                rows = self.conn.execute('SELECT id, task FROM tasks').fetchall()
+                self.conn.executemany(
+                    'INSERT OR IGNORE INTO task_tokens (token, task_id) VALUES (?, ?)',
+                    ((token, task_id) for task_id, text in rows for token in tokenize(text)),
+                )
+            self.conn.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+
+    def _create_tasks(self, json_path):
+        # AUTOINCREMENT：删除任务后 ID 不会复用，与 JSON 存储一致
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS tasks ('
+            ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' task TEXT NOT NULL,'
+            ' done INTEGER NOT NULL DEFAULT 0,'
+            ' created_at TEXT NOT NULL,'
+            ' completed_at TEXT)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS tasks_done ON tasks (done)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS tasks_created_at ON tasks (created_at)')
+        if json_path is not None and (os.path.exists(json_path) or os.path.exists(json_path + '.journal')):
+            self._migrate(json_path)
+
+    def _migrate(self, json_path):
+        """一次性导入 JSON 存储（快照与日志）中的任务；只读打开，JSON 文件保留不动"""
+        source = TaskStore(json_path, readonly=True)
+        try:
+            self.conn.executemany(
+                'INSERT INTO tasks (id, task, done, created_at, completed_at) VALUES (?, ?, ?, ?, ?)',
+                (
+                    (t['id'], t['task'], int(t['done']), t['created_at'], t.get('completed_at'))
+                    for t in source.iter_tasks()
+                ),
+            )
+            self.migrated = len(source.tasks)
+            # 保留 JSON 存储的 next_id，已删除任务的 ID 同样不会复用
+            self.conn.execute("DELETE FROM sqlite_sequence WHERE name = 'tasks'")
+            self.conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('tasks', ?)", (source.next_id - 1,))
+        finally:
+            source.close()
+
+    @staticmethod
+    def _task(row):
+        task = {'id': row['id'], 'task': row['task'], 'done': bool(row['done']), 'created_at': row['created_at']}
+        if row['completed_at'] is not None:
+            task['completed_at'] = row['completed_at']
+        return task
+
+    @contextmanager
+    def _transaction(self):
+        """单条修改各自提交；批量修改中由 batch() 统一提交"""
+        if self._in_batch:
+            yield
+        else:
+            with self.conn:
+                yield
+
+    @contextmanager
+    def batch(self):
+        """批量修改：整批在一个事务中提交，块内抛出异常时回滚；可以嵌套，以最外层为准"""
+        if self._in_batch:
+            yield self
+            return
+        self._in_batch = True
+        try:
+            with self.conn:
+                yield self
+        finally:
+            self._in_batch = False
+
+    def add(self, text, done=False, created_at=None, completed_at=None):
+        """添加任务并返回；导入时可指定完成状态与时间，已完成但没有完成时间的记为当前时间（与 mark_done 相同）"""
+        task = {'task': text, 'done': done, 'created_at': created_at or datetime.now().isoformat()}
+        if done:
+            task['completed_at'] = completed_at or datetime.now().isoformat()
+        with self._transaction():
+            task_id = self.conn.execute(
+                'INSERT INTO tasks (task, done, created_at, completed_at) VALUES (?, ?, ?, ?)',
+                (text, int(done), task['created_at'], task.get('completed_at')),
+            ).lastrowid
+            self.conn.executemany(
+                'INSERT INTO task_tokens (token, task_id) VALUES (?, ?)',
+                ((token, task_id) for token in tokenize(text)),
+            )
+        return {'id': task_id, **task}
+
+    def mark_done(self, task_id):
+        """标记任务完成，返回该任务；不存在时返回 None"""
+        with self._transaction():
+            self.conn.execute(
+                'UPDATE tasks SET done = 1, completed_at = ? WHERE id = ?',
+                (datetime.now().isoformat(), task_id),
+            )
+            row = self.conn.execute('SELECT * FROM tasks WHERE id = ?', (task_id,)).fetchone()
+        return None if row is None else self._task(row)
+
+    def delete(self, task_id):
+        """删除任务，返回是否存在"""
+        with self._transaction():
+            self.conn.execute('DELETE FROM task_tokens WHERE task_id = ?', (task_id,))
+            return self.conn.execute('DELETE FROM tasks WHERE id = ?', (task_id,)).rowcount > 0
+
+    def clear_done(self):
+        """清除已完成的任务，返回清除的数量"""
+        with self._transaction():
+            self.conn.execute('DELETE FROM task_tokens WHERE task_id IN (SELECT id FROM tasks WHERE done = 1)')
+            return self.conn.execute('DELETE FROM tasks WHERE done = 1').rowcount
+
+    def stats(self):
+        """返回 (总数, 已完成数)"""
+        # 两个计数都只扫描 done 索引，不读取表数据
+        total, done = self.conn.execute(
+            'SELECT (SELECT COUNT(*) FROM tasks), (SELECT COUNT(*) FROM tasks WHERE done = 1)'
+        ).fetchone()
+        return total, done
+
+    def iter_tasks(self):
+        """按添加顺序遍历任务"""
+        return (self._task(row) for row in self.conn.execute('SELECT * FROM tasks ORDER BY id'))
+
+    def query(self, done=None, since=None, until=None, order='id', descending=False, offset=0, limit=None):
+        """筛选、排序并分页，返回 (符合条件的总数, 本页任务)；条件与排序都使用索引"""
+        conditions, params = [], []
+        if done is not None:
+            conditions.append('done = ?')
+            params.append(int(done))
+        if since is not None:
+            conditions.append('created_at >= ?')
+            params.append(since)
+        if until is not None:
+            conditions.append('created_at < ?')
+            params.append(until)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        total = self.conn.execute(f'SELECT COUNT(*) FROM tasks{where}', params).fetchone()[0]
+
+        direction = 'DESC' if descending else 'ASC'
+        ordering = f'created_at {direction}, id {direction}' if order == 'created' else f'id {direction}'
+        rows = self.conn.execute(
+            f'SELECT * FROM tasks{where} ORDER BY {ordering} LIMIT ? OFFSET ?',
+            params + [-1 if limit is None else limit, offset],
+        )
+        return total, [self._task(row) for row in rows]
+
+    def search(self, text, offset=0, limit=None):
+        """按关键词检索（所有检索词都要包含），按 ID 排序并分页，返回 (匹配总数, 本页任务)"""
+        terms, phrases = query_terms(text)
+        if not terms and not phrases:
+            return 0, []
+        terms = sorted(terms)
+        if not terms:
+            # 只有单个汉字等无法用索引回答的条件，逐条扫描
+            sql, params = 'SELECT id FROM tasks WHERE ' + ' AND '.join(['task LIKE ?'] * len(phrases)), []
+        elif len(terms) == 1:
+            sql, params = 'SELECT task_id FROM task_tokens WHERE token = ?', terms
+        else:
+            placeholders = ', '.join('?' * len(terms))
+            sql = (
+                f'SELECT task_id FROM task_tokens WHERE token IN ({placeholders})'
+                ' GROUP BY task_id HAVING COUNT(*) = ?'
+            )
+            params = terms + [len(terms)]
+        if terms and phrases:
+            # bigram 都命中不代表包含整个片段，再用 LIKE 核对（片段只含中日韩文字，无需转义）
+            sql = f'SELECT id FROM tasks WHERE id IN ({sql})' + ' AND task LIKE ?' * len(phrases)
+        params = params + [f'%{p}%' for p in phrases]
+        ids = sorted(row[0] for row in self.conn.execute(sql, params))
+
+        end = None if limit is None else offset + limit
+        page = ids[offset:end]
+        tasks = []
+        # 分批读取，避免超出 SQLite 单条语句的参数个数上限
+        for start in range(0, len(page), 500):
+            chunk = page[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT * FROM tasks WHERE id IN ({', '.join('?' * len(chunk))}) ORDER BY id", chunk
+            )
+            tasks.extend(self._task(row) for row in rows)
+        return len(ids), tasks
+
+    def refresh(self):
+        """每次查询都读取数据库的最新内容，无需同步"""
+        return False
+
+    def close(self):
+        self.conn.close()
+
+
+def open_store(kind, json_path, sqlite_path):
+    """按名称打开任务存储；sqlite 首次打开时导入 json_path 中的任务"""
+    if kind not in STORES:
+        raise ValueError(f"未知的存储后端: {kind}，可选: {', '.join(STORES)}")
+    if kind == 'sqlite':
+        return SqliteTaskStore(sqlite_path, json_path)
+    return TaskStore(json_path)
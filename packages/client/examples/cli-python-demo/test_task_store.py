@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+多进程写入 TaskStore 的回归测试
+
+用法: python3 -m unittest test_task_store（或 python3 -m pytest test_task_store.py）
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from task_store import BATCH_BEGIN, TaskStore
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class ConcurrentWriteTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='booltox-todo-')
+        self.path = os.path.join(self.directory, 'todo.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def texts(self):
+        store = TaskStore(self.path, readonly=True)
+        return sorted(t['task'] for t in store.iter_tasks())
+
+    def test_append_during_load_is_kept(self):
+        """加载时重放日志之后、记录签名之前其他进程追加的操作，不会在下一次写入时被截掉"""
+        writer = TaskStore(self.path)
+        writer.add('first')
+        replay = TaskStore._replay
+        appended = []
+
+        def replay_then_append(store):
+            replay(store)
+            if store is not writer and not appended:
+                appended.append(writer.add('from A'))
+
+        with mock.patch.object(TaskStore, '_replay', replay_then_append):
+            reader = TaskStore(self.path)
+        task = reader.add('from B')
+
+        self.assertNotEqual(task['id'], appended[0]['id'])
+        self.assertEqual(self.texts(), ['first', 'from A', 'from B'])
+
+    def test_parallel_cli_adds_keep_every_task(self):
+        """多个 cli.py 进程同时添加，每个任务都保留且 ID 不重复"""
+        env = dict(os.environ, HOME=self.directory, BOOLTOX_TODO_STORE='json')
+        count = 40
+        processes = [
+            subprocess.Popen([sys.executable, os.path.join(HERE, 'cli.py'), '-q', 'add', f't{i}'], env=env)
+            for i in range(count)
+        ]
+        for process in processes:
+            self.assertEqual(process.wait(), 0)
+
+        store = TaskStore(os.path.join(self.directory, '.booltox-todo.json'), readonly=True)
+        self.assertEqual(sorted(t['task'] for t in store.iter_tasks()), sorted(f't{i}' for i in range(count)))
+        self.assertEqual(len({t['id'] for t in store.iter_tasks()}), count)
+
+    def test_crashed_batch_tail_is_truncated(self):
+        """崩溃的进程留下的未提交批量操作不重放，并在下一次写入前截掉"""
+        store = TaskStore(self.path)
+        store.add('kept')
+        store.close()
+        with open(self.path + '.journal', 'ab') as f:
+            f.write(BATCH_BEGIN + b'{"op":"add","task":{"id":9,"task":"lost","done":false,"created_at":"x"}}\n')
+
+        store = TaskStore(self.path)
+        self.assertEqual([t['task'] for t in store.iter_tasks()], ['kept'])
+        store.add('after crash')
+        self.assertEqual(self.texts(), ['after crash', 'kept'])
+        with open(self.path + '.journal', 'rb') as f:
+            self.assertNotIn(b'lost', f.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
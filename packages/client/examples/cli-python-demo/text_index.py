@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Copyright (c) 2025 ByteTrue
+Licensed under CC-BY-NC-4.0
+
+任务文本的倒排索引
+
+分词规则：
+- 拉丁字母、数字等按单词切分并转为小写，查询时按整词匹配
+- 中日韩文字没有空格分隔，每段连续的文字按相邻两字（bigram）建立索引；
+  查询时两字以上的片段用其中的 bigram 求交集，三字以上再核对原文中是否包含整个片段。
+  单字无法用 bigram 回答，只作为核对条件；查询中只有单字时由调用方逐条扫描
+"""
+
+import re
+
+# 中日韩文字：假名、CJK 统一表意文字（含扩展 A）、兼容表意文字、韩文音节
+CJK_RANGES = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af'
+_TOKEN = re.compile(f'[{CJK_RANGES}]+|[^\\W_{CJK_RANGES}]+')
+_CJK = re.compile(f'[{CJK_RANGES}]')
+
+
+def _split(text):
+    """切分为 (中日韩片段列表, 单词列表)"""
+    cjk, words = [], []
+    for part in _TOKEN.findall(text.lower()):
+        (cjk if _CJK.match(part) else words).append(part)
+    return cjk, words
+
+
+def tokenize(text):
+    """任务文本的全部索引词"""
+    cjk, words = _split(text)
+    tokens = set(words)
+    for run in cjk:
+        tokens.update([run[i:i + 2] for i in range(len(run) - 1)])
+    return tokens
+
+
+def query_terms(text):
+    """查询文本的检索词，以及需要在原文中核对的中日韩片段（单字，或三字以上时 bigram 交集可能误中）"""
+    cjk, words = _split(text)
+    terms, phrases = set(words), []
+    for run in cjk:
+        if len(run) == 1:
+            phrases.append(run)
+        else:
+            terms.update([run[i:i + 2] for i in range(len(run) - 1)])
+            if len(run) > 2:
+                phrases.append(run)
+    return terms, phrases
+
+
+class TextIndex:
+    """内存中的倒排索引：检索词 -> 任务 ID 集合，随任务增删增量维护"""
+
+    def __init__(self):
+        self.postings = {}
+
+    def add(self, task_id, text):
+        postings = self.postings
+        for token in tokenize(text):
+            ids = postings.get(token)
+            if ids is None:
+                postings[token] = {task_id}
+            else:
+                ids.add(task_id)
+
+    def remove(self, task_id, text):
+        postings = self.postings
+        for token in tokenize(text):
+            ids = postings.get(token)
+            if ids is not None:
+                ids.discard(task_id)
+                if not ids:
+                    del postings[token]
+
+    def search(self, terms, phrases, get_text):
+        """返回同时包含所有检索词与片段的任务 ID（升序）；terms 不能为空，get_text(task_id) 用于核对片段"""
+        sets = sorted((self.postings.get(term, ()) for term in terms), key=len)
+        if not sets[0]:
+            return []
+        # 从最小的集合开始求交集
+        result = set(sets[0]).intersection(*sets[1:])
+        if phrases:
+            # 片段只含中日韩文字，没有大小写之分
+            result = {i for i in result if all(p in get_text(i) for p in phrases)}
+        return sorted(result)